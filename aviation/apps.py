@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AviationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'aviation'
+
+    def ready(self):
+        # Connect the table_changed receivers
+        from . import (conditional, itineraries, performance, refdata, revenue, route_graph,  # noqa: F401
+                       seats, stats)
@@ -0,0 +1,156 @@
+import gzip
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is optional
+    brotli = None
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+
+# Only the app's own assets are minified; third-party files ship as they are
+MINIFY_PREFIX = 'aviation/'
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt')
+# Fingerprinted names never change content, so browsers may keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+
+def minify_css(text):
+    """Drop comments and redundant whitespace; quoted strings are left untouched"""
+    parts = _STRING.split(_CSS_COMMENT.sub('', text))
+    for i in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[i])
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code)
+        parts[i] = code.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(text):
+    """
+    Line-based JS minification: strip indentation, blank lines and
+    whole-line // comments.
+
+    Newlines are kept so automatic semicolon insertion is unaffected; this
+    does not suit code with strings or template literals spanning lines.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class AssetStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage that minifies the app's CSS and JS before they are
+    fingerprinted, then writes .gz (and, with the brotli package, .br) copies
+    of every text asset for serve_static() to send precompressed.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        for name in list(paths):
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            if minify and name.startswith(MINIFY_PREFIX) and '.min.' not in name:
+                with self.open(name) as collected:
+                    text = collected.read().decode('utf-8')
+                self.delete(name)
+                self.save(name, ContentFile(minify(text).encode('utf-8')))
+                # Hash the minified copy rather than the source file
+                paths[name] = (self, name)
+
+        hashed = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed[name] = hashed_name
+            yield name, hashed_name, processed
+        for name in sorted(set(paths) | set(hashed.values())):
+            if name.endswith(COMPRESS_EXTENSIONS):
+                self._compress(name)
+
+    def _compress(self, name):
+        with self.open(name) as asset:
+            content = asset.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self.save(name + suffix, ContentFile(compressed))
+
+
+# Preferred first when the client rates them equally
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """Content codings from an Accept-Encoding header mapped to their q-values; '*' covers the rest"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def _quality(accepted, coding):
+    return accepted.get(coding, accepted.get('*', 0.0))
+
+
+def serve_static(request, path):
+    """
+    Serve a collected static file from STATIC_ROOT.
+
+    Fingerprinted names are cached for a year; a precompressed variant is
+    sent when the client accepts its encoding. A front-end web server can
+    serve STATIC_ROOT directly with the same headers instead.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid static path')
+    if not os.path.isfile(full_path):
+        raise Http404('Static file not found')
+
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    served, encoding, best = full_path, None, 0.0
+    for name, suffix in ENCODINGS:
+        quality = _quality(accepted, name)
+        # q=0 means "not acceptable"
+        if quality > best and os.path.isfile(full_path + suffix):
+            served, encoding, best = full_path + suffix, name, quality
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    response = FileResponse(open(served, 'rb'), content_type=content_type)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE if _HASHED_NAME.search(path) else REVALIDATE
+    return response
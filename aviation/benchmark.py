@@ -0,0 +1,272 @@
+import datetime
+import itertools
+import math
+import random
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.utils import timezone
+
+from .models import (Aircraft, AircraftType, Airline, Airport, Alliance, Booking, City,
+                     Country, Currency, Flight, Gate, Passenger, SeatClass, Terminal, Ticket)
+from .stats import refresh_stats
+
+BENCH_USER = 'benchmark'
+BENCH_PASSWORD = 'benchmark-password'
+
+FIRST_NAMES = ['John', 'Mary', 'Sean', 'Aoife', 'Liam', 'Emma', 'Noah', 'Olivia', 'Lucas', 'Mia']
+LAST_NAMES = ['Murphy', 'Kelly', 'Smith', 'Garcia', 'Muller', 'Rossi', 'Tanaka', 'Silva', 'Novak', 'Dubois']
+FLIGHT_STATUSES = ['Scheduled', 'In-Flight', 'Completed', 'Delayed', 'Cancelled']
+CHANNELS = ['Website', 'Mobile App', 'Call Center', 'Travel Agent']
+# Timed flight writes are scheduled this far ahead, clear of every seeded flight
+WRITE_HORIZON = datetime.timedelta(days=400)
+WRITE_INTERVAL = datetime.timedelta(hours=6)
+# edit_flight stores the posted text as is, and SQLite compares datetimes as text
+WRITE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def reset_schema():
+    """Drop and recreate every aviation table in the benchmark database"""
+    models = list(apps.get_app_config('aviation').get_models())
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in reversed(models):
+            if model._meta.db_table in existing:
+                editor.delete_model(model)
+        for model in models:
+            editor.create_model(model)
+    for store in caches.all():
+        store.clear()
+
+
+def seed(scale, rng=None):
+    """
+    Fill the schema with a synthetic network of roughly `scale` flights,
+    passengers, bookings and tickets, plus proportionate reference data.
+    """
+    rng = rng or random.Random(42)
+    batch = 1000
+    n_airports = max(10, scale // 100)
+    n_airlines = max(5, scale // 1000)
+    n_aircraft = max(10, scale // 50)
+
+    Country.objects.bulk_create(
+        [Country(countrycode=i, countryname=f'Country {i}') for i in range(1, 21)])
+    Currency.objects.bulk_create([
+        Currency(currencycode=1, currencyname='Euro', currencysymbol='EUR'),
+        Currency(currencycode=2, currencyname='US Dollar', currencysymbol='USD'),
+        Currency(currencycode=3, currencyname='Pound', currencysymbol='GBP'),
+    ])
+    City.objects.bulk_create(
+        [City(cityid=i, cityname=f'City {i}', countrycode_id=1 + i % 20) for i in range(1, 51)])
+    Airport.objects.bulk_create([
+        Airport(airportcode=i, airportname=f'{rng.choice(LAST_NAMES)} International {i}',
+                latitude=Decimal(f'{rng.uniform(-60, 70):.6f}'),
+                longitude=Decimal(f'{rng.uniform(-180, 180):.6f}'),
+                timezone='UTC', cityid_id=1 + i % 50)
+        for i in range(1, n_airports + 1)
+    ], batch_size=batch)
+    Terminal.objects.bulk_create([
+        Terminal(terminalid=i, terminalname='T1', isinternational=True, airportcode_id=i)
+        for i in range(1, n_airports + 1)
+    ], batch_size=batch)
+    Gate.objects.bulk_create([
+        Gate(gatenumber=i * 10 + g, gatetype=1, isactive=True, airportcode_id=i, terminalid_id=i)
+        for i in range(1, n_airports + 1) for g in range(4)
+    ], batch_size=batch)
+    Alliance.objects.bulk_create([Alliance(allianceid=1, alliancename='Benchmark Alliance',
+                                           allianceheadquarters_id=1)])
+    Airline.objects.bulk_create([
+        Airline(airlineid=i, airlinename=f'{rng.choice(LAST_NAMES)} Air {i}', airlineicao=f'B{i:03d}',
+                headquarterscityid_id=1 + i % 50, foundedyear=1950 + i % 70, allianceid_id=1)
+        for i in range(1, n_airlines + 1)
+    ])
+    AircraftType.objects.bulk_create([
+        AircraftType(aircrafttypecode=1, typename='A320', maxpassengers=180, maintenancetypeid=1),
+        AircraftType(aircrafttypecode=2, typename='B787', maxpassengers=290, maintenancetypeid=1),
+    ])
+    # One spare aircraft beyond n_aircraft gets no seeded flights; the timed writes fly it
+    Aircraft.objects.bulk_create([
+        Aircraft(aircraftid=i, manufactureyear=2000 + i % 24, lastmaintenancedate=datetime.date(2024, 1, 1),
+                 airlineid_id=1 + i % n_airlines, aircrafttypecode_id=1 + i % 2)
+        for i in range(1, n_aircraft + 2)
+    ], batch_size=batch)
+    SeatClass.objects.bulk_create([
+        SeatClass(seatclass=1, basefare=100, baggageallowance=20),
+        SeatClass(seatclass=2, basefare=400, baggageallowance=32),
+    ])
+
+    start = timezone.now() - datetime.timedelta(days=180)
+    flights = []
+    for i in range(1, scale + 1):
+        origin = rng.randint(1, n_airports)
+        destination = origin % n_airports + 1
+        departure = start + datetime.timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        flights.append(Flight(
+            flightid=i, flightnumber=f'BM{i}', scheduleddeparture=departure,
+            scheduledarrival=departure + datetime.timedelta(minutes=rng.randint(45, 720)),
+            flightstatus=rng.choice(FLIGHT_STATUSES), airlineid_id=1 + i % n_airlines,
+            aircraftid_id=1 + i % n_aircraft, departureairportcode_id=origin,
+            arrivalairportcode_id=destination, departureterminalid_id=origin,
+            arrivalterminalid_id=destination, departuregatenumber=origin * 10 + i % 4,
+            arrivalgatenumber=destination * 10 + i % 4,
+        ))
+    Flight.objects.bulk_create(flights, batch_size=batch)
+
+    Passenger.objects.bulk_create([
+        Passenger(passengerid=i, firstname=rng.choice(FIRST_NAMES), lastname=rng.choice(LAST_NAMES),
+                  email=f'passenger{i}@example.com', phone='0000000', dateofbirth=datetime.date(1980, 1, 1),
+                  passportnumber=f'P{i:09d}', countrycode_id=1 + i % 20, nationality='Synthetic')
+        for i in range(1, scale + 1)
+    ], batch_size=batch)
+    Booking.objects.bulk_create([
+        Booking(bookingid=i, bookingdate=start + datetime.timedelta(minutes=i),
+                totalamount=Decimal(rng.randint(50, 2000)), bookingstatus='Confirmed',
+                bookingchannel=rng.choice(CHANNELS), passengerid_id=i, currencycode_id=1 + i % 3)
+        for i in range(1, scale + 1)
+    ], batch_size=batch)
+    Ticket.objects.bulk_create([
+        Ticket(ticketid=i, seatnumber=f'{1 + i % 30}{"ABCDEF"[i % 6]}', ticketstatus='Issued',
+               bookingid_id=i, flightid_id=rng.randint(1, scale), seatclass_id=1 + i % 2, passengerid_id=i)
+        for i in range(1, scale + 1)
+    ], batch_size=batch)
+
+    refresh_stats()
+    return {'flights': scale, 'passengers': scale, 'airports': n_airports,
+            'airlines': n_airlines, 'aircraft': n_aircraft}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _flight_post(flight_id, slot, aircraft, start):
+    """
+    Form data for leg `slot` of `aircraft`, shuttling between airports 1 and
+    2 every WRITE_INTERVAL from `start`, so no write trips the gate or
+    rotation checks.
+    """
+    departure = start + slot * WRITE_INTERVAL
+    arrival = departure + datetime.timedelta(hours=2)
+    origin, destination = (1, 2) if slot % 2 == 0 else (2, 1)
+    return {
+        'flightid': flight_id, 'flightnumber': f'BX{flight_id}',
+        'scheduleddeparture': departure.strftime(WRITE_FORMAT),
+        'scheduledarrival': arrival.strftime(WRITE_FORMAT),
+        'flightstatus': 'Scheduled', 'airlineid': 1, 'aircraftid': aircraft,
+        'departureairportcode': origin, 'arrivalairportcode': destination,
+        'departureterminalid': origin, 'arrivalterminalid': destination,
+        'departuregatenumber': origin * 10, 'arrivalgatenumber': destination * 10,
+    }
+
+
+def scenarios(scale):
+    """(name, method, url factory, POST data factory, expected status) for each timed path"""
+    ids = itertools.count(scale + 1)
+    booking_ids = itertools.count(scale + 1)
+    slots = itertools.count()
+    aircraft = Aircraft.objects.aggregate(spare=Max('aircraftid'))['spare']
+    start = timezone.localtime(timezone.now() + WRITE_HORIZON).replace(minute=0, second=0, microsecond=0)
+    return [
+        ('home', 'get', lambda i: '/', None, 200),
+        ('flights_list', 'get', lambda i: '/flights/', None, 200),
+        ('flight_detail', 'get', lambda i: f'/flights/{1 + i % scale}/', None, 200),
+        ('search_flights', 'get', lambda i: f'/search/?q={LAST_NAMES[i % len(LAST_NAMES)]}', None, 200),
+        ('airport_detail', 'get', lambda i: '/airports/1/', None, 200),
+        ('add_flight', 'post', lambda i: '/flights/add/',
+         lambda i: _flight_post(next(ids), next(slots), aircraft, start), 302),
+        ('edit_flight', 'post', lambda i: f'/flights/{1 + i % scale}/edit/',
+         lambda i: {**_flight_post(1 + i % scale, next(slots), aircraft, start),
+                    'actualdeparture': '', 'actualarrival': ''}, 302),
+        ('add_booking', 'post', lambda i: '/bookings/add/', lambda i: {
+            'bookingid': next(booking_ids), 'bookingdate': timezone.now().strftime('%Y-%m-%dT%H:%M'),
+            'totalamount': '199.00', 'bookingstatus': 'Confirmed', 'bookingchannel': 'Website',
+            'passengerid': 1 + i % scale, 'currencycode': 1,
+        }, 302),
+    ]
+
+
+def run_scenarios(scale, iterations):
+    """Time every scenario `iterations` times and summarise latency and query counts"""
+    if not User.objects.filter(username=BENCH_USER).exists():
+        User.objects.create_user(BENCH_USER, password=BENCH_PASSWORD)
+    client = Client()
+    client.login(username=BENCH_USER, password=BENCH_PASSWORD)
+
+    results = {}
+    for name, method, url, data, expected in scenarios(scale):
+        timings = []
+        queries = []
+        for i in range(iterations):
+            request = getattr(client, method)
+            args = (url(i), data(i)) if data else (url(i),)
+            start = time.perf_counter()
+            response = request(*args)
+            timings.append((time.perf_counter() - start) * 1000)
+            # QueryMetricsMiddleware also counts what async views run on pool threads
+            queries.append(response.wsgi_request.query_metrics.sql_count)
+            if response.status_code != expected:
+                # A rejected write would be timed as if it were a real one
+                raise BenchmarkError(f'{name} returned {response.status_code} on iteration {i}, '
+                                     f'expected {expected}')
+        timings.sort()
+        results[name] = {
+            'iterations': iterations,
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p90_ms': round(percentile(timings, 0.90), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_ms': round(timings[-1], 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+        }
+    return results
+
+
+def run_benchmark(scales, iterations, log=print):
+    report = {
+        'timestamp': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'iterations': iterations,
+        'scales': {},
+    }
+    for scale in scales:
+        log(f'Seeding scale {scale}...')
+        reset_schema()
+        started = time.perf_counter()
+        sizes = seed(scale)
+        log(f'  seeded in {time.perf_counter() - started:.1f}s')
+        report['scales'][str(scale)] = {'dataset': sizes, 'views': run_scenarios(scale, iterations)}
+    return report
+
+
+def compare(previous, current, threshold=0.2):
+    """
+    Yield (scale, view, metric, old, new) for views whose p50 got worse than
+    `threshold`, or that now issue at least one more query per request on
+    average
+    """
+    for scale, data in current['scales'].items():
+        old_views = previous.get('scales', {}).get(scale, {}).get('views', {})
+        for view, stats in data['views'].items():
+            old = old_views.get(view)
+            if not old:
+                continue
+            if old['p50_ms'] and stats['p50_ms'] > old['p50_ms'] * (1 + threshold):
+                yield scale, view, 'p50_ms', old['p50_ms'], stats['p50_ms']
+            if stats['queries_mean'] >= old['queries_mean'] + 1:
+                yield scale, view, 'queries_mean', old['queries_mean'], stats['queries_mean']
@@ -0,0 +1,100 @@
+import datetime
+
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Aircraft, Flight
+
+DEFAULT_WINDOW_HOURS = 6
+MAX_WINDOW_HOURS = 48
+WINDOW_OPTIONS = (1, 3, 6, 12, 24, 48)
+# Rows shown per board; the summary still counts every flight in the window
+BOARD_LIMIT = 100
+
+STATUS_ORDER = ['Scheduled', 'Delayed', 'In-Flight', 'Completed', 'Cancelled']
+
+
+class TimeWindow:
+    """`hours` either side of `at`, with the anchors of the neighbouring windows"""
+
+    def __init__(self, at, hours):
+        self.at = at
+        self.hours = hours
+        self.options = WINDOW_OPTIONS
+        span = datetime.timedelta(hours=hours)
+        self.start = at - span
+        self.end = at + span
+        self.earlier = at - 2 * span
+        self.later = at + 2 * span
+
+
+class Board:
+    """The first BOARD_LIMIT flights of a window plus aggregate counts for all of it"""
+
+    def __init__(self, flights, status_counts):
+        self.flights = flights
+        self.status_counts = status_counts
+        self.total = sum(count for _, count in status_counts)
+
+    @property
+    def hidden(self):
+        return self.total - len(self.flights)
+
+
+def parse_window(request):
+    """Read the `at` and `hours` query parameters, defaulting to now +/- 6 hours; invalid values fall back too"""
+    at = None
+    if request.GET.get('at'):
+        try:
+            at = parse_datetime(request.GET['at'])
+        except ValueError:
+            # Well-formed but impossible, such as 2026-02-30T10:00
+            at = None
+        if at is not None and timezone.is_naive(at):
+            at = timezone.make_aware(at)
+    try:
+        hours = int(request.GET.get('hours', DEFAULT_WINDOW_HOURS))
+    except ValueError:
+        hours = DEFAULT_WINDOW_HOURS
+    hours = max(1, min(hours, MAX_WINDOW_HOURS))
+    try:
+        return TimeWindow(at or timezone.now(), hours)
+    except OverflowError:
+        # Too close to the first or last representable date for its neighbouring windows
+        return TimeWindow(timezone.now(), hours)
+
+
+def _status_counts(queryset):
+    """Flights per status in one GROUP BY, in board order"""
+    counts = dict(queryset.order_by().values_list('flightstatus').annotate(n=Count('flightid')))
+    ordered = [(status, counts.pop(status)) for status in STATUS_ORDER if status in counts]
+    return ordered + sorted(counts.items())
+
+
+def flight_board(window, time_field, **filters):
+    """
+    Flights matching `filters` whose `time_field` falls inside the window.
+
+    Both queries are range scans on a (filter column, time column) index, so
+    the cost depends on the window, not on how much history the airport or
+    airline has.
+    """
+    flights = Flight.objects.filter(
+        **filters, **{f'{time_field}__gte': window.start, f'{time_field}__lt': window.end}
+    )
+    rows = list(
+        flights.select_related('airlineid', 'departureairportcode', 'arrivalairportcode')
+        .order_by(time_field, 'flightid')[:BOARD_LIMIT]
+    )
+    return Board(rows, _status_counts(flights))
+
+
+def fleet_summary(airline_id):
+    """Aircraft of an airline counted per type"""
+    return list(
+        Aircraft.objects.filter(airlineid=airline_id)
+        .values('aircrafttypecode__typename')
+        .annotate(count=Count('aircraftid'))
+        .order_by('aircrafttypecode__typename')
+    )
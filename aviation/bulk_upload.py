@@ -0,0 +1,343 @@
+import codecs
+import csv
+import datetime
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+
+from .changefeed import record_changes
+from .forms import BookingForm, FlightForm, PassengerForm, TicketForm
+from .models import (Aircraft, Airline, Airport, Booking, Country, Currency, Flight, Gate,
+                     Passenger, SeatClass, Terminal, Ticket)
+from .gates import check_gate_rows
+from .rotations import check_rotation_rows
+from .seats import check_ticket_rows
+from .signals import notify_write
+
+# Rows validated together and written in one transaction
+UPLOAD_CHUNK_SIZE = 1000
+# Per-row errors kept for the report; the total is still counted
+MAX_REPORTED_ERRORS = 500
+
+
+class Reference:
+    """CSV columns that must match an existing row of `model`"""
+
+    def __init__(self, fields, model, lookups, label):
+        self.fields = fields
+        self.model = model
+        self.lookups = lookups
+        self.label = label
+
+
+class UploadSpec:
+    def __init__(self, table, model, form_class, columns, label, list_url,
+                 references=(), unique=(), checks=(), related=()):
+        self.table = table
+        self.model = model
+        self.form_class = form_class
+        # (form field / CSV header, SQL column)
+        self.columns = columns
+        self.label = label
+        self.list_url = list_url
+        self.references = references
+        # Form fields that must be unique in the file and the table
+        self.unique = (model._meta.pk.name,) + tuple(unique)
+        # Callables taking [(line, cleaned row)] and returning {line: error}
+        self.checks = checks
+        # (parent table, form field) announced with the write as `related`
+        self.related = related
+
+    def related_keys(self, rows):
+        """The parent rows that `rows` belong to, as notify_write's `related`"""
+        if not self.related:
+            return None
+        return {table: sorted({cleaned[field] for _, cleaned in rows}) for table, field in self.related}
+
+    @property
+    def headers(self):
+        return [field for field, _ in self.columns]
+
+    @property
+    def insert_sql(self):
+        columns = ', '.join(column for _, column in self.columns)
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        return f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders})"
+
+
+UPLOADS = {
+    'flights': UploadSpec(
+        'FLIGHT', Flight, FlightForm,
+        [('flightid', 'FlightID'), ('flightnumber', 'FlightNumber'),
+         ('scheduleddeparture', 'ScheduledDeparture'), ('scheduledarrival', 'ScheduledArrival'),
+         ('flightstatus', 'FlightStatus'), ('airlineid', 'AirlineID'), ('aircraftid', 'AircraftID'),
+         ('departureairportcode', 'DepartureAirportCode'), ('arrivalairportcode', 'ArrivalAirportCode'),
+         ('departureterminalid', 'DepartureTerminalID'), ('arrivalterminalid', 'ArrivalTerminalID'),
+         ('departuregatenumber', 'DepartureGateNumber'), ('arrivalgatenumber', 'ArrivalGateNumber')],
+        'Flights', 'flights_list',
+        references=(
+            Reference(('airlineid',), Airline, ('airlineid',), 'airline'),
+            Reference(('aircraftid',), Aircraft, ('aircraftid',), 'aircraft'),
+            Reference(('departureairportcode',), Airport, ('airportcode',), 'departure airport'),
+            Reference(('arrivalairportcode',), Airport, ('airportcode',), 'arrival airport'),
+            Reference(('departureterminalid',), Terminal, ('terminalid',), 'departure terminal'),
+            Reference(('arrivalterminalid',), Terminal, ('terminalid',), 'arrival terminal'),
+            Reference(('departuregatenumber', 'departureterminalid'), Gate,
+                      ('gatenumber', 'terminalid'), 'departure gate for that terminal'),
+            Reference(('arrivalgatenumber', 'arrivalterminalid'), Gate,
+                      ('gatenumber', 'terminalid'), 'arrival gate for that terminal'),
+        ),
+        checks=(check_gate_rows, check_rotation_rows),
+    ),
+    'passengers': UploadSpec(
+        'PASSENGER', Passenger, PassengerForm,
+        [('passengerid', 'PassengerID'), ('firstname', 'FirstName'), ('lastname', 'LastName'),
+         ('email', 'Email'), ('phone', 'Phone'), ('dateofbirth', 'DateOfBirth'),
+         ('passportnumber', 'PassportNumber'), ('countrycode', 'CountryCode'),
+         ('nationality', 'Nationality')],
+        'Passengers', 'passengers_list',
+        references=(Reference(('countrycode',), Country, ('countrycode',), 'country'),),
+        unique=('passportnumber',),
+    ),
+    'bookings': UploadSpec(
+        'BOOKING', Booking, BookingForm,
+        [('bookingid', 'BookingID'), ('bookingdate', 'BookingDate'), ('totalamount', 'TotalAmount'),
+         ('bookingstatus', 'BookingStatus'), ('bookingchannel', 'BookingChannel'),
+         ('passengerid', 'PassengerID'), ('currencycode', 'CurrencyCode')],
+        'Bookings', 'bookings_list',
+        references=(
+            Reference(('passengerid',), Passenger, ('passengerid',), 'passenger'),
+            Reference(('currencycode',), Currency, ('currencycode',), 'currency'),
+        ),
+    ),
+    'tickets': UploadSpec(
+        'TICKET', Ticket, TicketForm,
+        [('ticketid', 'TicketID'), ('seatnumber', 'SeatNumber'), ('ticketstatus', 'TicketStatus'),
+         ('checkedinat', 'CheckedInAt'), ('bookingid', 'BookingID'), ('flightid', 'FlightID'),
+         ('seatclass', 'SeatClass'), ('passengerid', 'PassengerID')],
+        'Tickets', 'bookings_list',
+        references=(
+            Reference(('bookingid',), Booking, ('bookingid',), 'booking'),
+            Reference(('flightid',), Flight, ('flightid',), 'flight'),
+            Reference(('seatclass',), SeatClass, ('seatclass',), 'seat class'),
+            Reference(('passengerid',), Passenger, ('passengerid',), 'passenger'),
+        ),
+        checks=(check_ticket_rows,),
+        related=(('FLIGHT', 'flightid'), ('BOOKING', 'bookingid')),
+    ),
+}
+
+
+class UploadResult:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        # Why reading the file stopped early: not UTF-8, or not CSV
+        self.file_error = None
+        self.elapsed = 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_minute(self):
+        return int(self.processed * 60 / self.elapsed) if self.elapsed else 0
+
+
+def _adapt(ops, value):
+    if isinstance(value, datetime.datetime):
+        return ops.adapt_datetimefield_value(value)
+    if isinstance(value, datetime.date):
+        return ops.adapt_datefield_value(value)
+    return value
+
+
+def _clean_row(fields, row):
+    """
+    Run every form field's validation on one CSV row.
+
+    Equivalent to binding the form, but reuses the form class's field
+    instances instead of deep-copying them for each of thousands of rows.
+    """
+    cleaned = {}
+    errors = []
+    for name, field in fields.items():
+        try:
+            cleaned[name] = field.clean(field.widget.value_from_datadict(row, {}, name))
+        except ValidationError as e:
+            errors.append(f'{name}: {" ".join(e.messages)}')
+    return cleaned, errors
+
+
+def _existing(model, lookups, keys):
+    """Which of the key tuples in `keys` exist in `model`, in one query"""
+    if not keys:
+        return set()
+    filters = {f'{lookup}__in': {key[i] for key in keys} for i, lookup in enumerate(lookups)}
+    found = model.objects.filter(**filters).values_list(*lookups)
+    return set(found) & keys
+
+
+def _validate_chunk(spec, chunk, seen, result):
+    """Form-validate each row, then check keys and references for the whole chunk at once"""
+    valid = []
+    fields = spec.form_class.base_fields
+    for line, row in chunk:
+        cleaned, errors = _clean_row(fields, row)
+        if errors:
+            result.add_error(line, '; '.join(errors))
+            continue
+        duplicate = next((field for field in spec.unique if cleaned[field] in seen[field]), None)
+        if duplicate:
+            result.add_error(line, f'{duplicate} {cleaned[duplicate]} appears earlier in the file')
+            continue
+        for field in spec.unique:
+            seen[field].add(cleaned[field])
+        valid.append((line, cleaned))
+
+    rejected = {}
+    for field in spec.unique:
+        keys = {(cleaned[field],) for _, cleaned in valid}
+        taken = _existing(spec.model, (field,), keys)
+        for line, cleaned in valid:
+            if (cleaned[field],) in taken:
+                rejected.setdefault(line, f'{field} {cleaned[field]} already exists')
+    for reference in spec.references:
+        keys = {tuple(cleaned[field] for field in reference.fields) for _, cleaned in valid}
+        found = _existing(reference.model, reference.lookups, keys)
+        for line, cleaned in valid:
+            key = tuple(cleaned[field] for field in reference.fields)
+            if key not in found:
+                rejected.setdefault(line, f'Unknown {reference.label}: {", ".join(map(str, key))}')
+
+    for check in spec.checks:
+        remaining = [(line, cleaned) for line, cleaned in valid if line not in rejected]
+        for line, message in check(remaining).items():
+            rejected.setdefault(line, message)
+
+    for line, message in sorted(rejected.items()):
+        result.add_error(line, message)
+    return [(line, cleaned) for line, cleaned in valid if line not in rejected]
+
+
+def _insert_chunk(spec, rows, result):
+    """
+    Multi-row INSERT of a validated chunk, with its CHANGE_EVENT rows; on
+    failure, retry row by row to find the culprits. Returns the rows inserted.
+    """
+    if not rows:
+        return []
+    sql = spec.insert_sql
+    ops = connection.ops
+    headers = spec.headers
+    params = [[_adapt(ops, cleaned[field]) for field in headers] for _, cleaned in rows]
+    pk_name = spec.model._meta.pk.name
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            record_changes(spec.table, 'insert', [cleaned[pk_name] for _, cleaned in rows])
+        inserted = rows
+    except DatabaseError:
+        inserted = []
+        for (line, cleaned), row_params in zip(rows, params):
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(sql, row_params)
+                    record_changes(spec.table, 'insert', [cleaned[pk_name]])
+                inserted.append((line, cleaned))
+            except DatabaseError as e:
+                result.add_error(line, str(e))
+    result.inserted += len(inserted)
+    return inserted
+
+
+class _Inserted:
+    """The keys of every row an upload inserted, announced once after its last chunk"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.pks = []
+        self.related = {table: set() for table, _ in spec.related}
+
+    def add(self, rows):
+        pk_name = self.spec.model._meta.pk.name
+        self.pks.extend(cleaned[pk_name] for _, cleaned in rows)
+        for table, keys in (self.spec.related_keys(rows) or {}).items():
+            self.related[table].update(keys)
+
+    def announce(self):
+        # Each chunk's events committed with it; the receivers run once
+        related = {table: sorted(keys) for table, keys in self.related.items()} if self.spec.related else None
+        notify_write(self.spec.table, 'insert', None, len(self.pks), pks=self.pks, outbox=False, related=related)
+
+
+def _file_error(reader, error):
+    # The underlying csv reader has counted the line it failed to parse
+    # (DictReader.line_num only moves after a good row), but not a line
+    # that failed to decode
+    line = reader.reader.line_num
+    if isinstance(error, UnicodeDecodeError):
+        return f'Line {line + 1} is not UTF-8 text; save the file as CSV UTF-8 and upload it again.'
+    return f'Line {line} is not valid CSV: {error}'
+
+
+def _read_rows(reader, result):
+    """(line, row) pairs; a line that cannot be decoded or parsed ends the file and is noted on `result`"""
+    try:
+        # Line 1 is the header
+        yield from enumerate(reader, start=2)
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.file_error = _file_error(reader, e)
+
+
+def process_upload(spec, uploaded_file):
+    """
+    Stream a CSV upload into spec.table.
+
+    The file is read line by line, rows are validated and inserted in chunks
+    of UPLOAD_CHUNK_SIZE (one executemany per chunk, in its own transaction),
+    and every rejected row is reported with its line number. The
+    table_changed receivers run once, for all the rows, after the last
+    chunk. A file that turns out not to be UTF-8 CSV stops at the bad line,
+    keeping the rows before it, and sets result.file_error.
+    """
+    result = UploadResult()
+    started = time.perf_counter()
+    reader = csv.DictReader(codecs.iterdecode(uploaded_file, 'utf-8-sig'))
+    try:
+        fieldnames = reader.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.file_error = _file_error(reader, e)
+        return result
+    missing = [header for header in spec.headers
+               if header not in fieldnames and spec.form_class.base_fields[header].required]
+    if missing:
+        result.add_error(1, f'Missing columns: {", ".join(missing)}')
+        return result
+
+    seen = {field: set() for field in spec.unique}
+    inserted = _Inserted(spec)
+    chunk = []
+    try:
+        for line, row in _read_rows(reader, result):
+            chunk.append((line, row))
+            if len(chunk) >= UPLOAD_CHUNK_SIZE:
+                result.processed += len(chunk)
+                inserted.add(_insert_chunk(spec, _validate_chunk(spec, chunk, seen, result), result))
+                chunk = []
+        if chunk:
+            result.processed += len(chunk)
+            inserted.add(_insert_chunk(spec, _validate_chunk(spec, chunk, seen, result), result))
+    finally:
+        # Also for the chunks committed before an unexpected error
+        inserted.announce()
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,189 @@
+import datetime
+import json
+
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ChangeCheckpoint, ChangeEvent
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+# EventIDs are taken when a write's transaction inserts its events, not when
+# it commits, so a reader can see EventID n + 1 while n is still open. Such a
+# gap below the position is remembered and polled again; it is given up once
+# an event recorded after it is this old, its transaction having rolled back
+GAP_TIMEOUT_SECONDS = 5 * 60
+# Open gaps kept per position; beyond this the lowest are given up early
+MAX_GAPS = 1000
+DEFAULT_RETENTION_DAYS = 7
+
+_INSERT = "INSERT INTO CHANGE_EVENT (TableName, Action, RowKey, ChangedAt) VALUES (%s, %s, %s, %s)"
+
+
+def _plain(pk):
+    # Write views pass keys from the URL (int) or the POST body (str)
+    if isinstance(pk, str) and pk.isdigit():
+        return int(pk)
+    if isinstance(pk, (tuple, list)):
+        return [_plain(part) for part in pk]
+    return pk
+
+
+def row_key(pk):
+    """A primary key as stored in RowKey: JSON, composite keys as lists and dates as ISO strings"""
+    return json.dumps(_plain(pk), default=str, separators=(',', ':'))
+
+
+def record_changes(table, action, pks):
+    """
+    Append one CHANGE_EVENT per key on the default connection.
+
+    Called from inside the write's transaction, the events commit or roll
+    back together with the write itself.
+    """
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.executemany(_INSERT, [[table, action, row_key(pk), now] for pk in pks])
+
+
+class ChangeBatch:
+    """
+    Events returned by read_changes() and the position after them: the
+    highest EventID seen and the lower EventIDs still expected.
+    """
+
+    def __init__(self, events, after, gaps, more):
+        self.events = events
+        self.after = after
+        self.gaps = gaps
+        # Whether the read stopped at the batch limit
+        self.more = more
+
+
+def parse_gaps(text):
+    """Gap EventIDs from their comma-separated form, as kept in CHANGE_CHECKPOINT and ?gaps="""
+    return sorted({int(part) for part in text.split(',') if part.strip().isdigit()})
+
+
+def format_gaps(gaps):
+    return ','.join(map(str, gaps))
+
+
+def _gap_horizon():
+    """EventID of the newest event older than GAP_TIMEOUT_SECONDS; gaps below it are given up"""
+    cutoff = timezone.now() - datetime.timedelta(seconds=GAP_TIMEOUT_SECONDS)
+    latest = ChangeEvent.objects.filter(changedat__lt=cutoff).order_by('-changedat').values_list('eventid')[:1]
+    return next((eventid for eventid, in latest), 0)
+
+
+def read_changes(after=0, limit=DEFAULT_BATCH_SIZE, tables=None, gaps=()):
+    """
+    Events with an EventID above `after` or in `gaps`, oldest first.
+
+    Every committed event is handed out at once. The EventIDs skipped below
+    the new position belong to writes that are still open or rolled back;
+    they come back in ChangeBatch.gaps, to be passed to the next read, until
+    they commit or time out. An event filling a gap therefore arrives after
+    higher EventIDs.
+    """
+    limit = min(limit, MAX_BATCH_SIZE)
+    gaps = [gap for gap in gaps if gap <= after]
+    # Read every table, so that rows of other tables are not taken for gaps
+    filled = list(ChangeEvent.objects.filter(eventid__in=gaps)) if gaps else []
+    new = list(ChangeEvent.objects.filter(eventid__gt=after).order_by('eventid')[:limit])
+    seen = {event.eventid for event in filled}
+    horizon = _gap_horizon()
+    open_gaps = [gap for gap in gaps if gap not in seen and gap > horizon]
+    previous = after
+    for event in new:
+        open_gaps.extend(range(max(previous, horizon) + 1, event.eventid))
+        previous = event.eventid
+    events = sorted(filled + new, key=lambda event: event.eventid)
+    if tables:
+        events = [event for event in events if event.tablename in tables]
+    return ChangeBatch(events, previous, sorted(open_gaps)[-MAX_GAPS:], len(new) == limit)
+
+
+def event_dict(event):
+    return {
+        'id': event.eventid,
+        'table': event.tablename,
+        'action': event.action,
+        'key': json.loads(event.rowkey),
+        'at': event.changedat.isoformat(),
+    }
+
+
+class ChangeFeedConsumer:
+    """
+    Tails CHANGE_EVENT for one named consumer, remembering its position in
+    CHANGE_CHECKPOINT:
+
+        feed = ChangeFeedConsumer('search-index', tables=['FLIGHT', 'AIRPORT'])
+        feed.drain(reindex)
+
+    The handler and the checkpoint update share a transaction, so a handler
+    that fails leaves the batch to be delivered again (at-least-once). The
+    checkpoint also keeps the gaps read_changes() is still waiting on. Run
+    one process per consumer name.
+    """
+
+    def __init__(self, name, batch_size=DEFAULT_BATCH_SIZE, tables=None):
+        self.name = name
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.tables = tables
+
+    def position(self):
+        """(EventID of the last event processed, gap EventIDs still expected); (0, []) for a new consumer"""
+        checkpoint = ChangeCheckpoint.objects.filter(consumer=self.name).values_list('lasteventid', 'gaps')
+        after, gaps = next(iter(checkpoint), (0, ''))
+        return after, parse_gaps(gaps)
+
+    def poll(self):
+        """The next ChangeBatch, without moving the checkpoint"""
+        after, gaps = self.position()
+        return read_changes(after, self.batch_size, self.tables, gaps)
+
+    def commit(self, batch):
+        """Move the checkpoint past `batch`"""
+        ChangeCheckpoint.objects.update_or_create(
+            consumer=self.name,
+            defaults={'lasteventid': batch.after, 'gaps': format_gaps(batch.gaps), 'updatedat': timezone.now()},
+        )
+
+    def process(self, handler):
+        """
+        Hand the next events to `handler` and checkpoint them; returns the
+        ChangeBatch, whose `more` is set when the read hit the batch size.
+        """
+        with transaction.atomic():
+            after, gaps = self.position()
+            batch = read_changes(after, self.batch_size, self.tables, gaps)
+            if batch.events:
+                handler(batch.events)
+            if (batch.after, batch.gaps) != (after, gaps):
+                self.commit(batch)
+        return batch
+
+    def drain(self, handler):
+        """process() until the feed is caught up; returns the number of events"""
+        total = 0
+        while True:
+            batch = self.process(handler)
+            total += len(batch.events)
+            if not batch.more:
+                return total
+
+
+def prune_changes(days=DEFAULT_RETENTION_DAYS):
+    """
+    Delete events older than `days` that every consumer has checkpointed
+    past; returns the number deleted.
+    """
+    events = ChangeEvent.objects.filter(changedat__lt=timezone.now() - datetime.timedelta(days=days))
+    slowest = ChangeCheckpoint.objects.aggregate(position=Min('lasteventid'))['position']
+    if slowest is not None:
+        events = events.filter(eventid__lte=slowest)
+    deleted, _ = events.delete()
+    return deleted
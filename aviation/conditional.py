@@ -0,0 +1,189 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Ticket
+from .refdata import ROW_CACHE, version_cache
+from .signals import table_changed
+
+# Tables whose writes the conditional pages depend on
+TRACKED_TABLES = ('FLIGHT', 'TICKET', 'BOOKING', 'PASSENGER', 'AIRLINE', 'AIRPORT', 'AIRCRAFT',
+                  'CREW_ASSIGNMENT', 'CREW_MEMBER', 'COUNTRY')
+# Tables that also keep a stamp per row, for detail pages, and the tables
+# whose writes stamp those rows
+ROW_TABLES = {
+    'FLIGHT': ('FLIGHT', 'TICKET', 'CREW_ASSIGNMENT'),
+    'BOOKING': ('BOOKING', 'TICKET'),
+    'AIRPORT': ('AIRPORT',),
+}
+# Row stamps expire after a day; a missing one is rebuilt from the table stamps
+ROW_STAMP_TIMEOUT = 24 * 60 * 60
+# Backends that live inside one process: a write in one worker would leave
+# the others answering 304 for pages that changed
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',
+                'django.core.cache.backends.dummy.DummyCache')
+
+
+def _key(scope):
+    if isinstance(scope, tuple):
+        table, pk = scope
+        return f'changed:{table}:{pk}'
+    return f'changed:{scope}'
+
+
+def conditional_enabled():
+    """Whether conditional_page answers 304s: AVIATION_CONDITIONAL_GET, or by default only with shared caches"""
+    enabled = getattr(settings, 'AVIATION_CONDITIONAL_GET', None)
+    if enabled is None:
+        aliases = [DEFAULT_CACHE_ALIAS] + [ROW_CACHE] * (ROW_CACHE in settings.CACHES)
+        enabled = all(settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHES for alias in aliases)
+    return enabled
+
+
+def stamp_changes(scopes):
+    """Mark tables and (table, pk) rows as changed now"""
+    now = time.time_ns()
+    tables = {_key(scope): now for scope in scopes if not isinstance(scope, tuple)}
+    rows = {_key(scope): now for scope in scopes if isinstance(scope, tuple)}
+    cache.set_many(tables, None)
+    if rows:
+        version_cache(rows=True).set_many(rows, ROW_STAMP_TIMEOUT)
+
+
+def _ticket_parents(pks):
+    """The flights and bookings of existing tickets, for writers that did not pass `related`"""
+    related = {'FLIGHT': set(), 'BOOKING': set()}
+    for flight, booking in Ticket.objects.filter(ticketid__in=pks).values_list('flightid', 'bookingid'):
+        related['FLIGHT'].add(flight)
+        related['BOOKING'].add(booking)
+    return related
+
+
+@receiver(table_changed)
+def _stamp_write(sender, table, pks, related=None, **kwargs):
+    if table not in TRACKED_TABLES:
+        return
+    scopes = {table}
+    if table in ROW_TABLES:
+        scopes.update((table, pk) for pk in pks)
+    elif table == 'TICKET':
+        # A ticket shows on its flight's and its booking's pages. A deleted
+        # or moved ticket's old parents are only known to the writer.
+        parents = related if related is not None else _ticket_parents(pks)
+        for parent in ('FLIGHT', 'BOOKING'):
+            scopes.update((parent, pk) for pk in parents.get(parent, ()))
+    elif table == 'CREW_ASSIGNMENT':
+        scopes.update(('FLIGHT', flight) for _, flight in pks)
+    stamp_changes(scopes)
+
+
+def change_stamps(scopes):
+    """
+    When each scope last changed, in nanoseconds, read from the shared
+    caches in two calls.
+
+    Table stamps live in the default cache. Row stamps live in the 'rows'
+    alias, away from the table versions; one that was never written, has
+    expired or was evicted starts from the newest stamp of the tables whose
+    writes would have set it, which is never older than the row's own.
+    """
+    tables = {table for table in scopes if not isinstance(table, tuple)}
+    rows = [_key(scope) for scope in scopes if isinstance(scope, tuple)]
+    for scope in scopes:
+        if isinstance(scope, tuple):
+            tables.update(ROW_TABLES[scope[0]])
+    keys = [_key(table) for table in tables]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            # Never written since the cache was cleared: treat it as changed now
+            cache.add(key, time.time_ns(), None)
+            stamps[key] = cache.get(key)
+    row_cache = version_cache(rows=True)
+    row_stamps = row_cache.get_many(rows) if rows else {}
+    result = []
+    for scope in scopes:
+        if isinstance(scope, tuple):
+            key = _key(scope)
+            if key not in row_stamps:
+                row_stamps[key] = max(stamps[_key(table)] for table in ROW_TABLES[scope[0]])
+                row_cache.add(key, row_stamps[key], ROW_STAMP_TIMEOUT)
+            result.append(row_stamps[key])
+        else:
+            result.append(stamps[_key(scope)])
+    return result
+
+
+def conditional_page(scopes, moment=None):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 Not Modified before
+    the view runs any query.
+
+    `scopes(request, *args, **kwargs)` lists the tables and (table, pk) rows
+    the page is built from; the validators change whenever a write view
+    touches one of them. `moment`, if given, returns the minute a
+    time-relative page was rendered for, or None. The ETag also covers the
+    user and CSRF cookie, and pages with messages waiting are always sent.
+    Unless conditional_enabled(), the view just runs.
+    """
+    def decorator(view):
+        def validators(request, *args, **kwargs):
+            if (not conditional_enabled() or request.method not in ('GET', 'HEAD')
+                    or len(get_messages(request))):
+                return None
+            stamps = change_stamps(scopes(request, *args, **kwargs))
+            last_modified = max(stamps) // 10 ** 9
+            at = moment(request, *args, **kwargs) if moment else None
+            if at is not None:
+                last_modified = max(last_modified, int(at.timestamp()))
+            tag = repr((request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME), stamps, at))
+            return f'W/"{hashlib.blake2b(tag.encode(), digest_size=12).hexdigest()}"', last_modified
+
+        def not_modified(request, found):
+            if found is None:
+                return None
+            etag, last_modified = found
+            return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+        def finish(response, found):
+            if found is not None:
+                etag, last_modified = found
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+                # Pages are per user; browsers must revalidate before reuse
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                # request.user and the message storage load synchronously
+                found = await sync_to_async(validators)(request, *args, **kwargs)
+                response = not_modified(request, found)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(response, found)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                found = validators(request, *args, **kwargs)
+                response = not_modified(request, found)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return finish(response, found)
+        return inner
+    return decorator
+
+
+def current_minute(request, *args, **kwargs):
+    """`moment` for pages relative to the current time, such as boards around now"""
+    return timezone.now().replace(second=0, microsecond=0)
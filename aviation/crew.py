@@ -0,0 +1,258 @@
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CrewAssignment, CrewMember, Flight
+from .signals import notify_write
+
+# Crew report this long before the first departure of a duty and are
+# released this long after its last arrival
+REPORT_BEFORE = datetime.timedelta(minutes=60)
+RELEASE_AFTER = datetime.timedelta(minutes=30)
+# Ground time longer than this between two legs ends the duty period
+MAX_SIT = datetime.timedelta(hours=4)
+MAX_DUTY = datetime.timedelta(hours=13)
+MIN_REST = datetime.timedelta(hours=10)
+# Rolling limit on duty time
+CUMULATIVE_WINDOW = datetime.timedelta(days=7)
+MAX_CUMULATIVE_DUTY = datetime.timedelta(hours=60)
+# A trip away from base must be back within this long
+MAX_AWAY = datetime.timedelta(days=4)
+
+MAX_BULK_ASSIGNMENTS = 2000
+
+LEG_COLUMNS = ('crewid', 'flightid', 'flightid__flightnumber', 'flightid__scheduleddeparture',
+               'flightid__scheduledarrival', 'flightid__departureairportcode', 'flightid__arrivalairportcode')
+
+
+class CrewLeg:
+    __slots__ = ('crew', 'flight_id', 'flight_number', 'departure', 'arrival', 'origin', 'destination')
+
+    def __init__(self, crew, flight_id, flight_number, departure, arrival, origin, destination):
+        self.crew = crew
+        self.flight_id = flight_id
+        self.flight_number = flight_number
+        self.departure = departure
+        self.arrival = arrival
+        self.origin = origin
+        self.destination = destination
+
+
+class Duty:
+    """Consecutive legs flown between report and release"""
+
+    def __init__(self, legs):
+        self.legs = legs
+        self.report = legs[0].departure - REPORT_BEFORE
+        self.release = legs[-1].arrival + RELEASE_AFTER
+
+    @property
+    def length(self):
+        return self.release - self.report
+
+
+class RosterIssue:
+    def __init__(self, kind, crew, first, second, detail):
+        self.kind = kind
+        self.crew = crew
+        self.first = first
+        self.second = second
+        self.detail = detail
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'crew': self.crew,
+            'flights': [self.first.flight_number, self.second.flight_number],
+            'flightids': [self.first.flight_id, self.second.flight_id],
+            'detail': self.detail,
+        }
+
+
+def _hours(delta):
+    return f'{delta.total_seconds() / 3600:.1f}h'
+
+
+def _when(moment):
+    return f'{timezone.localtime(moment):%Y-%m-%d %H:%M}'
+
+
+class CrewTimeline:
+    """
+    One crew member's legs ordered by departure, split into duty periods.
+
+    Every check is a single pass over the sorted legs or duties; the rolling
+    duty limit keeps a two-pointer window over the duties instead of
+    re-summing each week.
+    """
+
+    def __init__(self, crew, base, legs):
+        self.crew = crew
+        self.base = base
+        self.legs = sorted(legs, key=lambda leg: (leg.departure, leg.flight_id))
+        self.duties = []
+        current = []
+        for leg in self.legs:
+            if current and leg.departure - current[-1].arrival > MAX_SIT:
+                self.duties.append(Duty(current))
+                current = []
+            current.append(leg)
+        if current:
+            self.duties.append(Duty(current))
+
+    def limit_issues(self):
+        """Double bookings, over-long duties, short rests and the rolling duty limit"""
+        issues = []
+        latest = None
+        for leg in self.legs:
+            if latest is not None and leg.departure < latest.arrival:
+                issues.append(RosterIssue('overlap', self.crew, latest, leg,
+                                          f'departs {_when(leg.departure)} before {latest.flight_number} '
+                                          f'lands at {_when(latest.arrival)}'))
+            if latest is None or leg.arrival > latest.arrival:
+                latest = leg
+
+        window_start = 0
+        window_total = datetime.timedelta()
+        exceeded = False
+        for i, duty in enumerate(self.duties):
+            if duty.length > MAX_DUTY:
+                issues.append(RosterIssue('duty', self.crew, duty.legs[0], duty.legs[-1],
+                                          f'duty of {_hours(duty.length)}, limit {_hours(MAX_DUTY)}'))
+            if i:
+                rest = duty.report - self.duties[i - 1].release
+                if rest < MIN_REST:
+                    issues.append(RosterIssue('rest', self.crew, self.duties[i - 1].legs[-1], duty.legs[0],
+                                              f'rest of {_hours(rest)}, {_hours(MIN_REST)} needed'))
+            window_total += duty.length
+            while self.duties[window_start].release <= duty.release - CUMULATIVE_WINDOW:
+                window_total -= self.duties[window_start].length
+                window_start += 1
+            if window_total > MAX_CUMULATIVE_DUTY and not exceeded:
+                issues.append(RosterIssue('cumulative', self.crew, self.duties[window_start].legs[0],
+                                          duty.legs[-1],
+                                          f'{_hours(window_total)} on duty within '
+                                          f'{CUMULATIVE_WINDOW.days} days, limit {_hours(MAX_CUMULATIVE_DUTY)}'))
+            exceeded = window_total > MAX_CUMULATIVE_DUTY
+        return issues
+
+    def base_issues(self):
+        """Legs that do not follow on from the crew's position and trips that do not return to base"""
+        issues = []
+        position = self.base
+        previous = outbound = None
+        for leg in self.legs:
+            if previous is not None and leg.origin != position:
+                issues.append(RosterIssue('position', self.crew, previous, leg,
+                                          f'departs airport {leg.origin} but the crew is at airport {position}'))
+            if outbound is None and leg.origin == self.base and leg.destination != self.base:
+                outbound = leg
+            elif outbound is not None and leg.destination == self.base:
+                if leg.arrival - outbound.departure > MAX_AWAY:
+                    issues.append(RosterIssue('base', self.crew, outbound, leg,
+                                              f'away from base airport {self.base} for '
+                                              f'{_hours(leg.arrival - outbound.departure)}, '
+                                              f'limit {MAX_AWAY.days} days'))
+                outbound = None
+            position = leg.destination
+            previous = leg
+        if outbound is not None:
+            issues.append(RosterIssue('base', self.crew, outbound, previous,
+                                      f'does not return to base airport {self.base}'))
+        return issues
+
+
+def _legs(queryset):
+    legs = {}
+    for row in queryset.exclude(flightid__flightstatus='Cancelled').values_list(*LEG_COLUMNS).iterator():
+        legs.setdefault(row[0], []).append(CrewLeg(*row))
+    return legs
+
+
+def roster_issues(airline, start, end):
+    """
+    Every legality issue in the rosters of an airline's crew for legs
+    departing in [start, end).
+
+    All assignments are read in one query, starting far enough before
+    `start` for the rest and rolling-duty checks to see the preceding legs;
+    issues that end before `start` are left out.
+    """
+    bases = dict(CrewMember.objects.filter(airlineid=airline).values_list('crewid', 'airportcode'))
+    legs = _legs(CrewAssignment.objects.filter(
+        crewid__airlineid=airline,
+        flightid__scheduleddeparture__gte=start - max(CUMULATIVE_WINDOW, MAX_AWAY),
+        flightid__scheduleddeparture__lt=end,
+    ))
+    issues = []
+    for crew in sorted(legs):
+        timeline = CrewTimeline(crew, bases.get(crew), legs[crew])
+        found = timeline.limit_issues() + timeline.base_issues()
+        issues.extend(issue for issue in found if issue.second.departure >= start)
+    return {'crew': len(bases), 'rostered': len(legs),
+            'legs': sum(len(crew_legs) for crew_legs in legs.values()), 'issues': issues}
+
+
+def check_assignments(crew_ids, flight_ids):
+    """
+    Messages describing the duty limits that assigning every crew member in
+    `crew_ids` to every flight in `flight_ids` would break.
+
+    Only limit issues that involve one of the new legs are reported; base
+    return is left to the roster check because trips are often assigned
+    one leg at a time.
+    """
+    flights = list(Flight.objects.filter(flightid__in=flight_ids).exclude(flightstatus='Cancelled').values_list(
+        'flightid', 'flightnumber', 'scheduleddeparture', 'scheduledarrival',
+        'departureairportcode', 'arrivalairportcode'))
+    if not flights or not crew_ids:
+        return []
+    margin = max(CUMULATIVE_WINDOW, MAX_SIT + MIN_REST + MAX_DUTY)
+    legs = _legs(CrewAssignment.objects.filter(
+        crewid__in=crew_ids,
+        flightid__scheduleddeparture__gte=min(f[2] for f in flights) - margin,
+        flightid__scheduleddeparture__lt=max(f[3] for f in flights) + margin,
+    ).exclude(flightid__in=flight_ids))
+    new = {f[0] for f in flights}
+    errors = []
+    for crew in crew_ids:
+        timeline = CrewTimeline(crew, None, legs.get(crew, []) + [CrewLeg(crew, *f) for f in flights])
+        for issue in timeline.limit_issues():
+            if issue.first.flight_id in new or issue.second.flight_id in new:
+                errors.append(f'Crew #{crew} on {issue.first.flight_number} and '
+                              f'{issue.second.flight_number}: {issue.detail}')
+    return errors
+
+
+def assign_crew(crew_ids, flight_ids):
+    """Assign every crew member to every flight, skipping existing assignments; returns the pairs added"""
+    existing = set(CrewAssignment.objects.filter(crewid__in=crew_ids, flightid__in=flight_ids)
+                   .values_list('crewid', 'flightid'))
+    pairs = [(crew, flight) for crew in crew_ids for flight in flight_ids if (crew, flight) not in existing]
+    if not pairs:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.executemany("INSERT INTO CREW_ASSIGNMENT (CrewID, FlightID, AssignedAt) VALUES (%s, %s, %s)",
+                               [[crew, flight, now] for crew, flight in pairs])
+        notify_write('CREW_ASSIGNMENT', 'insert', None, len(pairs), pks=pairs)
+    return pairs
+
+
+def unassign_crew(crew_ids, flight_ids):
+    """Remove the assignments of the crew members to the flights; returns the number removed"""
+    with transaction.atomic():
+        # Lock the pairs that exist, so only they are deleted and announced
+        pairs = list(CrewAssignment.objects.select_for_update().filter(crewid__in=crew_ids, flightid__in=flight_ids)
+                     .order_by('crewid', 'flightid').values_list('crewid', 'flightid'))
+        if not pairs:
+            return 0
+        crew_marks = ', '.join(['%s'] * len(crew_ids))
+        flight_marks = ', '.join(['%s'] * len(flight_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM CREW_ASSIGNMENT WHERE CrewID IN ({crew_marks}) "
+                           f"AND FlightID IN ({flight_marks})", list(crew_ids) + list(flight_ids))
+        notify_write('CREW_ASSIGNMENT', 'delete', None, len(pairs), pks=pairs)
+    return len(pairs)
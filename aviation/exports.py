@@ -0,0 +1,211 @@
+import csv
+import datetime
+import itertools
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Booking, Flight, Passenger, Ticket
+from .routers import read_alias
+
+# Rows pulled from the database cursor per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ExportSpec:
+    """Which columns an export emits and how its filters map onto the model"""
+
+    def __init__(self, model, columns, date_field=None, status_field=None, airline_filter=None):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+        self.status_field = status_field
+        self.airline_filter = airline_filter
+
+
+EXPORTS = {
+    'flights': ExportSpec(
+        Flight,
+        ['flightid', 'flightnumber', 'scheduleddeparture', 'scheduledarrival',
+         'actualdeparture', 'actualarrival', 'flightstatus', 'airlineid',
+         'aircraftid', 'departureairportcode', 'arrivalairportcode',
+         'departuregatenumber', 'arrivalgatenumber'],
+        date_field='scheduleddeparture',
+        status_field='flightstatus',
+        airline_filter=lambda qs, airline_id: qs.filter(airlineid=airline_id),
+    ),
+    'bookings': ExportSpec(
+        Booking,
+        ['bookingid', 'bookingdate', 'totalamount', 'bookingstatus',
+         'bookingchannel', 'passengerid', 'currencycode'],
+        date_field='bookingdate',
+        status_field='bookingstatus',
+        airline_filter=lambda qs, airline_id: qs.filter(Exists(
+            Ticket.objects.filter(bookingid=OuterRef('pk'), flightid__airlineid=airline_id)
+        )),
+    ),
+    'tickets': ExportSpec(
+        Ticket,
+        ['ticketid', 'seatnumber', 'ticketstatus', 'checkedina', 'bookingid',
+         'flightid', 'seatclass', 'passengerid'],
+        date_field='flightid__scheduleddeparture',
+        status_field='ticketstatus',
+        airline_filter=lambda qs, airline_id: qs.filter(flightid__airlineid=airline_id),
+    ),
+    'passengers': ExportSpec(
+        Passenger,
+        ['passengerid', 'firstname', 'lastname', 'email', 'phone', 'dateofbirth',
+         'passportnumber', 'countrycode', 'nationality'],
+    ),
+}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _date_param(params, name):
+    """A YYYY-MM-DD query parameter; None when it is missing or not a real date, such as 2024-02-30"""
+    try:
+        return parse_date(params.get(name, '') or '')
+    except ValueError:
+        return None
+
+
+def build_queryset(spec, params):
+    """Apply the date range, airline and status filters from the query string"""
+    queryset = spec.model.objects.all()
+
+    if spec.date_field:
+        date_from = _date_param(params, 'from')
+        date_to = _date_param(params, 'to')
+        if date_to == datetime.date.max:
+            # Nothing lies beyond it, and the day after cannot be represented
+            date_to = None
+        if date_from:
+            queryset = queryset.filter(**{f'{spec.date_field}__gte': _start_of_day(date_from)})
+        if date_to:
+            # The end date is inclusive
+            queryset = queryset.filter(**{
+                f'{spec.date_field}__lt': _start_of_day(date_to + datetime.timedelta(days=1))
+            })
+
+    airline = params.get('airline')
+    if spec.airline_filter and airline and airline.isdigit():
+        queryset = spec.airline_filter(queryset, int(airline))
+
+    status = params.get('status')
+    if spec.status_field and status:
+        queryset = queryset.filter(**{spec.status_field: status})
+
+    return queryset.order_by('pk').values_list(*spec.columns)
+
+
+def stream_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield result rows without buffering the whole result set.
+
+    MySQL drivers buffer results client-side unless an unbuffered (server-side)
+    cursor is requested, so on MySQL the query runs through an SSCursor, with
+    the same field converters (aware datetimes, decimals) QuerySet.iterator()
+    applies. Other backends stream through QuerySet.iterator().
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'mysql':
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    from MySQLdb.cursors import SSCursor
+
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+    connection.ensure_connection()
+    cursor = connection.connection.cursor(SSCursor)
+
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    try:
+        cursor.execute(sql, params)
+        yield from compiler.results_iter(results=chunks(), tuple_expected=True)
+    finally:
+        cursor.close()
+
+
+async def async_lines(lines, batch=EXPORT_CHUNK_SIZE):
+    """
+    Serve a synchronous line generator to an ASGI server `batch` lines at a
+    time.
+
+    Under ASGI, StreamingHttpResponse reads a sync iterator to the end before
+    sending anything. Each batch is pulled on the request's sync thread,
+    which holds the database connection, and sent as one chunk.
+    """
+    take = sync_to_async(lambda: list(itertools.islice(lines, batch)))
+    try:
+        while chunk := await take():
+            yield ''.join(chunk)
+    finally:
+        # Closes the database cursor on its own thread, even if the client went away
+        await sync_to_async(lines.close)()
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_json_value, row)))) + '\n'
+
+
+def export_response(request, name):
+    """Stream the named export as CSV (default) or NDJSON (?format=ndjson)"""
+    spec = EXPORTS.get(name)
+    if spec is None:
+        raise Http404('Unknown export')
+
+    # The rows are read after the view returns, so pick the database now
+    rows = stream_rows(build_queryset(spec, request.GET).using(read_alias()))
+    stamp = timezone.localdate().isoformat()
+
+    if request.GET.get('format') == 'ndjson':
+        lines, content_type, extension = ndjson_lines(spec.columns, rows), 'application/x-ndjson', 'ndjson'
+    else:
+        lines, content_type, extension = csv_lines(spec.columns, rows), 'text/csv', 'csv'
+    if isinstance(request, ASGIRequest):
+        lines = async_lines(lines)
+
+    response = StreamingHttpResponse(lines, content_type=content_type)
+
+    response['Content-Disposition'] = f'attachment; filename="{name}-{stamp}.{extension}"'
+    return response
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import render
+
+from .metrics import current_request_metrics, recording_queries
+
+# Threads, and so at most this many extra database connections per process
+DEFAULT_QUERY_WORKERS = 8
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'AVIATION_QUERY_WORKERS', DEFAULT_QUERY_WORKERS),
+                thread_name_prefix='aviation-query',
+            )
+        return _executor
+
+
+def _run(func):
+    # Pool threads keep their own connections between calls; recycle them
+    # the way Django does at the start and end of a request
+    close_old_connections()
+    try:
+        with recording_queries(current_request_metrics()):
+            return func()
+    finally:
+        close_old_connections()
+
+
+async def run_query(func):
+    """
+    Await the synchronous ORM callable `func` on a pool thread.
+
+    Each pool thread has its own database connection, so calls awaited
+    together really do run at the same time, unlike sync_to_async, which
+    serialises them on one thread. The request's metrics still see every
+    statement.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_pool(), context.run, _run, func)
+
+
+async def gather_queries(**calls):
+    """Run each callable concurrently with run_query(); returns their results under the same names"""
+    results = await asyncio.gather(*(run_query(func) for func in calls.values()))
+    return dict(zip(calls, results))
+
+
+async def render_async(request, template_name, context):
+    """render() for async views; templates still read the session and request.user synchronously"""
+    return await sync_to_async(render)(request, template_name, context)
@@ -53,4 +53,17 @@ class BookingForm(forms.Form):
         ('Travel Agent', 'Travel Agent')
     ])
     passengerid = forms.IntegerField(label='Passenger ID')
-    currencycode = forms.IntegerField(label='Currency Code')
\ No newline at end of file
+    currencycode = forms.IntegerField(label='Currency Code')
+
+class TicketForm(forms.Form):
+    ticketid = forms.IntegerField(label='Ticket ID')
+    seatnumber = forms.CharField(max_length=10, label='Seat Number')
+    ticketstatus = forms.CharField(max_length=20, label='Ticket Status')
+    checkedinat = forms.DateTimeField(label='Checked In At', required=False)
+    bookingid = forms.IntegerField(label='Booking ID')
+    flightid = forms.IntegerField(label='Flight ID')
+    seatclass = forms.IntegerField(label='Seat Class')
+    passengerid = forms.IntegerField(label='Passenger ID')
+
+class BulkUploadForm(forms.Form):
+    file = forms.FileField(label='CSV File')
@@ -0,0 +1,304 @@
+import bisect
+import datetime
+import heapq
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Flight
+
+# How long a flight holds its gate around the scheduled times
+DEPARTURE_GATE_BEFORE = datetime.timedelta(minutes=45)
+DEPARTURE_GATE_AFTER = datetime.timedelta(minutes=10)
+ARRIVAL_GATE_BEFORE = datetime.timedelta(minutes=10)
+ARRIVAL_GATE_AFTER = datetime.timedelta(minutes=30)
+
+PADDING = max(DEPARTURE_GATE_BEFORE, DEPARTURE_GATE_AFTER, ARRIVAL_GATE_BEFORE, ARRIVAL_GATE_AFTER)
+
+
+class Occupancy:
+    __slots__ = ('start', 'end', 'flight_id', 'flight_number', 'kind', 'airport', 'terminal', 'gate')
+
+    def __init__(self, start, end, flight_id, flight_number, kind, airport, terminal, gate):
+        self.start = start
+        self.end = end
+        self.flight_id = flight_id
+        self.flight_number = flight_number
+        self.kind = kind
+        self.airport = airport
+        self.terminal = terminal
+        self.gate = gate
+
+    def overlaps(self, start, end):
+        return self.start < end and start < self.end
+
+
+def departure_occupancy(flight_id, flight_number, departure, airport, terminal, gate):
+    return Occupancy(departure - DEPARTURE_GATE_BEFORE, departure + DEPARTURE_GATE_AFTER,
+                     flight_id, flight_number, 'departure', airport, terminal, gate)
+
+
+def arrival_occupancy(flight_id, flight_number, arrival, airport, terminal, gate):
+    return Occupancy(arrival - ARRIVAL_GATE_BEFORE, arrival + ARRIVAL_GATE_AFTER,
+                     flight_id, flight_number, 'arrival', airport, terminal, gate)
+
+
+class GateSchedule:
+    """
+    Sorted-interval index of gate occupancy keyed by (terminal, gate).
+
+    Each gate's intervals are sorted by start with a running maximum of the
+    end times, so an overlap query bisects to the last interval starting
+    before the query ends and walks back only while an earlier interval
+    could still reach into the query window.
+    """
+
+    def __init__(self, occupancies):
+        by_gate = {}
+        for occupancy in occupancies:
+            by_gate.setdefault((occupancy.terminal, occupancy.gate), []).append(occupancy)
+        self.gates = {}
+        for key, intervals in by_gate.items():
+            intervals.sort(key=lambda o: (o.start, o.end))
+            reach = []
+            furthest = None
+            for occupancy in intervals:
+                furthest = occupancy.end if furthest is None else max(furthest, occupancy.end)
+                reach.append(furthest)
+            self.gates[key] = (intervals, [o.start for o in intervals], reach)
+
+    def overlapping(self, terminal, gate, start, end, exclude=None):
+        """Occupancies of one gate that overlap [start, end)"""
+        entry = self.gates.get((terminal, gate))
+        if entry is None:
+            return []
+        intervals, starts, reach = entry
+        found = []
+        i = bisect.bisect_left(starts, end) - 1
+        while i >= 0 and reach[i] > start:
+            occupancy = intervals[i]
+            if occupancy.end > start and occupancy.flight_id != exclude:
+                found.append(occupancy)
+            i -= 1
+        found.reverse()
+        return found
+
+    def conflicts(self):
+        """
+        Every pair of overlapping occupancies, gate by gate.
+
+        A sweep over each gate's intervals in start order with a heap of the
+        ones still open: O(n log n) plus the number of conflicts reported.
+        """
+        pairs = []
+        for (terminal, gate), (intervals, _, _) in sorted(self.gates.items(), key=lambda item: item[0]):
+            active = []
+            for occupancy in intervals:
+                while active and active[0][0] <= occupancy.start:
+                    heapq.heappop(active)
+                for _, _, other in active:
+                    if other.flight_id != occupancy.flight_id:
+                        pairs.append((other, occupancy))
+                heapq.heappush(active, (occupancy.end, id(occupancy), occupancy))
+        return pairs
+
+
+def _departures(queryset):
+    rows = queryset.values_list('flightid', 'flightnumber', 'scheduleddeparture', 'departureairportcode',
+                                'departureterminalid', 'departuregatenumber')
+    return [departure_occupancy(*row) for row in rows.iterator()]
+
+
+def _arrivals(queryset):
+    rows = queryset.values_list('flightid', 'flightnumber', 'scheduledarrival', 'arrivalairportcode',
+                                'arrivalterminalid', 'arrivalgatenumber')
+    return [arrival_occupancy(*row) for row in rows.iterator()]
+
+
+def _scheduled():
+    return Flight.objects.exclude(flightstatus='Cancelled')
+
+
+def gate_schedule_for_day(date, airport=None):
+    """GateSchedule of every occupancy that touches `date`, optionally at one airport"""
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    end = start + datetime.timedelta(days=1)
+    departures = _scheduled().filter(scheduleddeparture__gte=start - PADDING,
+                                     scheduleddeparture__lt=end + PADDING)
+    arrivals = _scheduled().filter(scheduledarrival__gte=start - PADDING,
+                                   scheduledarrival__lt=end + PADDING)
+    if airport is not None:
+        departures = departures.filter(departureairportcode=airport)
+        arrivals = arrivals.filter(arrivalairportcode=airport)
+    occupancies = [o for o in _departures(departures) + _arrivals(arrivals) if o.overlaps(start, end)]
+    return GateSchedule(occupancies)
+
+
+def day_conflicts(date, airport=None):
+    return gate_schedule_for_day(date, airport).conflicts()
+
+
+def check_gates(flight_id, departure, departure_terminal, departure_gate,
+                arrival, arrival_terminal, arrival_gate):
+    """
+    Messages describing gate double-bookings the given schedule would cause.
+
+    Only the flights that could hold either gate during the new flight's
+    gate windows are read (one indexed range query per gate), then checked
+    against the same sorted-interval index the daily report uses.
+    """
+    wanted = [
+        departure_occupancy(flight_id, None, departure, None, departure_terminal, departure_gate),
+        arrival_occupancy(flight_id, None, arrival, None, arrival_terminal, arrival_gate),
+    ]
+    existing = []
+    for occupancy in wanted:
+        window = Q(scheduleddeparture__gte=occupancy.start - PADDING,
+                   scheduleddeparture__lt=occupancy.end + PADDING)
+        existing += _departures(_scheduled().filter(
+            window, departureterminalid=occupancy.terminal, departuregatenumber=occupancy.gate))
+        window = Q(scheduledarrival__gte=occupancy.start - PADDING,
+                   scheduledarrival__lt=occupancy.end + PADDING)
+        existing += _arrivals(_scheduled().filter(
+            window, arrivalterminalid=occupancy.terminal, arrivalgatenumber=occupancy.gate))
+    # The two gates may be the same one
+    unique = {(o.flight_id, o.kind): o for o in existing}
+    schedule = GateSchedule(unique.values())
+
+    errors = []
+    for occupancy in wanted:
+        for other in schedule.overlapping(occupancy.terminal, occupancy.gate,
+                                          occupancy.start, occupancy.end, exclude=flight_id):
+            errors.append(_held(occupancy, other))
+    return errors
+
+
+def _held(occupancy, other):
+    return (
+        f'{occupancy.kind.capitalize()} gate {occupancy.gate} (terminal {occupancy.terminal}) '
+        f'is already held by flight {other.flight_number} ({other.kind}) from '
+        f'{timezone.localtime(other.start):%Y-%m-%d %H:%M} to {timezone.localtime(other.end):%H:%M}'
+    )
+
+
+def check_gate_rows(rows):
+    """
+    Gate checks for validated flight rows about to be inserted.
+
+    Returns {line: message} for rows whose departure or arrival gate is
+    already held, by an existing flight or by an earlier row of the batch;
+    rows earlier in the batch hold their gates for the rows after them.
+    Existing flights at the rows' gates are read with one range query per
+    direction.
+    """
+    wanted = []
+    for line, cleaned in rows:
+        if cleaned['flightstatus'] == 'Cancelled':
+            continue
+        flight = (cleaned['flightid'], cleaned['flightnumber'])
+        wanted.append((line, [
+            departure_occupancy(*flight, cleaned['scheduleddeparture'], cleaned['departureairportcode'],
+                                cleaned['departureterminalid'], cleaned['departuregatenumber']),
+            arrival_occupancy(*flight, cleaned['scheduledarrival'], cleaned['arrivalairportcode'],
+                              cleaned['arrivalterminalid'], cleaned['arrivalgatenumber']),
+        ]))
+    if not wanted:
+        return {}
+    occupancies = [occupancy for _, pair in wanted for occupancy in pair]
+    start = min(occupancy.start for occupancy in occupancies) - PADDING
+    end = max(occupancy.end for occupancy in occupancies) + PADDING
+    terminals = {occupancy.terminal for occupancy in occupancies}
+    gates = {occupancy.gate for occupancy in occupancies}
+    used = {(occupancy.terminal, occupancy.gate) for occupancy in occupancies}
+    departures = _scheduled().filter(scheduleddeparture__gte=start, scheduleddeparture__lt=end,
+                                     departureterminalid__in=terminals, departuregatenumber__in=gates)
+    arrivals = _scheduled().filter(scheduledarrival__gte=start, scheduledarrival__lt=end,
+                                   arrivalterminalid__in=terminals, arrivalgatenumber__in=gates)
+    schedule = GateSchedule(o for o in _departures(departures) + _arrivals(arrivals)
+                            if (o.terminal, o.gate) in used)
+
+    # (terminal, gate) -> occupancies of the rows accepted so far
+    taken = {}
+    rejected = {}
+    for line, pair in wanted:
+        errors = []
+        for occupancy in pair:
+            key = (occupancy.terminal, occupancy.gate)
+            others = schedule.overlapping(*key, occupancy.start, occupancy.end, exclude=occupancy.flight_id)
+            others += [other for other in taken.get(key, ()) if other.overlaps(occupancy.start, occupancy.end)]
+            errors += [_held(occupancy, other) for other in others]
+        if errors:
+            rejected[line] = '; '.join(errors)
+        else:
+            for occupancy in pair:
+                taken.setdefault((occupancy.terminal, occupancy.gate), []).append(occupancy)
+    return rejected
+
+
+def parse_schedule_time(value):
+    """An aware datetime from a form value or a datetime-local string"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+# Flight columns that decide which gates a flight holds, and when
+GATE_FIELDS = ('scheduleddeparture', 'scheduledarrival', 'departureterminalid', 'departuregatenumber',
+               'arrivalterminalid', 'arrivalgatenumber')
+
+
+def _minute(value):
+    # datetime-local inputs carry no seconds
+    return value.replace(second=0, microsecond=0)
+
+
+def schedule_changed(flight, data, fields):
+    """
+    Whether submitted flight data differs from the stored `flight` in any of
+    `fields`, or reinstates a cancelled flight. Unparseable values count as
+    changed.
+    """
+    if flight.flightstatus == 'Cancelled':
+        return True
+    for field in fields:
+        stored = flight.serializable_value(field)
+        submitted = data.get(field)
+        try:
+            if isinstance(stored, datetime.datetime):
+                submitted = parse_schedule_time(submitted)
+                if submitted is None or _minute(submitted) != _minute(stored):
+                    return True
+            elif int(submitted) != stored:
+                return True
+        except (TypeError, ValueError):
+            return True
+    return False
+
+
+def check_flight_gates(flight_id, data, current=None):
+    """
+    check_gates() for a flight form's cleaned data or raw POST values.
+
+    A cancelled flight holds no gates, and an edit (`current` is the stored
+    flight) that leaves the schedule, terminals and gates alone is not
+    checked, so existing conflicts never block cancelling a flight or
+    recording its actual times.
+    """
+    if data.get('flightstatus') == 'Cancelled':
+        return []
+    if current is not None and not schedule_changed(current, data, GATE_FIELDS):
+        return []
+    try:
+        departure = parse_schedule_time(data.get('scheduleddeparture'))
+        arrival = parse_schedule_time(data.get('scheduledarrival'))
+        gates = [int(data.get(field)) for field in ('departureterminalid', 'departuregatenumber',
+                                                    'arrivalterminalid', 'arrivalgatenumber')]
+    except (TypeError, ValueError):
+        # Malformed input is reported by the form or the database instead
+        return []
+    if departure is None or arrival is None:
+        return []
+    return check_gates(int(flight_id), departure, gates[0], gates[1], arrival, gates[2], gates[3])
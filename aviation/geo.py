@@ -0,0 +1,242 @@
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+from django.db import connection, transaction
+
+from .models import Route
+from .refdata import reference_data
+from .signals import notify_write
+
+EARTH_RADIUS_KM = 6371.0088
+
+DEFAULT_NEAREST = 5
+MAX_NEAREST = 50
+MAX_RADIUS_KM = 5000
+# Stored route distances further than this fraction from great-circle are flagged
+DEFAULT_TOLERANCE = 0.1
+ROUTE_BATCH = 2000
+# Leaves of the KD-tree hold up to this many airports
+LEAF_SIZE = 16
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_many(lat1, lon1, lat2, lon2):
+    """
+    Element-wise great-circle distances for equal-length sequences of points.
+
+    Vectorised with NumPy when it is installed; falls back to a Python loop.
+    """
+    if np is None:
+        return [haversine_km(*point) for point in zip(lat1, lon1, lat2, lon2)]
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))).tolist()
+
+
+def _unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord(km):
+    """Straight-line distance through the unit sphere for an arc of `km`"""
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def _squared(a, b):
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+class _Node:
+    __slots__ = ('axis', 'split', 'left', 'right', 'items')
+
+    def __init__(self, axis=None, split=None, left=None, right=None, items=None):
+        self.axis = axis
+        self.split = split
+        self.left = left
+        self.right = right
+        self.items = items
+
+
+def _build(items, depth=0):
+    if len(items) <= LEAF_SIZE:
+        return _Node(items=items)
+    axis = depth % 3
+    items.sort(key=lambda item: item[1][axis])
+    middle = len(items) // 2
+    return _Node(axis, items[middle][1][axis],
+                 _build(items[:middle], depth + 1), _build(items[middle:], depth + 1))
+
+
+class AirportIndex:
+    """
+    Airport coordinates with a KD-tree for proximity queries.
+
+    Points are stored as unit vectors, where straight-line (chord) distance
+    grows monotonically with great-circle distance, so the tree needs no
+    special handling for the antimeridian or the poles.
+    """
+
+    def __init__(self, airports):
+        located = [a for a in airports if a.latitude is not None and a.longitude is not None]
+        self.codes = [a.airportcode for a in located]
+        self.names = {a.airportcode: a.airportname for a in located}
+        latitudes = [float(a.latitude) for a in located]
+        longitudes = [float(a.longitude) for a in located]
+        if np is not None:
+            self.latitudes = np.array(latitudes)
+            self.longitudes = np.array(longitudes)
+        else:
+            self.latitudes = latitudes
+            self.longitudes = longitudes
+        self.position = {code: i for i, code in enumerate(self.codes)}
+        items = [(i, _unit_vector(lat, lon)) for i, (lat, lon) in enumerate(zip(latitudes, longitudes))]
+        self.root = _build(items)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def coordinates(self, code):
+        i = self.position.get(code)
+        if i is None:
+            return None
+        return float(self.latitudes[i]), float(self.longitudes[i])
+
+    def _result(self, i, lat, lon):
+        code = self.codes[i]
+        distance = haversine_km(lat, lon, float(self.latitudes[i]), float(self.longitudes[i]))
+        return {'airport': code, 'name': self.names[code], 'distance_km': round(distance, 1)}
+
+    def nearest(self, lat, lon, k=DEFAULT_NEAREST):
+        """The k airports closest to a point, nearest first"""
+        target = _unit_vector(lat, lon)
+        best = []  # max-heap of (-squared chord, index)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.items is not None:
+                for i, point in node.items:
+                    entry = (-_squared(point, target), i)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+                continue
+            offset = target[node.axis] - node.split
+            near, far = (node.right, node.left) if offset >= 0 else (node.left, node.right)
+            if len(best) < k or offset * offset < -best[0][0]:
+                stack.append(far)
+            stack.append(near)
+        ranked = sorted(best, reverse=True)
+        return [self._result(i, lat, lon) for _, i in ranked]
+
+    def within(self, lat, lon, radius_km):
+        """Airports within `radius_km` of a point, nearest first"""
+        target = _unit_vector(lat, lon)
+        limit = _chord(radius_km) ** 2
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.items is not None:
+                found.extend(i for i, point in node.items if _squared(point, target) <= limit)
+                continue
+            offset = target[node.axis] - node.split
+            if offset >= 0 or offset * offset <= limit:
+                stack.append(node.right)
+            if offset < 0 or offset * offset <= limit:
+                stack.append(node.left)
+        results = [self._result(i, lat, lon) for i in found]
+        results.sort(key=lambda result: result['distance_km'])
+        return results
+
+
+_index = None
+_source = None
+
+
+def airport_index():
+    """
+    The process-wide AirportIndex.
+
+    It is rebuilt whenever the cached AIRPORT reference snapshot is reloaded,
+    so airport edits are picked up the same way as the form dropdowns.
+    """
+    global _index, _source
+    airports = reference_data('AIRPORT')
+    if airports is not _source:
+        _index = AirportIndex(airports)
+        _source = airports
+    return _index
+
+
+def route_distance_km(origin, destination):
+    """Great-circle distance between two airports, or None if either has no coordinates"""
+    index = airport_index()
+    start, end = index.coordinates(origin), index.coordinates(destination)
+    if start is None or end is None:
+        return None
+    return haversine_km(*start, *end)
+
+
+def route_distance_report(tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare every ROUTE.DistanceKM with the great-circle distance of its airports.
+
+    Routes are read and measured in batches of ROUTE_BATCH. Returns a dict
+    with the number of routes checked, the routes whose airports lack
+    coordinates, and (route id, stored km, computed km) for every route whose
+    distance is missing or differs by more than `tolerance` (a fraction).
+    """
+    index = airport_index()
+    report = {'checked': 0, 'unlocated': [], 'mismatched': []}
+    rows = Route.objects.values_list('routeid', 'originairportcode', 'destinationairportcode', 'distancekm')
+    batch = []
+    for row in rows.order_by('routeid').iterator(chunk_size=ROUTE_BATCH):
+        batch.append(row)
+        if len(batch) >= ROUTE_BATCH:
+            _check_batch(index, batch, tolerance, report)
+            batch = []
+    if batch:
+        _check_batch(index, batch, tolerance, report)
+    return report
+
+
+def _check_batch(index, batch, tolerance, report):
+    located = []
+    for route_id, origin, destination, stored in batch:
+        start, end = index.coordinates(origin), index.coordinates(destination)
+        if start is None or end is None:
+            report['unlocated'].append(route_id)
+        else:
+            located.append((route_id, stored, start, end))
+    computed = haversine_many([start[0] for _, _, start, _ in located], [start[1] for _, _, start, _ in located],
+                              [end[0] for _, _, _, end in located], [end[1] for _, _, _, end in located])
+    report['checked'] += len(batch)
+    for (route_id, stored, _, _), km in zip(located, computed):
+        if not stored or abs(stored - km) > tolerance * km:
+            report['mismatched'].append((route_id, stored, round(km)))
+
+
+def fix_route_distances(mismatched):
+    """Write the computed distances from route_distance_report() back to ROUTE"""
+    for start in range(0, len(mismatched), ROUTE_BATCH):
+        batch = mismatched[start:start + ROUTE_BATCH]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.executemany("UPDATE ROUTE SET DistanceKM = %s WHERE RouteID = %s",
+                                   [[km, route_id] for route_id, _, km in batch])
+            notify_write('ROUTE', 'update', None, len(batch), pks=[route_id for route_id, _, _ in batch])
+    return len(mismatched)
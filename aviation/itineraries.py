@@ -0,0 +1,229 @@
+import bisect
+import datetime
+import threading
+from collections import OrderedDict
+
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Flight
+from .refdata import bump_version, table_versions
+from .routers import PRIMARY
+from .signals import table_changed
+
+MIN_CONNECTION_MINUTES = 45
+MAX_CONNECTION_HOURS = 8
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 100
+# Day timetables kept per process
+CACHED_DAYS = 14
+
+# Legs after the first may depart up to this long after the travel date ends
+TIMETABLE_SPAN = datetime.timedelta(days=1, hours=2 * MAX_CONNECTION_HOURS + 24)
+
+
+class Timetable:
+    """
+    The non-cancelled flights departing within TIMETABLE_SPAN of a date's start.
+
+    Flights are held as (departure, arrival, origin, destination, flight id,
+    flight number) tuples with times as POSIX seconds, sorted by departure
+    and indexed per origin and per (origin, destination) pair so a search
+    can bisect straight to the departures that make a connection.
+    """
+
+    def __init__(self, flights):
+        self.flights = sorted(flights)
+        self.by_origin = {}
+        self.by_pair = {}
+        self.feeders = {}
+        for flight in self.flights:
+            origin, destination = flight[2:4]
+            self.by_origin.setdefault(origin, []).append(flight)
+            self.by_pair.setdefault((origin, destination), []).append(flight)
+            self.feeders.setdefault(destination, set()).add(origin)
+        self.departure_times = {key: [f[0] for f in flights] for key, flights in self.by_origin.items()}
+        self.pair_times = {key: [f[0] for f in flights] for key, flights in self.by_pair.items()}
+
+    def departures(self, origin, earliest, latest):
+        """Departures from `origin` in [earliest, latest]"""
+        times = self.departure_times.get(origin)
+        if not times:
+            return []
+        flights = self.by_origin[origin]
+        return flights[bisect.bisect_left(times, earliest):bisect.bisect_right(times, latest)]
+
+    def pair_departures(self, origin, destination, earliest, latest):
+        times = self.pair_times.get((origin, destination))
+        if not times:
+            return []
+        flights = self.by_pair[(origin, destination)]
+        return flights[bisect.bisect_left(times, earliest):bisect.bisect_right(times, latest)]
+
+
+def _day_start(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def _load(date):
+    start = _day_start(date)
+    rows = Flight.objects.using(PRIMARY).filter(
+        scheduleddeparture__gte=start, scheduleddeparture__lt=start + TIMETABLE_SPAN,
+    ).exclude(flightstatus='Cancelled').values_list(
+        'scheduleddeparture', 'scheduledarrival', 'departureairportcode',
+        'arrivalairportcode', 'flightid', 'flightnumber',
+    )
+    return Timetable(
+        (departure.timestamp(), arrival.timestamp(), origin, destination, flight_id, number)
+        for departure, arrival, origin, destination, flight_id, number in rows.iterator()
+        if arrival > departure
+    )
+
+
+_lock = threading.Lock()
+# date -> (FLIGHT version, Timetable), least recently used first
+_timetables = OrderedDict()
+
+
+def timetable(date):
+    """The cached Timetable for `date`, reloaded after any FLIGHT write"""
+    (version,) = table_versions(('FLIGHT',))
+    with _lock:
+        cached = _timetables.get(date)
+        if cached and cached[0] == version:
+            _timetables.move_to_end(date)
+            return cached[1]
+    loaded = _load(date)
+    with _lock:
+        _timetables[date] = (version, loaded)
+        _timetables.move_to_end(date)
+        while len(_timetables) > CACHED_DAYS:
+            _timetables.popitem(last=False)
+    return loaded
+
+
+@receiver(table_changed)
+def _flight_changed(sender, table, **kwargs):
+    if table == 'FLIGHT':
+        bump_version('FLIGHT')
+
+
+class _ArrivalBound:
+    """Earliest arrival among known chains departing at or after a given time"""
+
+    def __init__(self, chains):
+        chains = sorted(chains, key=lambda c: c[0][0])
+        self.departures = [c[0][0] for c in chains]
+        self.best = [float('inf')] * (len(chains) + 1)
+        for i in range(len(chains) - 1, -1, -1):
+            self.best[i] = min(self.best[i + 1], chains[i][-1][1])
+
+    def __call__(self, departure):
+        return self.best[bisect.bisect_left(self.departures, departure)]
+
+
+def _connections(table, origin, destination, start, end):
+    """
+    Every direct, one-stop and two-stop chain from origin to destination that
+    is not beaten by a chain with fewer stops.
+
+    Chains are built in order of stops. Before a longer chain is extended,
+    its earliest possible arrival is compared with the best arrival of the
+    shorter chains departing no earlier; if it cannot arrive sooner it is
+    dropped, which prunes most of the two-stop fan-out at busy hubs.
+    """
+    min_connection = MIN_CONNECTION_MINUTES * 60
+    max_connection = MAX_CONNECTION_HOURS * 3600
+    # Only hubs with a flight to the destination can be the last stop
+    last_stops = table.feeders.get(destination, set())
+    firsts = [f for f in table.departures(origin, start, end) if f[3] != origin]
+
+    chains = [(first,) for first in firsts if first[3] == destination]
+    bound = _ArrivalBound(chains)
+    for first in firsts:
+        hub = first[3]
+        if hub == destination or hub not in last_stops:
+            continue
+        limit = bound(first[0])
+        for second in table.pair_departures(hub, destination, first[1] + min_connection,
+                                            first[1] + max_connection):
+            if second[1] < limit:
+                chains.append((first, second))
+
+    bound = _ArrivalBound(chains)
+    for first in firsts:
+        hub = first[3]
+        limit = bound(first[0])
+        if hub == destination or first[1] + 2 * min_connection >= limit:
+            continue
+        for second in table.departures(hub, first[1] + min_connection, first[1] + max_connection):
+            second_hub = second[3]
+            if (second_hub not in last_stops or second_hub == origin or second_hub == destination
+                    or second[1] + min_connection >= limit):
+                continue
+            for third in table.pair_departures(second_hub, destination, second[1] + min_connection,
+                                               second[1] + max_connection):
+                if third[1] < limit:
+                    chains.append((first, second, third))
+    return chains
+
+
+def _pareto(chains):
+    """
+    Drop chains another chain beats outright: departing no earlier, arriving
+    no later, with no more stops.
+    """
+    chains = sorted(chains, key=lambda c: (-c[0][0], c[-1][1], len(c)))
+    best_arrival = [float('inf')] * 3
+    kept = []
+    for chain in chains:
+        stops = len(chain) - 1
+        arrival = chain[-1][1]
+        if min(best_arrival[:stops + 1]) <= arrival:
+            continue
+        best_arrival[stops] = min(best_arrival[stops], arrival)
+        kept.append(chain)
+    return kept
+
+
+def _describe(chain, tz):
+    def local(seconds):
+        return datetime.datetime.fromtimestamp(seconds, tz)
+
+    legs = [{
+        'flightid': leg[4],
+        'flightnumber': leg[5],
+        'origin': leg[2],
+        'destination': leg[3],
+        'departure': local(leg[0]),
+        'arrival': local(leg[1]),
+    } for leg in chain]
+    return {
+        'legs': legs,
+        'stops': len(chain) - 1,
+        'departure': legs[0]['departure'],
+        'arrival': legs[-1]['arrival'],
+        'duration': datetime.timedelta(seconds=chain[-1][1] - chain[0][0]),
+        'connections': [datetime.timedelta(seconds=b[0] - a[1]) for a, b in zip(chain, chain[1:])],
+    }
+
+
+def search_itineraries(origin, destination, date, limit=DEFAULT_RESULTS):
+    """
+    Ranked direct, one-stop and two-stop itineraries departing on `date`.
+
+    Works entirely on the cached day timetable: each leg is found by bisecting
+    the departures of one airport (or airport pair) between the minimum and
+    maximum connection time after the previous arrival. Itineraries that are
+    beaten on departure, arrival and stops by another are dropped; the rest
+    are ordered by total journey time, then stops, then departure.
+    """
+    if origin == destination:
+        return []
+    table = timetable(date)
+    start = _day_start(date)
+    chains = _pareto(_connections(table, origin, destination, start.timestamp(),
+                                  (start + datetime.timedelta(days=1)).timestamp() - 1))
+    chains.sort(key=lambda c: (c[-1][1] - c[0][0], len(c), c[0][0]))
+    tz = timezone.get_current_timezone()
+    return [_describe(chain, tz) for chain in chains[:max(1, min(limit, MAX_RESULTS))]]
@@ -0,0 +1,123 @@
+from django.db.models import Q
+from django.http import Http404
+
+from .models import Aircraft, Airline, Airport, City, Passenger
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Widest integer key we expand prefix ranges for
+MAX_ID_DIGITS = 10
+
+
+def id_prefix_ranges(digits):
+    """
+    The key ranges whose decimal form starts with `digits`, lowest first.
+
+    "12" becomes 12, 120..129, 1200..1299 ...: disjoint and ascending, so
+    rows read range by range come out in key order. Keys are written
+    without leading zeros, so "0" matches only 0 and "05" matches nothing.
+    """
+    if digits.startswith('0'):
+        return [(0, 0)] if digits == '0' else []
+    prefix = int(digits)
+    ranges = [(prefix, prefix)]
+    low, high = prefix * 10, prefix * 10 + 9
+    for _ in range(len(digits), MAX_ID_DIGITS):
+        ranges.append((low, high))
+        low, high = low * 10, high * 10 + 9
+    return ranges
+
+
+def id_prefix_q(field, digits):
+    """
+    Match integer keys whose decimal form starts with `digits`: a handful of
+    range scans on the primary key instead of casting every key to a string.
+    """
+    # Matches nothing on its own; Django drops it from an OR
+    condition = Q(**{f'{field}__in': []})
+    for low, high in id_prefix_ranges(digits):
+        condition |= Q(**{f'{field}__range': (low, high)})
+    return condition
+
+
+def first_by_id_prefix(queryset, field, digits, limit):
+    """
+    The first `limit` rows of `queryset` whose `field` starts with `digits`,
+    in key order.
+
+    One ORDER BY `field` LIMIT query per prefix range, lowest range first,
+    until `limit` rows are found: each is a short index range scan, where an
+    OR of all the ranges would sort every match before applying the limit.
+    """
+    rows = []
+    for low, high in id_prefix_ranges(digits):
+        rows += queryset.filter(**{f'{field}__range': (low, high)}).order_by(field)[:limit - len(rows)]
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def _passengers(term, limit):
+    passengers = Passenger.objects.only('passengerid', 'firstname', 'lastname', 'passportnumber')
+    words = term.split()
+    if term.isdigit():
+        passengers = first_by_id_prefix(passengers, 'passengerid', term, limit)
+    elif len(words) > 1:
+        passengers = passengers.filter(
+            firstname__istartswith=words[0], lastname__istartswith=' '.join(words[1:]),
+        ).order_by('lastname', 'firstname')[:limit]
+    else:
+        passengers = passengers.filter(
+            Q(lastname__istartswith=term) | Q(firstname__istartswith=term),
+        ).order_by('lastname', 'firstname')[:limit]
+    return [(p.passengerid, f'{p.firstname} {p.lastname} ({p.passportnumber})') for p in passengers]
+
+
+def _aircraft(term, limit):
+    aircraft = Aircraft.objects.select_related('aircrafttypecode')
+    if term.isdigit():
+        aircraft = first_by_id_prefix(aircraft, 'aircraftid', term, limit)
+    else:
+        aircraft = aircraft.filter(aircrafttypecode__typename__istartswith=term).order_by('aircraftid')[:limit]
+    return [(a.aircraftid, f'Aircraft #{a.aircraftid} - {a.aircrafttypecode.typename}') for a in aircraft]
+
+
+def _airports(term, limit):
+    condition = Q(airportname__istartswith=term)
+    if term.isdigit():
+        condition |= id_prefix_q('airportcode', term)
+    airports = Airport.objects.filter(condition).only('airportcode', 'airportname').order_by('airportname')[:limit]
+    return [(a.airportcode, f'{a.airportname} ({a.airportcode})') for a in airports]
+
+
+def _airlines(term, limit):
+    condition = Q(airlinename__istartswith=term) | Q(airlineicao__istartswith=term)
+    airlines = Airline.objects.filter(condition).only('airlineid', 'airlinename', 'airlineicao').order_by('airlinename')[:limit]
+    return [(a.airlineid, f'{a.airlinename} ({a.airlineicao})') for a in airlines]
+
+
+def _cities(term, limit):
+    cities = City.objects.filter(cityname__istartswith=term).only('cityid', 'cityname').order_by('cityname')[:limit]
+    return [(c.cityid, c.cityname) for c in cities]
+
+
+LOOKUPS = {
+    'passengers': _passengers,
+    'aircraft': _aircraft,
+    'airports': _airports,
+    'airlines': _airlines,
+    'cities': _cities,
+}
+
+
+def lookup_results(kind, term, limit=DEFAULT_LIMIT):
+    """Top `limit` prefix matches for `term` as [{'id': ..., 'label': ...}]"""
+    finder = LOOKUPS.get(kind)
+    if finder is None:
+        raise Http404('Unknown lookup')
+    term = term.strip()
+    if not term:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    return [{'id': pk, 'label': label} for pk, label in finder(term, limit)]
@@ -0,0 +1,103 @@
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Aircraft, MaintenanceDue, MaintenanceRecord
+from .signals import notify_write
+
+DEFAULT_DUE_DAYS = 30
+MAX_DUE_DAYS = 365
+MAX_DUE_ROWS = 500
+
+
+def refresh_due(aircraft_ids):
+    """
+    Rebuild the MAINTENANCE_DUE rows and AIRCRAFT.LastMaintenanceDate of the
+    given aircraft from their maintenance records. An aircraft without
+    records has no LastMaintenanceDate. Aircraft whose date changes are
+    announced with notify_write(), in the caller's transaction.
+
+    Each aircraft's records are read through the (AircraftID,
+    MaintenanceTypeID, MaintenanceDate, MaintenanceID) index in that order,
+    so the last record seen for a type is its latest.
+    """
+    aircraft_ids = sorted(set(aircraft_ids))
+    if not aircraft_ids:
+        return 0
+    latest = {}
+    last_done = {}
+    rows = MaintenanceRecord.objects.filter(aircraftid__in=aircraft_ids).order_by(
+        'aircraftid', 'maintenancetypeid', 'maintenancedate', 'maintenanceid',
+    ).values_list('aircraftid', 'maintenancetypeid', 'maintenanceid', 'maintenancedate', 'nextduedate')
+    for aircraft, maintenance_type, maintenance_id, done, due in rows.iterator():
+        latest[(aircraft, maintenance_type)] = [aircraft, maintenance_type, maintenance_id, done, due]
+        last_done[aircraft] = max(done, last_done.get(aircraft, done))
+
+    marks = ', '.join(['%s'] * len(aircraft_ids))
+    with transaction.atomic():
+        current = dict(Aircraft.objects.select_for_update().filter(aircraftid__in=aircraft_ids).values_list(
+            'aircraftid', 'lastmaintenancedate'))
+        changed = [aircraft for aircraft in current if current[aircraft] != last_done.get(aircraft)]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM MAINTENANCE_DUE WHERE AircraftID IN ({marks})", aircraft_ids)
+            cursor.executemany("""
+                INSERT INTO MAINTENANCE_DUE (AircraftID, MaintenanceTypeID, MaintenanceID,
+                MaintenanceDate, NextDueDate) VALUES (%s, %s, %s, %s, %s)
+            """, list(latest.values()))
+            if changed:
+                cursor.executemany("UPDATE AIRCRAFT SET LastMaintenanceDate = %s WHERE AircraftID = %s",
+                                   [[last_done.get(aircraft), aircraft] for aircraft in changed])
+        notify_write('AIRCRAFT', 'update', None, len(changed), pks=changed)
+    return len(latest)
+
+
+def refresh_all_due():
+    """Rebuild MAINTENANCE_DUE for the whole fleet"""
+    aircraft_ids = MaintenanceRecord.objects.values_list('aircraftid', flat=True).distinct()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM MAINTENANCE_DUE")
+        return refresh_due(aircraft_ids)
+
+
+def record_aircraft(maintenance_ids):
+    """
+    The aircraft whose due entries the given records feed: the ones they
+    belong to and the ones whose MAINTENANCE_DUE rows point at them.
+
+    Write views call it before and after the write, so a record moved to
+    another aircraft or deleted refreshes its old aircraft too.
+    """
+    maintenance_ids = [maintenance_id for maintenance_id in maintenance_ids if maintenance_id is not None]
+    aircraft_ids = set(MaintenanceRecord.objects.filter(maintenanceid__in=maintenance_ids).values_list(
+        'aircraftid', flat=True))
+    aircraft_ids.update(MaintenanceDue.objects.filter(maintenanceid__in=maintenance_ids).values_list(
+        'aircraftid', flat=True))
+    return aircraft_ids
+
+
+def _due_rows(queryset):
+    return queryset.select_related('maintenancetypeid').order_by('nextduedate', 'aircraftid')
+
+
+def due_within(days=DEFAULT_DUE_DAYS, limit=MAX_DUE_ROWS):
+    """Maintenance falling due from today through `days` ahead, soonest first"""
+    today = timezone.localdate()
+    end = today + datetime.timedelta(days=days)
+    return list(_due_rows(MaintenanceDue.objects.filter(nextduedate__gte=today, nextduedate__lte=end))[:limit])
+
+
+def overdue(limit=MAX_DUE_ROWS):
+    """Maintenance whose due date has passed, most overdue first"""
+    return list(_due_rows(MaintenanceDue.objects.filter(nextduedate__lt=timezone.localdate()))[:limit])
+
+
+def due_counts(days=DEFAULT_DUE_DAYS):
+    """Number of overdue items and of items due within `days`, each an index range count"""
+    today = timezone.localdate()
+    end = today + datetime.timedelta(days=days)
+    return {
+        'overdue': MaintenanceDue.objects.filter(nextduedate__lt=today).count(),
+        'due': MaintenanceDue.objects.filter(nextduedate__gte=today, nextduedate__lte=end).count(),
+    }
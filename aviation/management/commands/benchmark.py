@@ -0,0 +1,68 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from aviation.benchmark import BenchmarkError, compare, run_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Time the hot views against synthetic datasets of several sizes. '
+            'Run with --settings=aviation_system.settings_bench; the database is wiped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,10000',
+                            help='Comma-separated flight/passenger counts to seed (default: 1000,10000)')
+        parser.add_argument('--iterations', type=int, default=30,
+                            help='Requests timed per view at each scale (default: 30)')
+        parser.add_argument('--output', default='benchmark.json',
+                            help='Where to write the JSON report (default: benchmark.json)')
+        parser.add_argument('--compare', metavar='REPORT',
+                            help='Earlier JSON report to check for p50 and query count regressions')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'AVIATION_BENCHMARK', False):
+            raise CommandError('Refusing to run: the benchmark wipes the database. '
+                               'Use --settings=aviation_system.settings_bench.')
+
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers')
+
+        call_command('migrate', run_syncdb=True, verbosity=0)
+        try:
+            report = run_benchmark(scales, options['iterations'], log=self.stdout.write)
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        report['commit'] = self._git_commit()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        for scale, data in report['scales'].items():
+            self.stdout.write(f'\nScale {scale}')
+            self.stdout.write(f'  {"view":<16}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"queries":>10}')
+            for view, stats in data['views'].items():
+                self.stdout.write(f'  {view:<16}{stats["p50_ms"]:>10}{stats["p90_ms"]:>10}'
+                                  f'{stats["p99_ms"]:>10}{stats["queries_mean"]:>10}')
+        self.stdout.write(f'\nReport written to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)
+            regressions = list(compare(previous, report))
+            for scale, view, metric, old, new in regressions:
+                self.stdout.write(self.style.WARNING(
+                    f'Regression at scale {scale}: {view} {metric} {old} -> {new}'))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('No p50 or query count regressions against the earlier report'))
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                  text=True, check=True, cwd=settings.BASE_DIR).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from aviation.changefeed import DEFAULT_RETENTION_DAYS, prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change-feed events older than the retention period that every consumer has read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_RETENTION_DAYS,
+                            help='Keep events younger than this many days (default %(default)s)')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['days'])
+        self.stdout.write(f'Deleted {deleted} change event(s)')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from aviation.maintenance import refresh_all_due
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the maintenance due table and aircraft last-maintenance dates from the records'
+
+    def handle(self, *args, **options):
+        rows = refresh_all_due()
+        self.stdout.write(f'{rows} aircraft/maintenance type due entries rebuilt')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from aviation.performance import refresh_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and monthly on-time performance rollups from FLIGHT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD); default the earliest flight')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD); default the latest flight')
+
+    def handle(self, *args, **options):
+        start, end = (self._date(options[name], flag) for name, flag in (('start', '--from'), ('end', '--to')))
+        if start and end and end < start:
+            raise CommandError('--to must not be before --from')
+        days = refresh_all(start, end)
+        self.stdout.write(f'Rolled up {days} day(s)')
+
+    def _date(self, value, flag):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'{flag} must be a date in YYYY-MM-DD form')
+        return day
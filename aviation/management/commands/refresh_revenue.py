@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from aviation.revenue import refresh_all, refresh_rate_changes
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily revenue rollups from BOOKING, converting at the current rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD); default the earliest booking')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD); default the latest booking')
+        parser.add_argument('--rates', action='store_true',
+                            help='Only reconvert the days that exchange-rate changes since the last run apply to')
+
+    def handle(self, *args, **options):
+        if options['rates']:
+            changes = refresh_rate_changes()
+            self.stdout.write(f'Applied {changes} exchange-rate change(s)')
+            return
+        start, end = (self._date(options[name], flag) for name, flag in (('start', '--from'), ('end', '--to')))
+        if start and end and end < start:
+            raise CommandError('--to must not be before --from')
+        days = refresh_all(start, end)
+        self.stdout.write(f'Rolled up {days} day(s)')
+
+    def _date(self, value, flag):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'{flag} must be a date in YYYY-MM-DD form')
+        return day
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from aviation.stats import DATABASE_SIZE, format_size, refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Reconcile the dashboard counters and re-measure the database size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and refresh every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = refresh_stats()
+            size = stats.pop(DATABASE_SIZE)
+            summary = ', '.join(f'{table}={count}' for table, count in stats.items())
+            self.stdout.write(f'{summary}, size={format_size(size)}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
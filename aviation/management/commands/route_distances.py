@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from aviation.geo import DEFAULT_TOLERANCE, fix_route_distances, route_distance_report
+
+
+class Command(BaseCommand):
+    help = 'Validate ROUTE.DistanceKM against great-circle distances, optionally fixing it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='Flag distances off by more than this fraction (default %(default)s)',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Overwrite missing and flagged distances with the computed value',
+        )
+        parser.add_argument(
+            '--show', type=int, default=20,
+            help='How many flagged routes to list',
+        )
+
+    def handle(self, *args, **options):
+        report = route_distance_report(options['tolerance'])
+        mismatched = report['mismatched']
+        self.stdout.write(
+            f"Checked {report['checked']} routes: {len(mismatched)} missing or off by more than "
+            f"{options['tolerance']:.0%}, {len(report['unlocated'])} without airport coordinates"
+        )
+        for route_id, stored, km in mismatched[:options['show']]:
+            self.stdout.write(f'  route {route_id}: stored {stored} km, great-circle {km} km')
+        if options['fix'] and mismatched:
+            fixed = fix_route_distances(mismatched)
+            self.stdout.write(self.style.SUCCESS(f'Updated DistanceKM on {fixed} routes'))
@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from aviation.changefeed import DEFAULT_BATCH_SIZE, ChangeFeedConsumer, event_dict, read_changes
+
+
+class Command(BaseCommand):
+    help = 'Print CHANGE_EVENT rows as JSON lines, from a consumer checkpoint or an EventID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Checkpoint name; resume from and advance its position')
+        parser.add_argument('--after', type=int, default=0, help='Start after this EventID when no --consumer is given')
+        parser.add_argument('--table', action='append', dest='tables', help='Only this table (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --follow')
+
+    def handle(self, *args, **options):
+        tables = [table.upper() for table in options['tables'] or []]
+        batch_size = options['batch_size']
+        feed = ChangeFeedConsumer(options['consumer'], batch_size, tables) if options['consumer'] else None
+        after, gaps = options['after'], []
+        while True:
+            if feed is not None:
+                feed.drain(self._write)
+            else:
+                more = True
+                while more:
+                    batch = read_changes(after, batch_size, tables, gaps)
+                    self._write(batch.events)
+                    after, gaps, more = batch.after, batch.gaps, batch.more
+            if not options['follow']:
+                return
+            time.sleep(options['interval'])
+
+    def _write(self, batch):
+        for event in batch:
+            self.stdout.write(json.dumps(event_dict(event)))
@@ -0,0 +1,201 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Views issuing more queries than this in one request are flagged (N+1 detection)
+DEFAULT_QUERY_BUDGET = 25
+
+_current = contextvars.ContextVar('aviation_request_metrics', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield str(bound), cumulative
+        yield '+Inf', self.count
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_time = Histogram(LATENCY_BUCKETS)
+        self.sql_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.template_time = Histogram(LATENCY_BUCKETS)
+        self.over_budget = 0
+
+
+class MetricsRegistry:
+    """
+    In-process store of per-view histograms.
+
+    Each worker process keeps its own registry; scrape every worker (or run a
+    single worker) to see the whole picture.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, request_metrics, latency, budget):
+        with self._lock:
+            metrics = self._views.setdefault(view, ViewMetrics())
+            metrics.latency.observe(latency)
+            metrics.sql_time.observe(request_metrics.sql_time)
+            metrics.sql_count.observe(request_metrics.sql_count)
+            metrics.template_time.observe(request_metrics.template_time)
+            if request_metrics.sql_count > budget:
+                metrics.over_budget += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """The registry in Prometheus text exposition format"""
+        histograms = (
+            ('aviation_view_latency_seconds', 'Total view latency', 'latency'),
+            ('aviation_view_sql_seconds', 'Time spent in SQL per request', 'sql_time'),
+            ('aviation_view_sql_queries', 'SQL statements per request', 'sql_count'),
+            ('aviation_view_template_seconds', 'Template render time per request', 'template_time'),
+        )
+        lines = []
+        with self._lock:
+            views = sorted(self._views.items())
+            for name, help_text, attr in histograms:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, metrics in views:
+                    histogram = getattr(metrics, attr)
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+            name = 'aviation_view_query_budget_exceeded_total'
+            lines.append(f'# HELP {name} Requests that issued more SQL statements than the query budget')
+            lines.append(f'# TYPE {name} counter')
+            for view, metrics in views:
+                lines.append(f'{name}{{view="{view}"}} {metrics.over_budget}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """SQL and template timings collected while one request is handled"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        # Async views run their queries on several threads at once
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.sql_time += elapsed
+                self.sql_count += 1
+
+
+def current_request_metrics():
+    """The RequestMetrics of the request being handled, or None outside a request"""
+    return _current.get()
+
+
+@contextmanager
+def recording_queries(request_metrics):
+    """Count and time every statement run on this thread's connections into `request_metrics`"""
+    with ExitStack() as stack:
+        if request_metrics is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(request_metrics))
+        yield
+
+
+class QueryMetricsMiddleware:
+    """Record SQL count, SQL time, template time and latency for every view"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budget = getattr(settings, 'AVIATION_QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+
+    def __call__(self, request):
+        request_metrics = RequestMetrics()
+        # Lets callers such as the benchmark read the counts back
+        request.query_metrics = request_metrics
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with recording_queries(request_metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        latency = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        registry.record(view, request_metrics, latency, self.budget)
+        if request_metrics.sql_count > self.budget:
+            logger.warning('%s issued %d queries (budget %d) for %s', view,
+                           request_metrics.sql_count, self.budget, request.path)
+        return response
+
+
+class TimedTemplate:
+    """Backend template wrapper that adds render time to the current request"""
+
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            request_metrics = _current.get()
+            if request_metrics is not None:
+                request_metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template engine, with render timing"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
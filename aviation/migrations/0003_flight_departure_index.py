@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0002_crewmember_maintenancerecord_maintenancetype_route_and_more'),
+    ]
+
+    operations = [
+        # Keyset pagination of flights_list seeks on (ScheduledDeparture, FlightID)
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_DEPARTURE ON FLIGHT (ScheduledDeparture, FlightID)",
+            reverse_sql="DROP INDEX IX_FLIGHT_DEPARTURE ON FLIGHT",
+        ),
+    ]
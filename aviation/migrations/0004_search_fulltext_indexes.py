@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0003_flight_departure_index'),
+    ]
+
+    # ngram FULLTEXT indexes back aviation.search; InnoDB keeps them current on writes
+    operations = [
+        migrations.RunSQL(
+            "CREATE FULLTEXT INDEX FT_FLIGHT_NUMBER ON FLIGHT (FlightNumber) WITH PARSER ngram",
+            reverse_sql="DROP INDEX FT_FLIGHT_NUMBER ON FLIGHT",
+        ),
+        migrations.RunSQL(
+            "CREATE FULLTEXT INDEX FT_AIRLINE_NAME ON AIRLINE (AirlineName) WITH PARSER ngram",
+            reverse_sql="DROP INDEX FT_AIRLINE_NAME ON AIRLINE",
+        ),
+        migrations.RunSQL(
+            "CREATE FULLTEXT INDEX FT_AIRPORT_NAME ON AIRPORT (AirportName) WITH PARSER ngram",
+            reverse_sql="DROP INDEX FT_AIRPORT_NAME ON AIRPORT",
+        ),
+        migrations.RunSQL(
+            "CREATE FULLTEXT INDEX FT_PASSENGER_NAME ON PASSENGER (FirstName, LastName) WITH PARSER ngram",
+            reverse_sql="DROP INDEX FT_PASSENGER_NAME ON PASSENGER",
+        ),
+    ]
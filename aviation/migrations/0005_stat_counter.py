@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0004_search_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('name', models.CharField(db_column='Name', max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(db_column='Value', default=0)),
+                ('updatedat', models.DateTimeField(auto_now=True, db_column='UpdatedAt')),
+            ],
+            options={
+                'db_table': 'STAT_COUNTER',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0005_stat_counter'),
+    ]
+
+    # B-tree indexes serving the LIKE 'prefix%' typeahead lookups
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IX_PASSENGER_LASTNAME ON PASSENGER (LastName, FirstName)",
+            reverse_sql="DROP INDEX IX_PASSENGER_LASTNAME ON PASSENGER",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_PASSENGER_FIRSTNAME ON PASSENGER (FirstName, LastName)",
+            reverse_sql="DROP INDEX IX_PASSENGER_FIRSTNAME ON PASSENGER",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_AIRPORT_NAME ON AIRPORT (AirportName)",
+            reverse_sql="DROP INDEX IX_AIRPORT_NAME ON AIRPORT",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_AIRLINE_NAME ON AIRLINE (AirlineName)",
+            reverse_sql="DROP INDEX IX_AIRLINE_NAME ON AIRLINE",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_AIRLINE_ICAO ON AIRLINE (AirlineICAO)",
+            reverse_sql="DROP INDEX IX_AIRLINE_ICAO ON AIRLINE",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_CITY_NAME ON CITY (CityName)",
+            reverse_sql="DROP INDEX IX_CITY_NAME ON CITY",
+        ),
+    ]
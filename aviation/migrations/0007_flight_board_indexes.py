@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0006_lookup_prefix_indexes'),
+    ]
+
+    # Time-windowed departure/arrival boards range-scan one airport or airline
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_DEP_AIRPORT_TIME ON FLIGHT (DepartureAirportCode, ScheduledDeparture, FlightID)",
+            reverse_sql="DROP INDEX IX_FLIGHT_DEP_AIRPORT_TIME ON FLIGHT",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_ARR_AIRPORT_TIME ON FLIGHT (ArrivalAirportCode, ScheduledArrival, FlightID)",
+            reverse_sql="DROP INDEX IX_FLIGHT_ARR_AIRPORT_TIME ON FLIGHT",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_AIRLINE_TIME ON FLIGHT (AirlineID, ScheduledDeparture, FlightID)",
+            reverse_sql="DROP INDEX IX_FLIGHT_AIRLINE_TIME ON FLIGHT",
+        ),
+    ]
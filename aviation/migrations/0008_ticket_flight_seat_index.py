@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0007_flight_board_indexes'),
+    ]
+
+    operations = [
+        # Seat inventories are built from the tickets of a set of flights
+        migrations.RunSQL(
+            "CREATE INDEX IX_TICKET_FLIGHT_SEAT ON TICKET (FlightID, SeatNumber)",
+            reverse_sql="DROP INDEX IX_TICKET_FLIGHT_SEAT ON TICKET",
+        ),
+    ]
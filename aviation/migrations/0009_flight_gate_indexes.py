@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0008_ticket_flight_seat_index'),
+    ]
+
+    # Gate conflict checks range-scan one gate's departures or arrivals
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_DEP_GATE_TIME ON FLIGHT (DepartureTerminalID, DepartureGateNumber, ScheduledDeparture)",
+            reverse_sql="DROP INDEX IX_FLIGHT_DEP_GATE_TIME ON FLIGHT",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_ARR_GATE_TIME ON FLIGHT (ArrivalTerminalID, ArrivalGateNumber, ScheduledArrival)",
+            reverse_sql="DROP INDEX IX_FLIGHT_ARR_GATE_TIME ON FLIGHT",
+        ),
+    ]
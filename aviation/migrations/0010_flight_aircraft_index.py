@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0009_flight_gate_indexes'),
+    ]
+
+    operations = [
+        # Rotation checks walk one aircraft's legs in departure order
+        migrations.RunSQL(
+            "CREATE INDEX IX_FLIGHT_AIRCRAFT_TIME ON FLIGHT (AircraftID, ScheduledDeparture, FlightID)",
+            reverse_sql="DROP INDEX IX_FLIGHT_AIRCRAFT_TIME ON FLIGHT",
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0010_flight_aircraft_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrewAssignment',
+            fields=[
+                ('assignmentid', models.AutoField(db_column='AssignmentID', primary_key=True, serialize=False)),
+                ('assignedat', models.DateTimeField(auto_now_add=True, db_column='AssignedAt')),
+                ('crewid', models.ForeignKey(db_column='CrewID', on_delete=django.db.models.deletion.CASCADE, to='aviation.crewmember')),
+                ('flightid', models.ForeignKey(db_column='FlightID', on_delete=django.db.models.deletion.CASCADE, to='aviation.flight')),
+            ],
+            options={
+                'db_table': 'CREW_ASSIGNMENT',
+                'indexes': [models.Index(fields=['flightid'], name='IX_CREW_ASSIGNMENT_FLIGHT')],
+                'constraints': [models.UniqueConstraint(fields=('crewid', 'flightid'), name='UQ_CREW_ASSIGNMENT')],
+            },
+        ),
+    ]
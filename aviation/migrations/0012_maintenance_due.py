@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0011_crew_assignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceDue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('maintenanceid', models.IntegerField(db_column='MaintenanceID')),
+                ('maintenancedate', models.DateField(db_column='MaintenanceDate')),
+                ('nextduedate', models.DateField(db_column='NextDueDate')),
+                ('aircraftid', models.ForeignKey(db_column='AircraftID', on_delete=django.db.models.deletion.CASCADE, to='aviation.aircraft')),
+                ('maintenancetypeid', models.ForeignKey(db_column='MaintenanceTypeID', on_delete=django.db.models.deletion.CASCADE, to='aviation.maintenancetype')),
+            ],
+            options={
+                'db_table': 'MAINTENANCE_DUE',
+                'indexes': [models.Index(fields=['nextduedate'], name='IX_MAINTENANCE_DUE_DATE')],
+                'constraints': [models.UniqueConstraint(fields=('aircraftid', 'maintenancetypeid'), name='UQ_MAINTENANCE_DUE')],
+            },
+        ),
+        # Refreshing one aircraft reads its records newest last per type
+        migrations.RunSQL(
+            "CREATE INDEX IX_MAINTENANCE_AIRCRAFT_TYPE ON MAINTENANCE_RECORD "
+            "(AircraftID, MaintenanceTypeID, MaintenanceDate, MaintenanceID)",
+            reverse_sql="DROP INDEX IX_MAINTENANCE_AIRCRAFT_TYPE ON MAINTENANCE_RECORD",
+        ),
+        # Fill the table from the existing records
+        migrations.RunSQL(
+            """
+            INSERT INTO MAINTENANCE_DUE (AircraftID, MaintenanceTypeID, MaintenanceID, MaintenanceDate, NextDueDate)
+            SELECT m.AircraftID, m.MaintenanceTypeID, m.MaintenanceID, m.MaintenanceDate, m.NextDueDate
+            FROM MAINTENANCE_RECORD m
+            WHERE NOT EXISTS (
+                SELECT 1 FROM MAINTENANCE_RECORD n
+                WHERE n.AircraftID = m.AircraftID AND n.MaintenanceTypeID = m.MaintenanceTypeID
+                  AND (n.MaintenanceDate > m.MaintenanceDate
+                       OR (n.MaintenanceDate = m.MaintenanceDate AND n.MaintenanceID > m.MaintenanceID))
+            )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
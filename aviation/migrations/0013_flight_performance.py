@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0012_maintenance_due'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(db_column='Period', max_length=1)),
+                ('periodstart', models.DateField(db_column='PeriodStart')),
+                ('dimension', models.CharField(db_column='Dimension', max_length=10)),
+                ('dimensionkey', models.CharField(db_column='DimensionKey', max_length=30)),
+                ('flights', models.IntegerField(db_column='Flights', default=0)),
+                ('operated', models.IntegerField(db_column='Operated', default=0)),
+                ('ontime', models.IntegerField(db_column='OnTime', default=0)),
+                ('delayminutes', models.BigIntegerField(db_column='DelayMinutes', default=0)),
+                ('cancelled', models.IntegerField(db_column='Cancelled', default=0)),
+                ('diverted', models.IntegerField(db_column='Diverted', default=0)),
+            ],
+            options={
+                'db_table': 'FLIGHT_PERFORMANCE',
+                'indexes': [models.Index(fields=['period', 'dimension', 'periodstart'], name='IX_FLIGHT_PERFORMANCE_PERIOD')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'dimension', 'dimensionkey', 'periodstart'), name='UQ_FLIGHT_PERFORMANCE')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FlightRollupState',
+            fields=[
+                ('flightid', models.IntegerField(db_column='FlightID', primary_key=True, serialize=False)),
+                ('day', models.DateField(db_column='Day')),
+            ],
+            options={
+                'db_table': 'FLIGHT_ROLLUP_STATE',
+                'indexes': [models.Index(fields=['day'], name='IX_FLIGHT_ROLLUP_STATE_DAY')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0013_flight_performance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('rateid', models.AutoField(db_column='RateID', primary_key=True, serialize=False)),
+                ('ratedate', models.DateField(db_column='RateDate')),
+                ('rate', models.DecimalField(db_column='Rate', decimal_places=8, max_digits=18)),
+                ('currencycode', models.ForeignKey(db_column='CurrencyCode', on_delete=django.db.models.deletion.CASCADE, to='aviation.currency')),
+            ],
+            options={
+                'db_table': 'CURRENCY_RATE',
+                'constraints': [models.UniqueConstraint(fields=('currencycode', 'ratedate'), name='UQ_CURRENCY_RATE')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_column='Day')),
+                ('dimension', models.CharField(db_column='Dimension', max_length=10)),
+                ('dimensionkey', models.CharField(db_column='DimensionKey', max_length=30)),
+                ('bookings', models.IntegerField(db_column='Bookings', default=0)),
+                ('amount', models.DecimalField(db_column='Amount', decimal_places=2, default=0, max_digits=16)),
+                ('unconverted', models.IntegerField(db_column='Unconverted', default=0)),
+            ],
+            options={
+                'db_table': 'REVENUE_DAILY',
+                'indexes': [models.Index(fields=['dimension', 'day'], name='IX_REVENUE_DAILY_DAY')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'dimensionkey', 'day'), name='UQ_REVENUE_DAILY')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RevenueRollupState',
+            fields=[
+                ('bookingid', models.IntegerField(db_column='BookingID', primary_key=True, serialize=False)),
+                ('day', models.DateField(db_column='Day')),
+            ],
+            options={
+                'db_table': 'REVENUE_ROLLUP_STATE',
+                'indexes': [models.Index(fields=['day'], name='IX_REVENUE_ROLLUP_STATE_DAY')],
+            },
+        ),
+        # Each day's bookings are read as one range
+        migrations.RunSQL(
+            "CREATE INDEX IX_BOOKING_DATE ON BOOKING (BookingDate)",
+            reverse_sql="DROP INDEX IX_BOOKING_DATE ON BOOKING",
+        ),
+    ]
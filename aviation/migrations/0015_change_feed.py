@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0014_revenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCheckpoint',
+            fields=[
+                ('consumer', models.CharField(db_column='Consumer', max_length=100, primary_key=True, serialize=False)),
+                ('lasteventid', models.BigIntegerField(db_column='LastEventID', default=0)),
+                ('updatedat', models.DateTimeField(db_column='UpdatedAt')),
+            ],
+            options={
+                'db_table': 'CHANGE_CHECKPOINT',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('eventid', models.BigAutoField(db_column='EventID', primary_key=True, serialize=False)),
+                ('tablename', models.CharField(db_column='TableName', max_length=30)),
+                ('action', models.CharField(db_column='Action', max_length=10)),
+                ('rowkey', models.CharField(db_column='RowKey', max_length=100)),
+                ('changedat', models.DateTimeField(db_column='ChangedAt')),
+            ],
+            options={
+                'db_table': 'CHANGE_EVENT',
+                'indexes': [models.Index(fields=['changedat'], name='IX_CHANGE_EVENT_CHANGED_AT')],
+            },
+        ),
+    ]
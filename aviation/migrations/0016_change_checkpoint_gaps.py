@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0015_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changecheckpoint',
+            name='gaps',
+            field=models.TextField(blank=True, db_column='Gaps', default=''),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0016_change_checkpoint_gaps'),
+    ]
+
+    operations = [
+        # LastMaintenanceDate follows the maintenance records; an aircraft
+        # with none left has no date
+        migrations.RunSQL(
+            "ALTER TABLE AIRCRAFT MODIFY LastMaintenanceDate DATE NULL",
+            reverse_sql="ALTER TABLE AIRCRAFT MODIFY LastMaintenanceDate DATE NOT NULL",
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0017_aircraft_last_maintenance_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='airlineid',
+            field=models.IntegerField(db_column='AirlineID', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='cancelled',
+            field=models.IntegerField(db_column='Cancelled', default=0),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='delayminutes',
+            field=models.IntegerField(db_column='DelayMinutes', default=0),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='destination',
+            field=models.IntegerField(db_column='Destination', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='diverted',
+            field=models.IntegerField(db_column='Diverted', default=0),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='ontime',
+            field=models.IntegerField(db_column='OnTime', default=0),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='operated',
+            field=models.IntegerField(db_column='Operated', default=0),
+        ),
+        migrations.AddField(
+            model_name='flightrollupstate',
+            name='origin',
+            field=models.IntegerField(db_column='Origin', null=True),
+        ),
+    ]
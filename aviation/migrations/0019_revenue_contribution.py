@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aviation', '0018_flight_rollup_contribution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookingid', models.IntegerField(db_column='BookingID')),
+                ('dimension', models.CharField(db_column='Dimension', max_length=10)),
+                ('dimensionkey', models.CharField(db_column='DimensionKey', max_length=30)),
+                ('amount', models.DecimalField(db_column='Amount', decimal_places=2, max_digits=16, null=True)),
+            ],
+            options={
+                'db_table': 'REVENUE_CONTRIBUTION',
+                'indexes': [models.Index(fields=['bookingid'], name='IX_REVENUE_CONTRIBUTION')],
+            },
+        ),
+    ]
@@ -93,7 +93,7 @@ class AircraftType(models.Model):
 class Aircraft(models.Model):
     aircraftid = models.IntegerField(db_column='AircraftID', primary_key=True)
     manufactureyear = models.IntegerField(db_column='ManufactureYear')
-    lastmaintenancedate = models.DateField(db_column='LastMaintenanceDate')
+    lastmaintenancedate = models.DateField(db_column='LastMaintenanceDate', null=True, blank=True)
     airlineid = models.ForeignKey(Airline, on_delete=models.CASCADE, db_column='AirlineID')
     aircrafttypecode = models.ForeignKey(AircraftType, on_delete=models.CASCADE, db_column='AircraftTypeCode')
     
@@ -292,3 +292,210 @@ class MaintenanceRecord(models.Model):
     def __str__(self):
         return f"Maintenance {self.maintenanceid}"
 
+
+class StatCounter(models.Model):
+    name = models.CharField(db_column='Name', max_length=50, primary_key=True)
+    value = models.BigIntegerField(db_column='Value', default=0)
+    updatedat = models.DateTimeField(db_column='UpdatedAt', auto_now=True)
+    
+    class Meta:
+        db_table = 'STAT_COUNTER'
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class CrewAssignment(models.Model):
+    assignmentid = models.AutoField(db_column='AssignmentID', primary_key=True)
+    crewid = models.ForeignKey(CrewMember, on_delete=models.CASCADE, db_column='CrewID')
+    flightid = models.ForeignKey(Flight, on_delete=models.CASCADE, db_column='FlightID')
+    assignedat = models.DateTimeField(db_column='AssignedAt', auto_now_add=True)
+    
+    class Meta:
+        db_table = 'CREW_ASSIGNMENT'
+        constraints = [
+            models.UniqueConstraint(fields=['crewid', 'flightid'], name='UQ_CREW_ASSIGNMENT'),
+        ]
+        indexes = [
+            models.Index(fields=['flightid'], name='IX_CREW_ASSIGNMENT_FLIGHT'),
+        ]
+    
+    def __str__(self):
+        return f"Crew {self.crewid_id} on flight {self.flightid_id}"
+
+
+class MaintenanceDue(models.Model):
+    """Latest maintenance record of each aircraft per maintenance type, kept up to date on writes"""
+    aircraftid = models.ForeignKey(Aircraft, on_delete=models.CASCADE, db_column='AircraftID')
+    maintenancetypeid = models.ForeignKey(MaintenanceType, on_delete=models.CASCADE, db_column='MaintenanceTypeID')
+    maintenanceid = models.IntegerField(db_column='MaintenanceID')
+    maintenancedate = models.DateField(db_column='MaintenanceDate')
+    nextduedate = models.DateField(db_column='NextDueDate')
+    
+    class Meta:
+        db_table = 'MAINTENANCE_DUE'
+        constraints = [
+            models.UniqueConstraint(fields=['aircraftid', 'maintenancetypeid'], name='UQ_MAINTENANCE_DUE'),
+        ]
+        indexes = [
+            models.Index(fields=['nextduedate'], name='IX_MAINTENANCE_DUE_DATE'),
+        ]
+    
+    def __str__(self):
+        return f"Aircraft {self.aircraftid_id} type {self.maintenancetypeid_id} due {self.nextduedate}"
+
+
+class FlightPerformance(models.Model):
+    """Daily ('D') and monthly ('M') on-time rollups per airline, airport and route"""
+    period = models.CharField(db_column='Period', max_length=1)
+    periodstart = models.DateField(db_column='PeriodStart')
+    dimension = models.CharField(db_column='Dimension', max_length=10)
+    dimensionkey = models.CharField(db_column='DimensionKey', max_length=30)
+    flights = models.IntegerField(db_column='Flights', default=0)
+    operated = models.IntegerField(db_column='Operated', default=0)
+    ontime = models.IntegerField(db_column='OnTime', default=0)
+    delayminutes = models.BigIntegerField(db_column='DelayMinutes', default=0)
+    cancelled = models.IntegerField(db_column='Cancelled', default=0)
+    diverted = models.IntegerField(db_column='Diverted', default=0)
+    
+    class Meta:
+        db_table = 'FLIGHT_PERFORMANCE'
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'dimension', 'dimensionkey', 'periodstart'],
+                                    name='UQ_FLIGHT_PERFORMANCE'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'dimension', 'periodstart'], name='IX_FLIGHT_PERFORMANCE_PERIOD'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension} {self.dimensionkey} {self.period} {self.periodstart}"
+
+
+class FlightRollupState(models.Model):
+    """What each flight last added to the rollups, so a write can back it out and add the new figures"""
+    flightid = models.IntegerField(db_column='FlightID', primary_key=True)
+    day = models.DateField(db_column='Day')
+    # Null on rows rolled up before contributions were stored
+    airlineid = models.IntegerField(db_column='AirlineID', null=True)
+    origin = models.IntegerField(db_column='Origin', null=True)
+    destination = models.IntegerField(db_column='Destination', null=True)
+    operated = models.IntegerField(db_column='Operated', default=0)
+    ontime = models.IntegerField(db_column='OnTime', default=0)
+    delayminutes = models.IntegerField(db_column='DelayMinutes', default=0)
+    cancelled = models.IntegerField(db_column='Cancelled', default=0)
+    diverted = models.IntegerField(db_column='Diverted', default=0)
+
+    class Meta:
+        db_table = 'FLIGHT_ROLLUP_STATE'
+        indexes = [
+            models.Index(fields=['day'], name='IX_FLIGHT_ROLLUP_STATE_DAY'),
+        ]
+    
+    def __str__(self):
+        return f"Flight {self.flightid} on {self.day}"
+
+
+class CurrencyRate(models.Model):
+    """Units of the reporting currency per unit of a currency, effective from RateDate"""
+    rateid = models.AutoField(db_column='RateID', primary_key=True)
+    currencycode = models.ForeignKey(Currency, on_delete=models.CASCADE, db_column='CurrencyCode')
+    ratedate = models.DateField(db_column='RateDate')
+    rate = models.DecimalField(db_column='Rate', max_digits=18, decimal_places=8)
+    
+    class Meta:
+        db_table = 'CURRENCY_RATE'
+        constraints = [
+            models.UniqueConstraint(fields=['currencycode', 'ratedate'], name='UQ_CURRENCY_RATE'),
+        ]
+    
+    def __str__(self):
+        return f"{self.currencycode_id} @ {self.rate} from {self.ratedate}"
+
+
+class RevenueDaily(models.Model):
+    """Booking revenue in the reporting currency per day by channel, status, country and airline"""
+    day = models.DateField(db_column='Day')
+    dimension = models.CharField(db_column='Dimension', max_length=10)
+    dimensionkey = models.CharField(db_column='DimensionKey', max_length=30)
+    bookings = models.IntegerField(db_column='Bookings', default=0)
+    amount = models.DecimalField(db_column='Amount', max_digits=16, decimal_places=2, default=0)
+    unconverted = models.IntegerField(db_column='Unconverted', default=0)
+    
+    class Meta:
+        db_table = 'REVENUE_DAILY'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'dimensionkey', 'day'], name='UQ_REVENUE_DAILY'),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'day'], name='IX_REVENUE_DAILY_DAY'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dimension} {self.dimensionkey} {self.day}"
+
+
+class RevenueRollupState(models.Model):
+    """The day each booking was last rolled up under"""
+    bookingid = models.IntegerField(db_column='BookingID', primary_key=True)
+    day = models.DateField(db_column='Day')
+    
+    class Meta:
+        db_table = 'REVENUE_ROLLUP_STATE'
+        indexes = [
+            models.Index(fields=['day'], name='IX_REVENUE_ROLLUP_STATE_DAY'),
+        ]
+    
+    def __str__(self):
+        return f"Booking {self.bookingid} on {self.day}"
+
+
+class RevenueContribution(models.Model):
+    """One REVENUE_DAILY row a booking last counted towards and the amount it added there"""
+    bookingid = models.IntegerField(db_column='BookingID')
+    dimension = models.CharField(db_column='Dimension', max_length=10)
+    dimensionkey = models.CharField(db_column='DimensionKey', max_length=30)
+    # Null when the booking's currency had no rate yet
+    amount = models.DecimalField(db_column='Amount', max_digits=16, decimal_places=2, null=True)
+    
+    class Meta:
+        db_table = 'REVENUE_CONTRIBUTION'
+        indexes = [
+            models.Index(fields=['bookingid'], name='IX_REVENUE_CONTRIBUTION'),
+        ]
+    
+    def __str__(self):
+        return f"Booking {self.bookingid} in {self.dimension} {self.dimensionkey}"
+
+
+class ChangeEvent(models.Model):
+    """One row written by a raw-SQL write path, recorded in the same transaction as the write"""
+    eventid = models.BigAutoField(db_column='EventID', primary_key=True)
+    tablename = models.CharField(db_column='TableName', max_length=30)
+    action = models.CharField(db_column='Action', max_length=10)
+    rowkey = models.CharField(db_column='RowKey', max_length=100)
+    changedat = models.DateTimeField(db_column='ChangedAt')
+    
+    class Meta:
+        db_table = 'CHANGE_EVENT'
+        indexes = [
+            models.Index(fields=['changedat'], name='IX_CHANGE_EVENT_CHANGED_AT'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.eventid} {self.action} {self.tablename} {self.rowkey}"
+
+
+class ChangeCheckpoint(models.Model):
+    """The last CHANGE_EVENT each change-feed consumer has processed"""
+    consumer = models.CharField(db_column='Consumer', max_length=100, primary_key=True)
+    lasteventid = models.BigIntegerField(db_column='LastEventID', default=0)
+    # EventIDs below LastEventID not seen yet, comma-separated (aviation.changefeed)
+    gaps = models.TextField(db_column='Gaps', blank=True, default='')
+    updatedat = models.DateTimeField(db_column='UpdatedAt')
+    
+    class Meta:
+        db_table = 'CHANGE_CHECKPOINT'
+    
+    def __str__(self):
+        return f"{self.consumer} at #{self.lasteventid}"
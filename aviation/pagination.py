@@ -0,0 +1,118 @@
+import base64
+import json
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    """One page of rows plus the cursors needed to move either way"""
+
+    def __init__(self, object_list, page_size, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(values):
+    """Pack the key values of a row into an opaque URL-safe token"""
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """Unpack a cursor token back into typed key values, or None if it is invalid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except Exception:
+        return None
+
+
+def _seek_filter(keys, values, forward):
+    """Build the row-value comparison (k1, k2, ...) > (v1, v2, ...) as an OR of prefixes"""
+    lookup = 'gt' if forward else 'lt'
+    condition = Q()
+    for i, key in enumerate(keys):
+        prefix = {keys[j]: values[j] for j in range(i)}
+        prefix[f'{key}__{lookup}'] = values[i]
+        condition |= Q(**prefix)
+    return condition
+
+
+def keyset_paginate(queryset, keys, cursor=None, direction='next', page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return a KeysetPage of `queryset` ordered by `keys`.
+
+    The page is located by seeking past the cursor row instead of using OFFSET,
+    so every page costs one LIMIT query over an index on `keys`. The last key
+    must be unique (normally the primary key) for the order to be stable.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    forward = direction != 'prev'
+    fields = [queryset.model._meta.get_field(key) for key in keys]
+
+    values = decode_cursor(cursor, fields) if cursor else None
+    if values is None:
+        # Without a valid cursor there is nothing to go back from
+        forward = True
+    else:
+        queryset = queryset.filter(_seek_filter(keys, values, forward))
+
+    ordering = keys if forward else [f'-{key}' for key in keys]
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    def row_cursor(row):
+        return encode_cursor([getattr(row, field.attname) for field in fields])
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = row_cursor(rows[-1])
+        if (has_more and not forward) or (forward and values is not None):
+            previous_cursor = row_cursor(rows[0])
+
+    return KeysetPage(rows, page_size, next_cursor, previous_cursor)
+
+
+def paginate_request(request, queryset, keys):
+    """Apply keyset pagination using the cursor, dir and size query parameters"""
+    try:
+        page_size = int(request.GET.get('size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    return keyset_paginate(
+        queryset,
+        keys,
+        cursor=request.GET.get('cursor'),
+        direction=request.GET.get('dir', 'next'),
+        page_size=page_size,
+    )
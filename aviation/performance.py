@@ -0,0 +1,271 @@
+import datetime
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Min, Q, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Flight, FlightPerformance, FlightRollupState
+from .signals import table_changed
+
+# Arrivals up to this late still count as on time
+ON_TIME_MINUTES = 15
+DIMENSIONS = ('AIRLINE', 'AIRPORT', 'ROUTE')
+DEFAULT_SUMMARY_DAYS = 30
+MAX_TABLE_ROWS = 500
+
+# Counter columns in FLIGHT_PERFORMANCE order
+COUNTERS = ('flights', 'operated', 'ontime', 'delayminutes', 'cancelled', 'diverted')
+
+_INSERT = """
+    INSERT INTO FLIGHT_PERFORMANCE (Period, PeriodStart, Dimension, DimensionKey, Flights,
+    Operated, OnTime, DelayMinutes, Cancelled, Diverted)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+_UPDATE = """
+    UPDATE FLIGHT_PERFORMANCE SET Flights = Flights + %s, Operated = Operated + %s, OnTime = OnTime + %s,
+    DelayMinutes = DelayMinutes + %s, Cancelled = Cancelled + %s, Diverted = Diverted + %s
+    WHERE id = %s
+"""
+_STATE_INSERT = """
+    INSERT INTO FLIGHT_ROLLUP_STATE (FlightID, Day, AirlineID, Origin, Destination, Operated, OnTime,
+    DelayMinutes, Cancelled, Diverted)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _contribution(scheduled_arrival, actual_arrival, status):
+    """The counters one flight adds to each of its rollups"""
+    if status == 'Cancelled':
+        return (1, 0, 0, 0, 1, 0)
+    if status == 'Diverted':
+        return (1, 0, 0, 0, 0, 1)
+    if actual_arrival is None:
+        return (1, 0, 0, 0, 0, 0)
+    delay = max(0, int((actual_arrival - scheduled_arrival).total_seconds() // 60))
+    return (1, 1, int(delay <= ON_TIME_MINUTES), delay, 0, 0)
+
+
+def _keys(airline, origin, destination):
+    """The rollup rows a flight counts towards on its day"""
+    return (('AIRLINE', str(airline)), ('AIRPORT', str(origin)), ('AIRPORT', str(destination)),
+            ('ROUTE', f'{origin}-{destination}'))
+
+
+def _state_row(flight_id, day, airline, origin, destination, counts):
+    # FLIGHT_ROLLUP_STATE keeps every counter but Flights, which is always 1
+    return [flight_id, day, airline, origin, destination, *counts[1:]]
+
+
+def _rebuild_day(day):
+    """Recompute the daily rollups of every flight departing on `day`"""
+    start, end = _day_bounds(day)
+    flights = Flight.objects.filter(scheduleddeparture__gte=start, scheduleddeparture__lt=end)
+    rows = flights.values_list(
+        'flightid', 'scheduledarrival', 'actualarrival', 'flightstatus',
+        'airlineid', 'departureairportcode', 'arrivalairportcode',
+    )
+    totals = {}
+    states = []
+    for flight_id, scheduled, actual, status, airline, origin, destination in rows.iterator():
+        counts = _contribution(scheduled, actual, status)
+        for key in _keys(airline, origin, destination):
+            total = totals.setdefault(key, [0] * len(COUNTERS))
+            for i, count in enumerate(counts):
+                total[i] += count
+        states.append(_state_row(flight_id, day, airline, origin, destination, counts))
+
+    # Forget both the flights that were rolled up under this day and the ones now on it
+    FlightRollupState.objects.filter(Q(day=day) | Q(flightid__in=flights.values('flightid'))).delete()
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM FLIGHT_PERFORMANCE WHERE Period = 'D' AND PeriodStart = %s", [day])
+        cursor.executemany(_INSERT, [['D', day, dimension, key, *total]
+                                     for (dimension, key), total in totals.items()])
+        cursor.executemany(_STATE_INSERT, states)
+
+
+def _rebuild_month(month):
+    """Recompute the monthly rollups by summing the month's daily rows"""
+    rows = FlightPerformance.objects.filter(
+        period='D', periodstart__gte=month, periodstart__lt=_next_month(month),
+    ).values('dimension', 'dimensionkey').annotate(**{f'total_{c}': Sum(c) for c in COUNTERS}).order_by()
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM FLIGHT_PERFORMANCE WHERE Period = 'M' AND PeriodStart = %s", [month])
+        cursor.executemany(_INSERT, [['M', month, row['dimension'], row['dimensionkey'],
+                                      *(row[f'total_{c}'] for c in COUNTERS)] for row in rows])
+
+
+def refresh_days(days):
+    """Rebuild the daily rollups of `days` and the monthly rollups containing them"""
+    days = sorted(set(days))
+    with transaction.atomic():
+        for day in days:
+            _rebuild_day(day)
+        for month in sorted({_month_start(day) for day in days}):
+            _rebuild_month(month)
+    return len(days)
+
+
+def _add_flight(deltas, day, keys, counts, sign):
+    for period, start in (('D', day), ('M', _month_start(day))):
+        for dimension, key in keys:
+            delta = deltas.setdefault((period, start, dimension, key), [0] * len(COUNTERS))
+            for i, count in enumerate(counts):
+                delta[i] += sign * count
+
+
+def _apply_deltas(deltas):
+    """
+    Add `deltas` ({(period, start, dimension, key): counters}) to
+    FLIGHT_PERFORMANCE: existing rows are updated in place, missing ones
+    inserted and rows left with no flights deleted.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    rows = FlightPerformance.objects.select_for_update().filter(
+        period__in={key[0] for key in deltas}, periodstart__in={key[1] for key in deltas},
+        dimensionkey__in={key[3] for key in deltas},
+    ).order_by('id').values_list('id', 'period', 'periodstart', 'dimension', 'dimensionkey', 'flights')
+    existing = {tuple(row[1:5]): (row[0], row[5]) for row in rows}
+    updates, inserts, deletes = [], [], []
+    for key, delta in sorted(deltas.items()):
+        if key in existing:
+            row_id, flights = existing[key]
+            if flights + delta[0] > 0:
+                updates.append([*delta, row_id])
+            else:
+                deletes.append([row_id])
+        elif delta[0] > 0:
+            inserts.append([*key, *delta])
+    with connection.cursor() as cursor:
+        for sql, params in ((_UPDATE, updates), ("DELETE FROM FLIGHT_PERFORMANCE WHERE id = %s", deletes),
+                            (_INSERT, inserts)):
+            if params:
+                cursor.executemany(sql, params)
+
+
+def _roll_flights(flight_ids):
+    states = FlightRollupState.objects.select_for_update().filter(flightid__in=flight_ids).order_by('flightid')
+    legacy = {state.day for state in states if state.airlineid is None}
+    if legacy:
+        refresh_days(legacy)
+        states = states.all()
+    deltas = {}
+    for state in states:
+        counts = (1, state.operated, state.ontime, state.delayminutes, state.cancelled, state.diverted)
+        _add_flight(deltas, state.day, _keys(state.airlineid, state.origin, state.destination), counts, -1)
+    rows = Flight.objects.filter(flightid__in=flight_ids).values_list(
+        'flightid', 'scheduleddeparture', 'scheduledarrival', 'actualarrival', 'flightstatus',
+        'airlineid', 'departureairportcode', 'arrivalairportcode',
+    )
+    new_states = []
+    for flight_id, departure, scheduled, actual, status, airline, origin, destination in rows:
+        day = timezone.localtime(departure).date()
+        counts = _contribution(scheduled, actual, status)
+        _add_flight(deltas, day, _keys(airline, origin, destination), counts, 1)
+        new_states.append(_state_row(flight_id, day, airline, origin, destination, counts))
+    _apply_deltas(deltas)
+    FlightRollupState.objects.filter(flightid__in=flight_ids).delete()
+    with connection.cursor() as cursor:
+        cursor.executemany(_STATE_INSERT, new_states)
+
+
+def refresh_flights(flight_ids):
+    """
+    Bring the rollups up to date after writes to the given flights.
+
+    Each flight's stored contribution is subtracted from the day and month
+    it was last rolled up under and its current one added to the day it
+    departs on now, so a write costs a few statements however busy the day
+    is; a flight moved to another day or deleted is backed out that way.
+    Flights rolled up before contributions were stored rebuild their day.
+    """
+    flight_ids = sorted({flight_id for flight_id in flight_ids if flight_id is not None})
+    if not flight_ids:
+        return 0
+    # A concurrent refresh can insert the same new state or rollup row
+    # first; running again then finds and locks the committed row
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _roll_flights(flight_ids)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    return len(flight_ids)
+
+
+def refresh_all(start=None, end=None):
+    """Rebuild every day from `start` through `end`, by default the whole FLIGHT table"""
+    if start is None or end is None:
+        bounds = Flight.objects.aggregate(first=Min('scheduleddeparture'), last=Max('scheduleddeparture'))
+        if bounds['first'] is None:
+            return 0
+        start = start or timezone.localtime(bounds['first']).date()
+        end = end or timezone.localtime(bounds['last']).date()
+    days = [start + datetime.timedelta(days=n) for n in range((end - start).days + 1)]
+    return refresh_days(days)
+
+
+@receiver(table_changed)
+def _flights_changed(sender, table, pks, **kwargs):
+    if table == 'FLIGHT':
+        refresh_flights(pks)
+
+
+class Performance:
+    """On-time figures for one airline, airport or route over a period"""
+
+    def __init__(self, key=None, **counters):
+        self.key = key
+        for counter in COUNTERS:
+            setattr(self, counter, counters.get(counter) or 0)
+
+    @property
+    def on_time_pct(self):
+        return round(100 * self.ontime / self.operated, 1) if self.operated else None
+
+    @property
+    def average_delay(self):
+        return round(self.delayminutes / self.operated, 1) if self.operated else None
+
+    def as_dict(self):
+        data = {counter: getattr(self, counter) for counter in COUNTERS}
+        data.update(key=self.key, on_time_pct=self.on_time_pct, average_delay=self.average_delay)
+        return data
+
+
+def performance_summary(dimension, key, days=DEFAULT_SUMMARY_DAYS):
+    """Totals for one airline, airport or route over the last `days` days, from the daily rollups"""
+    today = timezone.localdate()
+    totals = FlightPerformance.objects.filter(
+        period='D', dimension=dimension, dimensionkey=str(key),
+        periodstart__gt=today - datetime.timedelta(days=days), periodstart__lte=today,
+    ).aggregate(**{counter: Sum(counter) for counter in COUNTERS})
+    summary = Performance(key, **totals)
+    summary.days = days
+    return summary
+
+
+def performance_table(dimension, period, start, limit=MAX_TABLE_ROWS):
+    """Every airline, airport or route for one day ('D') or month ('M'), busiest first"""
+    if period == 'M':
+        start = _month_start(start)
+    rows = FlightPerformance.objects.filter(period=period, dimension=dimension, periodstart=start).order_by(
+        '-flights', 'dimensionkey').values('dimensionkey', *COUNTERS)[:limit]
+    return [Performance(row.pop('dimensionkey'), **row) for row in rows]
@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.dispatch import receiver
+
+from .models import (AircraftType, Airline, Airport, Alliance, City, Country,
+                     Currency, MaintenanceType, Technician)
+from .routers import PRIMARY
+from .signals import table_changed
+
+# Snapshots are also reloaded after this many seconds, to pick up writes made
+# outside the application (tables such as CURRENCY have no write views)
+REFDATA_MAX_AGE = 300
+
+# Snapshot name -> (tables it is built from, loader)
+SOURCES = {
+    'AIRLINE': (('AIRLINE',), lambda: Airline.objects.all()),
+    'AIRPORT': (('AIRPORT',), lambda: Airport.objects.all()),
+    'AIRCRAFT_TYPE': (('AIRCRAFT_TYPE',), lambda: AircraftType.objects.all()),
+    'ALLIANCE': (('ALLIANCE',), lambda: Alliance.objects.all()),
+    'CITY': (('CITY',), lambda: City.objects.all()),
+    'COUNTRY': (('COUNTRY',), lambda: Country.objects.all()),
+    'CURRENCY': (('CURRENCY',), lambda: Currency.objects.all()),
+    'MAINTENANCE_TYPE': (('MAINTENANCE_TYPE',), lambda: MaintenanceType.objects.all()),
+    'TECHNICIAN': (('TECHNICIAN', 'CREW_MEMBER'),
+                   lambda: Technician.objects.select_related('crewid')),
+}
+
+TRACKED_TABLES = {table for tables, _ in SOURCES.values() for table in tables}
+
+# Cache alias for per-row versions (one key per flight, booking, ...), kept
+# apart so that their number cannot evict the table versions in 'default'
+ROW_CACHE = 'rows'
+
+# Process-local snapshots: name -> (versions, loaded_at, rows)
+_snapshots = {}
+
+
+def _version_key(table):
+    return f'refdata:version:{table}'
+
+
+def version_cache(rows=False):
+    """The cache holding table versions, or with `rows` per-row versions if CACHES has a ROW_CACHE alias"""
+    if rows and ROW_CACHE in settings.CACHES:
+        return caches[ROW_CACHE]
+    return cache
+
+
+def table_versions(tables, rows=False):
+    """Current version of each table (or per-row scope), read from the shared cache in one call"""
+    store = version_cache(rows)
+    keys = [_version_key(table) for table in tables]
+    versions = store.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Seed with a timestamp so a lost key never reuses an old version
+            store.add(key, time.time_ns(), None)
+            versions[key] = store.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(table, rows=False):
+    """Move a table (or per-row scope) to a new version and return it"""
+    store = version_cache(rows)
+    key = _version_key(table)
+    try:
+        return store.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        store.set(key, version, None)
+        return version
+
+
+@receiver(table_changed)
+def _invalidate(sender, table, **kwargs):
+    if table in TRACKED_TABLES:
+        bump_version(table)
+
+
+def reference_data(name):
+    """
+    Return an immutable tuple of the rows of a reference table.
+
+    The rows are loaded once per process and reused until a write view bumps
+    the version of one of the underlying tables, so a version check against
+    the cache is all a typical form page costs.
+    """
+    tables, load = SOURCES[name]
+    versions = table_versions(tables)
+    now = time.monotonic()
+    snapshot = _snapshots.get(name)
+    if snapshot and snapshot[0] == versions and now - snapshot[1] < REFDATA_MAX_AGE:
+        return snapshot[2]
+    rows = tuple(load().using(PRIMARY))
+    _snapshots[name] = (versions, now, rows)
+    return rows
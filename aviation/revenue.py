@@ -0,0 +1,361 @@
+import bisect
+import datetime
+import json
+import threading
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .changefeed import ChangeFeedConsumer
+from .models import Booking, CurrencyRate, RevenueContribution, RevenueDaily, RevenueRollupState, Ticket
+from .refdata import bump_version, table_versions
+from .routers import PRIMARY
+from .signals import table_changed
+
+DIMENSIONS = ('CHANNEL', 'STATUS', 'COUNTRY', 'AIRLINE')
+# Airline key of bookings that have no tickets yet
+NO_AIRLINE = ''
+MAX_TABLE_ROWS = 500
+CENT = Decimal('0.01')
+
+# Change-feed consumer that reconverts bookings after CURRENCY_RATE writes
+RATE_CONSUMER = 'revenue-rates'
+
+_INSERT = """
+    INSERT INTO REVENUE_DAILY (Day, Dimension, DimensionKey, Bookings, Amount, Unconverted)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+_UPDATE = """
+    UPDATE REVENUE_DAILY SET Bookings = Bookings + %s, Amount = Amount + %s, Unconverted = Unconverted + %s
+    WHERE id = %s
+"""
+_CONTRIBUTION_INSERT = """
+    INSERT INTO REVENUE_CONTRIBUTION (BookingID, Dimension, DimensionKey, Amount) VALUES (%s, %s, %s, %s)
+"""
+
+
+def reporting_currency():
+    return getattr(settings, 'AVIATION_REPORTING_CURRENCY', None)
+
+
+class RateTable:
+    """
+    Every currency's rates into the reporting currency, sorted by the day
+    they take effect, for converting many amounts at once.
+    """
+
+    def __init__(self, rows, reporting=None):
+        dates = {}
+        rates = {}
+        for currency, day, rate in rows:
+            dates.setdefault(currency, []).append(day.toordinal())
+            rates.setdefault(currency, []).append(float(rate))
+        if np is not None:
+            dates = {currency: np.array(days) for currency, days in dates.items()}
+            rates = {currency: np.array(values) for currency, values in rates.items()}
+        self.dates = dates
+        self.rates = rates
+        self.reporting = reporting
+
+    def convert(self, amounts, currencies, days):
+        """
+        Amounts converted at the rate in effect on each day, None where the
+        currency has no rate yet.
+
+        Rows are grouped by currency and each group is converted with one
+        vectorised searchsorted over that currency's rate dates when NumPy is
+        installed; otherwise each row bisects.
+        """
+        converted = [None] * len(amounts)
+        groups = {}
+        for i, currency in enumerate(currencies):
+            groups.setdefault(currency, []).append(i)
+        for currency, rows in groups.items():
+            if currency == self.reporting:
+                for i in rows:
+                    converted[i] = float(amounts[i])
+                continue
+            dates = self.dates.get(currency)
+            if dates is None:
+                continue
+            rates = self.rates[currency]
+            if np is not None:
+                wanted = np.array([days[i].toordinal() for i in rows])
+                positions = np.searchsorted(dates, wanted, side='right') - 1
+                values = np.array([float(amounts[i]) for i in rows]) * rates[np.maximum(positions, 0)]
+                for i, position, value in zip(rows, positions.tolist(), values.tolist()):
+                    if position >= 0:
+                        converted[i] = value
+            else:
+                for i in rows:
+                    position = bisect.bisect_right(dates, days[i].toordinal()) - 1
+                    if position >= 0:
+                        converted[i] = float(amounts[i]) * rates[position]
+        return converted
+
+
+_lock = threading.Lock()
+_rate_table = None
+
+
+def rate_table():
+    """The process-wide RateTable, reloaded after any CURRENCY_RATE write"""
+    global _rate_table
+    (version,) = table_versions(('CURRENCY_RATE',))
+    with _lock:
+        if _rate_table is not None and _rate_table[0] == version:
+            return _rate_table[1]
+    rows = CurrencyRate.objects.using(PRIMARY).order_by('currencycode', 'ratedate').values_list('currencycode', 'ratedate', 'rate')
+    table = RateTable(rows.iterator(), reporting_currency())
+    with _lock:
+        _rate_table = (version, table)
+    return table
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _contributions(amount, channel, status, country, airlines):
+    """
+    (dimension, key, amount) for each REVENUE_DAILY row one booking counts
+    towards; amount is None when it could not be converted. The AIRLINE
+    rows split it in proportion to the booking's tickets per airline.
+    """
+    if amount is not None:
+        amount = Decimal(amount).quantize(CENT)
+    rows = [('CHANNEL', channel, amount), ('STATUS', status, amount), ('COUNTRY', str(country), amount)]
+    airlines = airlines or [(NO_AIRLINE, 1)]
+    issued = sum(count for _, count in airlines)
+    for airline, count in airlines:
+        share = None if amount is None else (amount * count / issued).quantize(CENT)
+        rows.append(('AIRLINE', str(airline), share))
+    return rows
+
+
+def _booking_rows(bookings, rates):
+    """(booking ID, day, contributions) for each booking in the `bookings` queryset"""
+    rows = list(bookings.values_list('bookingid', 'bookingdate', 'totalamount', 'currencycode',
+                                     'bookingchannel', 'bookingstatus', 'passengerid__countrycode'))
+    # Tickets per airline for each booking; revenue is split in proportion
+    tickets = {}
+    for booking_id, airline, count in Ticket.objects.filter(bookingid__in=[row[0] for row in rows]).values_list(
+            'bookingid', 'flightid__airlineid').annotate(n=Count('ticketid')).order_by():
+        tickets.setdefault(booking_id, []).append((airline, count))
+    days = [timezone.localtime(row[1]).date() for row in rows]
+    converted = rates.convert([row[2] for row in rows], [row[3] for row in rows], days)
+    return [(booking_id, day, _contributions(amount, channel, status, country, tickets.get(booking_id)))
+            for (booking_id, _, _, _, channel, status, country), day, amount in zip(rows, days, converted)]
+
+
+def _add_booking(deltas, day, contributions, sign):
+    for dimension, key, amount in contributions:
+        delta = deltas.setdefault((day, dimension, key), [0, Decimal(0), 0])
+        delta[0] += sign
+        if amount is None:
+            delta[2] += sign
+        else:
+            delta[1] += sign * amount
+
+
+def _write_state(booking_rows):
+    with connection.cursor() as cursor:
+        cursor.executemany("INSERT INTO REVENUE_ROLLUP_STATE (BookingID, Day) VALUES (%s, %s)",
+                           [[booking_id, day] for booking_id, day, _ in booking_rows])
+        cursor.executemany(_CONTRIBUTION_INSERT, [[booking_id, *contribution]
+                                                  for booking_id, _, contributions in booking_rows
+                                                  for contribution in contributions])
+
+
+def _rebuild_day(day, rates):
+    """Recompute the revenue rollups of every booking made on `day`"""
+    start, end = _day_bounds(day)
+    bookings = Booking.objects.filter(bookingdate__gte=start, bookingdate__lt=end)
+    booking_rows = _booking_rows(bookings, rates)
+    totals = {}
+    for _, _, contributions in booking_rows:
+        _add_booking(totals, day, contributions, 1)
+
+    stale = RevenueRollupState.objects.filter(Q(day=day) | Q(bookingid__in=[row[0] for row in booking_rows]))
+    RevenueContribution.objects.filter(bookingid__in=stale.values('bookingid')).delete()
+    stale.delete()
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM REVENUE_DAILY WHERE Day = %s", [day])
+        cursor.executemany(_INSERT, [[day, dimension, key, *total]
+                                     for (_, dimension, key), total in totals.items()])
+    _write_state(booking_rows)
+
+
+def refresh_days(days):
+    """Rebuild the revenue rollups of `days`"""
+    days = sorted(set(days))
+    rates = rate_table()
+    with transaction.atomic():
+        for day in days:
+            _rebuild_day(day, rates)
+    return len(days)
+
+
+def _apply_deltas(deltas):
+    """
+    Add `deltas` ({(day, dimension, key): [bookings, amount, unconverted]})
+    to REVENUE_DAILY: existing rows are updated in place, missing ones
+    inserted and rows left with no bookings deleted.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    rows = RevenueDaily.objects.select_for_update().filter(
+        day__in={key[0] for key in deltas}, dimensionkey__in={key[2] for key in deltas},
+    ).order_by('id').values_list('id', 'day', 'dimension', 'dimensionkey', 'bookings')
+    existing = {tuple(row[1:4]): (row[0], row[4]) for row in rows}
+    updates, inserts, deletes = [], [], []
+    for key, delta in sorted(deltas.items()):
+        if key in existing:
+            row_id, bookings = existing[key]
+            if bookings + delta[0] > 0:
+                updates.append([*delta, row_id])
+            else:
+                deletes.append([row_id])
+        elif delta[0] > 0:
+            inserts.append([*key, *delta])
+    with connection.cursor() as cursor:
+        for sql, params in ((_UPDATE, updates), ("DELETE FROM REVENUE_DAILY WHERE id = %s", deletes),
+                            (_INSERT, inserts)):
+            if params:
+                cursor.executemany(sql, params)
+
+
+def _roll_bookings(booking_ids):
+    states = dict(RevenueRollupState.objects.select_for_update().filter(bookingid__in=booking_ids)
+                  .order_by('bookingid').values_list('bookingid', 'day'))
+    stored_rows = RevenueContribution.objects.filter(bookingid__in=booking_ids)
+    stored = {}
+    for booking_id, dimension, key, amount in stored_rows.values_list('bookingid', 'dimension',
+                                                                         'dimensionkey', 'amount'):
+        stored.setdefault(booking_id, []).append((dimension, key, amount))
+    legacy = {day for booking_id, day in states.items() if booking_id not in stored}
+    if legacy:
+        refresh_days(legacy)
+        return _roll_bookings(booking_ids)
+    deltas = {}
+    for booking_id, day in states.items():
+        _add_booking(deltas, day, stored[booking_id], -1)
+    booking_rows = _booking_rows(Booking.objects.filter(bookingid__in=booking_ids), rate_table())
+    for _, day, contributions in booking_rows:
+        _add_booking(deltas, day, contributions, 1)
+    _apply_deltas(deltas)
+    stored_rows.delete()
+    RevenueRollupState.objects.filter(bookingid__in=booking_ids).delete()
+    _write_state(booking_rows)
+
+
+def refresh_bookings(booking_ids):
+    """
+    Bring the rollups up to date after writes to the given bookings.
+
+    Each booking's stored contributions are subtracted from the day it was
+    last rolled up under and its current ones, at today's rates, added to
+    the day it was made on, so a write costs a few statements however busy
+    the day is. Bookings rolled up before contributions were stored
+    rebuild their day.
+    """
+    booking_ids = sorted({booking_id for booking_id in booking_ids if booking_id is not None})
+    if not booking_ids:
+        return 0
+    # A concurrent refresh can insert the same new state or rollup row
+    # first; running again then finds and locks the committed row
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _roll_bookings(booking_ids)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+    return len(booking_ids)
+
+
+def refresh_all(start=None, end=None):
+    """Rebuild every day from `start` through `end`, by default the whole BOOKING table"""
+    if start is None or end is None:
+        bounds = Booking.objects.aggregate(first=Min('bookingdate'), last=Max('bookingdate'))
+        if bounds['first'] is None:
+            return 0
+        start = start or timezone.localtime(bounds['first']).date()
+        end = end or timezone.localtime(bounds['last']).date()
+    days = [start + datetime.timedelta(days=n) for n in range((end - start).days + 1)]
+    return refresh_days(days)
+
+
+def _rate_days(currency, since):
+    """Days with bookings in `currency` that the rate effective from `since` applies to"""
+    bookings = Booking.objects.filter(currencycode=currency, bookingdate__gte=_day_bounds(since)[0])
+    until = CurrencyRate.objects.filter(currencycode=currency, ratedate__gt=since).aggregate(
+        next=Min('ratedate'))['next']
+    if until is not None:
+        bookings = bookings.filter(bookingdate__lt=_day_bounds(until)[0])
+    return {timezone.localtime(made).date() for made in bookings.values_list('bookingdate', flat=True).iterator()}
+
+
+def _reconvert(events):
+    days = set()
+    for event in events:
+        currency, since = json.loads(event.rowkey)
+        days.update(_rate_days(currency, datetime.date.fromisoformat(since)))
+    refresh_days(days)
+
+
+def refresh_rate_changes():
+    """
+    Reconvert the bookings that CURRENCY_RATE writes since the last run
+    apply to, rebuilding their days; returns the number of rate changes.
+
+    A rate can reprice every booking in its currency from its date on, so
+    this runs from the refresh_revenue command rather than in the write's
+    request. Until then bookings keep the amounts they were rolled up with.
+    """
+    feed = ChangeFeedConsumer(RATE_CONSUMER, tables=['CURRENCY_RATE'])
+    return feed.drain(_reconvert)
+
+
+@receiver(table_changed)
+def _revenue_inputs_changed(sender, table, action, pks, related=None, **kwargs):
+    if table == 'BOOKING':
+        refresh_bookings(pks)
+    elif table == 'TICKET':
+        # The airline split of the tickets' bookings may have changed. The
+        # writer names the old and new bookings; looking them up now would
+        # miss those of deleted or moved tickets.
+        if related is not None:
+            refresh_bookings(set(related.get('BOOKING', ())))
+        elif action != 'delete':
+            refresh_bookings(set(Ticket.objects.filter(ticketid__in=pks).values_list('bookingid', flat=True)))
+    elif table == 'CURRENCY_RATE':
+        # New booking writes convert at the new rate at once; the bookings
+        # already rolled up are reconverted by refresh_rate_changes()
+        bump_version('CURRENCY_RATE')
+
+
+def revenue_table(dimension, start, end, limit=MAX_TABLE_ROWS):
+    """Totals per channel, status, country or airline for days in [start, end], highest revenue first"""
+    return list(RevenueDaily.objects.filter(dimension=dimension, day__gte=start, day__lte=end)
+                .values('dimensionkey').annotate(bookings_total=Sum('bookings'), amount_total=Sum('amount'),
+                                                 unconverted_total=Sum('unconverted'))
+                .order_by('-amount_total', 'dimensionkey')[:limit])
+
+
+def revenue_totals(start, end):
+    """Overall totals for days in [start, end]; every booking has exactly one status row"""
+    return RevenueDaily.objects.filter(dimension='STATUS', day__gte=start, day__lte=end).aggregate(
+        bookings=Sum('bookings'), amount=Sum('amount'), unconverted=Sum('unconverted'))
@@ -0,0 +1,233 @@
+import bisect
+import datetime
+
+from django.utils import timezone
+
+from .gates import parse_schedule_time, schedule_changed
+from .models import Flight
+
+# Ground time an aircraft needs between arriving and departing again
+MIN_TURNAROUND = datetime.timedelta(minutes=30)
+
+# Flight columns that place a leg in its aircraft's rotation
+ROTATION_FIELDS = ('aircraftid', 'departureairportcode', 'arrivalairportcode', 'scheduleddeparture',
+                   'scheduledarrival')
+
+LEG_COLUMNS = ('flightid', 'flightnumber', 'aircraftid', 'scheduleddeparture', 'scheduledarrival',
+               'departureairportcode', 'arrivalairportcode')
+
+
+class Leg:
+    __slots__ = ('flight_id', 'flight_number', 'aircraft', 'departure', 'arrival', 'origin', 'destination')
+
+    def __init__(self, flight_id, flight_number, aircraft, departure, arrival, origin, destination):
+        self.flight_id = flight_id
+        self.flight_number = flight_number
+        self.aircraft = aircraft
+        self.departure = departure
+        self.arrival = arrival
+        self.origin = origin
+        self.destination = destination
+
+
+class RotationIssue:
+    def __init__(self, kind, first, second, detail):
+        self.kind = kind
+        self.first = first
+        self.second = second
+        self.detail = detail
+
+
+class AircraftTimeline:
+    """One aircraft's legs ordered by scheduled departure"""
+
+    def __init__(self, legs):
+        self.legs = sorted(legs, key=lambda leg: (leg.departure, leg.flight_id))
+        self.departures = [leg.departure for leg in self.legs]
+
+    def previous(self, departure):
+        """The last leg departing before `departure`"""
+        i = bisect.bisect_left(self.departures, departure)
+        return self.legs[i - 1] if i else None
+
+    def following(self, departure):
+        """The first leg departing at or after `departure`"""
+        i = bisect.bisect_left(self.departures, departure)
+        return self.legs[i] if i < len(self.legs) else None
+
+    def add(self, leg):
+        i = bisect.bisect_right(self.departures, leg.departure)
+        self.legs.insert(i, leg)
+        self.departures.insert(i, leg.departure)
+
+    def overlapping(self, departure, arrival):
+        """Legs whose airborne time plus turnaround overlaps [departure, arrival)"""
+        end = bisect.bisect_left(self.departures, arrival + MIN_TURNAROUND)
+        return [leg for leg in self.legs[:end] if leg.arrival + MIN_TURNAROUND > departure]
+
+
+def _legs(queryset):
+    return [Leg(*row) for row in queryset.values_list(*LEG_COLUMNS).iterator()]
+
+
+def _scheduled():
+    return Flight.objects.exclude(flightstatus='Cancelled')
+
+
+def _when(moment):
+    return f'{timezone.localtime(moment):%Y-%m-%d %H:%M}'
+
+
+def check_rotation(flight_id, aircraft, departure, arrival, origin, destination):
+    """
+    Messages describing how the given leg would break its aircraft's rotation.
+
+    Reads only the aircraft's legs around the new one: those overlapping it,
+    plus the legs immediately before and after (three indexed queries on
+    AircraftID, ScheduledDeparture).
+    """
+    if arrival <= departure:
+        return ['Scheduled arrival must be after scheduled departure']
+    flights = _scheduled().filter(aircraftid=aircraft).exclude(flightid=flight_id)
+    nearby = _legs(flights.filter(scheduleddeparture__lt=arrival + MIN_TURNAROUND,
+                                  scheduledarrival__gt=departure - MIN_TURNAROUND))
+    nearby += _legs(flights.filter(scheduleddeparture__lt=departure).order_by('-scheduleddeparture')[:1])
+    nearby += _legs(flights.filter(scheduleddeparture__gte=departure).order_by('scheduleddeparture')[:1])
+    timeline = AircraftTimeline({leg.flight_id: leg for leg in nearby}.values())
+    return _rotation_errors(timeline, Leg(flight_id, None, aircraft, departure, arrival, origin, destination),
+                            timeline.following(departure))
+
+
+def _rotation_errors(timeline, leg, following):
+    """How `leg` fits between the legs of `timeline` and the `following` leg"""
+    aircraft = leg.aircraft
+    errors = []
+    for other in timeline.overlapping(leg.departure, leg.arrival):
+        errors.append(
+            f'Aircraft #{aircraft} is already flying {other.flight_number} from {_when(other.departure)} '
+            f'to {_when(other.arrival)} (turnaround {MIN_TURNAROUND.seconds // 60} min)'
+        )
+    previous = timeline.previous(leg.departure)
+    if previous and previous.destination != leg.origin:
+        errors.append(
+            f'Aircraft #{aircraft} ends its previous leg {previous.flight_number} at airport '
+            f'{previous.destination}, not at departure airport {leg.origin}'
+        )
+    if following and following.origin != leg.destination:
+        errors.append(
+            f'Aircraft #{aircraft} starts its next leg {following.flight_number} at airport '
+            f'{following.origin}, not at arrival airport {leg.destination}'
+        )
+    return errors
+
+
+def check_rotation_rows(rows):
+    """
+    Rotation checks for validated flight rows about to be inserted.
+
+    Returns {line: message}. Each aircraft's rows are taken in departure
+    order and checked against its existing legs and the rows accepted
+    before them, so a file may hold a whole rotation; the next leg is the
+    next row clear of the turnaround when that departs first. Three queries
+    per aircraft read the existing legs around the rows.
+    """
+    rejected = {}
+    by_aircraft = {}
+    for line, cleaned in rows:
+        if cleaned['flightstatus'] == 'Cancelled':
+            continue
+        leg = Leg(*(cleaned[column] for column in LEG_COLUMNS))
+        if leg.arrival <= leg.departure:
+            rejected[line] = 'Scheduled arrival must be after scheduled departure'
+            continue
+        by_aircraft.setdefault(leg.aircraft, []).append((line, leg))
+
+    for aircraft, legs in by_aircraft.items():
+        legs.sort(key=lambda item: (item[1].departure, item[0]))
+        first = legs[0][1].departure
+        last = max(leg.arrival for _, leg in legs)
+        flights = _scheduled().filter(aircraftid=aircraft)
+        existing = _legs(flights.filter(scheduleddeparture__lt=last + MIN_TURNAROUND,
+                                        scheduledarrival__gt=first - MIN_TURNAROUND))
+        existing += _legs(flights.filter(scheduleddeparture__lt=first).order_by('-scheduleddeparture')[:1])
+        existing += _legs(flights.filter(scheduleddeparture__gte=last).order_by('scheduleddeparture')[:1])
+        timeline = AircraftTimeline({leg.flight_id: leg for leg in existing}.values())
+        for i, (line, leg) in enumerate(legs):
+            following = timeline.following(leg.departure)
+            # Rows departing sooner overlap this leg and are rejected with it
+            later = next((other for _, other in legs[i + 1:]
+                          if other.departure >= leg.arrival + MIN_TURNAROUND), None)
+            if later and (following is None or later.departure <= following.departure):
+                following = later
+            errors = _rotation_errors(timeline, leg, following)
+            if errors:
+                rejected[line] = '; '.join(errors)
+            else:
+                timeline.add(leg)
+    return rejected
+
+
+def check_flight_rotation(flight_id, data, current=None):
+    """
+    check_rotation() for a flight form's cleaned data or raw POST values.
+
+    Cancelled legs are not part of a rotation, and an edit (`current` is the
+    stored flight) that keeps the aircraft, airports and scheduled times is
+    not checked, so breaks already listed on the rotations report never
+    block cancelling a leg or recording its actual times.
+    """
+    if data.get('flightstatus') == 'Cancelled':
+        return []
+    if current is not None and not schedule_changed(current, data, ROTATION_FIELDS):
+        return []
+    try:
+        departure = parse_schedule_time(data.get('scheduleddeparture'))
+        arrival = parse_schedule_time(data.get('scheduledarrival'))
+        aircraft, origin, destination = (int(data.get(field)) for field in
+                                         ('aircraftid', 'departureairportcode', 'arrivalairportcode'))
+    except (TypeError, ValueError):
+        # Malformed input is reported by the form or the database instead
+        return []
+    if departure is None or arrival is None:
+        return []
+    return check_rotation(int(flight_id), aircraft, departure, arrival, origin, destination)
+
+
+def rotation_report(start, end, aircraft=None):
+    """
+    Overlaps, short turnarounds and airport breaks in every aircraft's rotation
+    for flights departing in [start, end).
+
+    The legs are streamed ordered by (AircraftID, ScheduledDeparture) and
+    checked in a single pass per aircraft: each leg is compared with the
+    previous leg for continuity and with the latest-arriving earlier leg for
+    overlap, so a long leg spanning several others is still caught.
+    """
+    flights = _scheduled().filter(scheduleddeparture__gte=start, scheduleddeparture__lt=end)
+    if aircraft is not None:
+        flights = flights.filter(aircraftid=aircraft)
+    rows = flights.order_by('aircraftid', 'scheduleddeparture', 'flightid').values_list(*LEG_COLUMNS)
+
+    issues = []
+    previous = latest = None
+    for row in rows.iterator():
+        leg = Leg(*row)
+        if previous is None or previous.aircraft != leg.aircraft:
+            previous = latest = leg
+            continue
+        if leg.departure < latest.arrival:
+            issues.append(RotationIssue('overlap', latest, leg,
+                                        f'departs {_when(leg.departure)} before {latest.flight_number} '
+                                        f'lands at {_when(latest.arrival)}'))
+        elif leg.departure < latest.arrival + MIN_TURNAROUND:
+            issues.append(RotationIssue('turnaround', latest, leg,
+                                        f'{int((leg.departure - latest.arrival).total_seconds() // 60)} min '
+                                        f'on the ground, {MIN_TURNAROUND.seconds // 60} needed'))
+        if previous.destination != leg.origin:
+            issues.append(RotationIssue('break', previous, leg,
+                                        f'lands at airport {previous.destination}, next leg leaves '
+                                        f'from airport {leg.origin}'))
+        previous = leg
+        if leg.arrival > latest.arrival:
+            latest = leg
+    return issues
@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import threading
+from collections import deque
+
+from django.dispatch import receiver
+
+from .models import Route
+from .refdata import bump_version, table_versions
+from .routers import PRIMARY
+from .signals import table_changed
+
+DEFAULT_PATHS = 3
+MAX_PATHS = 10
+# Intermediate airports allowed on a path (a direct route has 0 stops)
+DEFAULT_MAX_STOPS = 2
+MAX_STOPS = 4
+
+# Index of each weight in a route's (km, minutes) tuple
+WEIGHTS = {'distance': 0, 'duration': 1}
+
+ROUTE_COLUMNS = ('routeid', 'originairportcode', 'destinationairportcode',
+                 'distancekm', 'estimateddurationmins')
+
+
+class RouteGraph:
+    """
+    Adjacency index over ROUTE.
+
+    adjacency maps origin -> destination -> {route id: (km, minutes)}, so
+    parallel routes between the same pair are kept and the cheapest one is
+    chosen per query. inbound maps destination -> origins for backward
+    searches. All reads and writes hold the graph's lock.
+    """
+
+    def __init__(self, rows=()):
+        self.lock = threading.RLock()
+        self.routes = {}
+        self.adjacency = {}
+        self.inbound = {}
+        for row in rows:
+            self.add(*row)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def add(self, route_id, origin, destination, km, minutes):
+        with self.lock:
+            self.remove(route_id)
+            self.routes[route_id] = (origin, destination)
+            self.adjacency.setdefault(origin, {}).setdefault(destination, {})[route_id] = (km, minutes)
+            self.inbound.setdefault(destination, set()).add(origin)
+
+    def remove(self, route_id):
+        with self.lock:
+            ends = self.routes.pop(route_id, None)
+            if ends is None:
+                return
+            origin, destination = ends
+            parallel = self.adjacency[origin][destination]
+            del parallel[route_id]
+            if not parallel:
+                del self.adjacency[origin][destination]
+                if not self.adjacency[origin]:
+                    del self.adjacency[origin]
+                self.inbound[destination].discard(origin)
+                if not self.inbound[destination]:
+                    del self.inbound[destination]
+
+    def _cheapest_legs(self, origin, weight):
+        """(destination, route id, km, minutes) of the cheapest route to each neighbour"""
+        for destination, parallel in self.adjacency.get(origin, {}).items():
+            route_id, (km, minutes) = min(parallel.items(), key=lambda item: item[1][weight])
+            yield destination, route_id, km, minutes
+
+    def hop_distances(self, start, max_hops=None, reverse=False):
+        """Breadth-first hop count from `start` (or to it, if reverse) for every airport in range"""
+        with self.lock:
+            hops = {start: 0}
+            frontier = [start]
+            depth = 0
+            while frontier and (max_hops is None or depth < max_hops):
+                depth += 1
+                following = []
+                for airport in frontier:
+                    neighbours = self.inbound.get(airport, ()) if reverse else self.adjacency.get(airport, ())
+                    for neighbour in neighbours:
+                        if neighbour not in hops:
+                            hops[neighbour] = depth
+                            following.append(neighbour)
+                frontier = following
+            return hops
+
+    def reachable(self, origin, max_stops):
+        """Airports reachable from `origin` with at most `max_stops` connections -> stops needed"""
+        hops = self.hop_distances(origin, max_stops + 1)
+        return {airport: count - 1 for airport, count in hops.items() if airport != origin}
+
+    def min_hops(self, origin, destination):
+        """A path with the fewest legs as a list of legs, or None if unreachable"""
+        with self.lock:
+            if origin == destination:
+                return None
+            parents = {origin: None}
+            queue = deque([origin])
+            while queue and destination not in parents:
+                airport = queue.popleft()
+                for neighbour in self.adjacency.get(airport, ()):
+                    if neighbour not in parents:
+                        parents[neighbour] = airport
+                        queue.append(neighbour)
+            if destination not in parents:
+                return None
+            legs = []
+            airport = destination
+            while parents[airport] is not None:
+                previous = parents[airport]
+                parallel = self.adjacency[previous][airport]
+                route_id, (km, minutes) = min(parallel.items(), key=lambda item: item[1][0])
+                legs.append((route_id, previous, airport, km, minutes))
+                airport = previous
+            return legs[::-1]
+
+    def shortest_paths(self, origin, destination, k=DEFAULT_PATHS, weight='distance',
+                       max_stops=DEFAULT_MAX_STOPS):
+        """
+        Up to `k` loopless paths from origin to destination, cheapest first.
+
+        A best-first search over partial paths that settles each (airport,
+        legs so far) state at most k times. Airports that cannot reach the
+        destination within the remaining legs (found with one backward
+        breadth-first pass) are never expanded, which keeps the search to
+        the corridor between the two airports.
+        """
+        index = WEIGHTS[weight]
+        max_legs = max_stops + 1
+        with self.lock:
+            if origin == destination:
+                return []
+            to_destination = self.hop_distances(destination, max_legs, reverse=True)
+            if origin not in to_destination:
+                return []
+            counter = itertools.count()
+            heap = [(0, next(counter), origin, ())]
+            settled = {}
+            paths = []
+            while heap and len(paths) < k:
+                cost, _, airport, legs = heapq.heappop(heap)
+                if airport == destination:
+                    paths.append(legs)
+                    continue
+                state = (airport, len(legs))
+                if settled.get(state, 0) >= k:
+                    continue
+                settled[state] = settled.get(state, 0) + 1
+                remaining = max_legs - len(legs) - 1
+                visited = {origin}.union(leg[2] for leg in legs)
+                for neighbour, route_id, km, minutes in self._cheapest_legs(airport, index):
+                    if neighbour in visited or to_destination.get(neighbour, max_legs) > remaining:
+                        continue
+                    leg = (route_id, airport, neighbour, km, minutes)
+                    heapq.heappush(heap, (cost + leg[3 + index], next(counter), neighbour, legs + (leg,)))
+            return [list(legs) for legs in paths]
+
+
+def describe_path(legs):
+    """JSON-ready summary of a list of (route id, origin, destination, km, minutes) legs"""
+    return {
+        'airports': [legs[0][1]] + [leg[2] for leg in legs],
+        'routes': [leg[0] for leg in legs],
+        'stops': len(legs) - 1,
+        'distance_km': sum(leg[3] for leg in legs),
+        'duration_mins': sum(leg[4] for leg in legs),
+    }
+
+
+_lock = threading.Lock()
+_graph = None
+_version = None
+
+
+def _load():
+    return RouteGraph(Route.objects.using(PRIMARY).values_list(*ROUTE_COLUMNS).iterator())
+
+
+def route_graph():
+    """
+    The process-wide route graph.
+
+    Writes made through this process are applied to it incrementally; if the
+    ROUTE version in the shared cache shows another process wrote too, the
+    graph is rebuilt from the table.
+    """
+    global _graph, _version
+    (version,) = table_versions(('ROUTE',))
+    with _lock:
+        if _graph is None or _version != version:
+            _graph = _load()
+            _version = version
+        return _graph
+
+
+@receiver(table_changed)
+def _apply_route_write(sender, table, pks, **kwargs):
+    global _version
+    if table != 'ROUTE':
+        return
+    with _lock:
+        previous = _version
+        version = bump_version('ROUTE')
+        if _graph is None or previous is None or version != previous + 1:
+            # Someone else has written since our last sync; the version
+            # mismatch makes route_graph() rebuild on next use
+            return
+        route_ids = [int(pk) for pk in pks if pk is not None and str(pk).isdigit()]
+        rows = Route.objects.using(PRIMARY).filter(routeid__in=route_ids).values_list(*ROUTE_COLUMNS)
+        with _graph.lock:
+            for route_id in route_ids:
+                _graph.remove(route_id)
+            for row in rows:
+                _graph.add(*row)
+        _version = version
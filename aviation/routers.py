@@ -0,0 +1,134 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+PRIMARY = 'default'
+# Set on the response to a write; while present the client reads from the primary
+STICKY_COOKIE = 'aviation_primary'
+DEFAULT_STICKY_SECONDS = 10
+# A replica that fails to connect is skipped for this long
+REPLICA_RETRY_SECONDS = 30
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = contextvars.ContextVar('aviation_replica_reads', default=None)
+
+_lock = threading.Lock()
+_unavailable = {}
+
+
+def _replicas():
+    return getattr(settings, 'AVIATION_READ_REPLICAS', ())
+
+
+def _healthy(alias):
+    """Connect to a replica, or check its persistent connection once per request"""
+    now = time.monotonic()
+    with _lock:
+        if _unavailable.get(alias, 0) > now:
+            return False
+    connection = connections[alias]
+    try:
+        connection.close_if_health_check_failed()
+        connection.ensure_connection()
+    except DatabaseError:
+        with _lock:
+            _unavailable[alias] = now + REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def _choose_replica():
+    replicas = list(_replicas())
+    random.shuffle(replicas)
+    for alias in replicas:
+        if _healthy(alias):
+            return alias
+    return PRIMARY
+
+
+class ReplicaReads:
+    """The replica one request reads from, chosen on its first read and kept for the rest"""
+
+    def __init__(self):
+        self.alias = None
+        self.lock = threading.Lock()
+
+    def alias_for_read(self):
+        # Pool threads of the same request share this object
+        with self.lock:
+            if self.alias is None:
+                self.alias = _choose_replica()
+            return self.alias
+
+
+def read_alias():
+    """
+    The database the current request reads from: a healthy replica if it may
+    use one, else the primary.
+
+    Every read of a request goes to the same database, so its queries never
+    see two replicas at different replication positions.
+    """
+    reads = _replica_reads.get()
+    if reads is None:
+        return PRIMARY
+    return reads.alias_for_read()
+
+
+class ReplicaRouter:
+    """
+    Send ORM reads of replica-eligible requests to AVIATION_READ_REPLICAS and
+    everything else to the primary.
+
+    Only ORM queries pass through a router. The raw-SQL write paths use
+    django.db.connection, which is always the primary, and so do management
+    commands and signal receivers run outside a GET request.
+
+    Process-wide caches keyed by a table version (reference data, the route
+    graph, seat inventories, timetables, exchange rates) load with
+    .using(PRIMARY): a lagging replica would otherwise store old rows under
+    the new version until the next write.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return db == PRIMARY
+
+
+class ReplicaReadsMiddleware:
+    """
+    Let GET requests read from the replicas, except for a client that wrote
+    within the last AVIATION_REPLICA_STICKY_SECONDS, which keeps reading the
+    primary so it sees its own writes despite replication lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky = getattr(settings, 'AVIATION_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        replica = bool(_replicas()) and safe and STICKY_COOKIE not in request.COOKIES
+        token = _replica_reads.set(ReplicaReads() if replica else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        if not safe and _replicas():
+            response.set_cookie(STICKY_COOKIE, '1', max_age=self.sticky, httponly=True, samesite='Lax')
+        return response
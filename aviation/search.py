@@ -0,0 +1,166 @@
+from difflib import SequenceMatcher
+
+from django.db import connections
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Airline, Airport, Flight, Passenger
+from .routers import read_alias
+
+# Candidates fetched per entity type before the combined re-ranking
+CANDIDATES_PER_TYPE = 20
+RESULT_LIMIT = 25
+
+# MySQL's default; the server's own value is read once per database alias
+DEFAULT_NGRAM_TOKEN_SIZE = 2
+_ngram_token_sizes = {}
+
+# Each branch reads one FULLTEXT (ngram) index created in migration 0004.
+# InnoDB maintains those indexes itself on every INSERT/UPDATE/DELETE, so the
+# raw-SQL write views need no extra bookkeeping to keep search current.
+FULLTEXT_SQL = """
+    (SELECT 'Flight', f.FlightID, f.FlightNumber,
+            CONCAT(al.AirlineName, ' - ', dep.AirportName, ' to ', arr.AirportName),
+            f.FlightStatus, MATCH(f.FlightNumber) AGAINST (%s) AS score
+     FROM FLIGHT f
+     JOIN AIRLINE al ON f.AirlineID = al.AirlineID
+     JOIN AIRPORT dep ON f.DepartureAirportCode = dep.AirportCode
+     JOIN AIRPORT arr ON f.ArrivalAirportCode = arr.AirportCode
+     WHERE MATCH(f.FlightNumber) AGAINST (%s)
+     ORDER BY score DESC LIMIT %s)
+    UNION ALL
+    (SELECT 'Airline', a.AirlineID, a.AirlineName, CONCAT('ICAO: ', a.AirlineICAO),
+            NULL, MATCH(a.AirlineName) AGAINST (%s) AS score
+     FROM AIRLINE a
+     WHERE MATCH(a.AirlineName) AGAINST (%s)
+     ORDER BY score DESC LIMIT %s)
+    UNION ALL
+    (SELECT 'Airport', ap.AirportCode, ap.AirportName, CONCAT(c.CityName, ', ', co.CountryName),
+            NULL, MATCH(ap.AirportName) AGAINST (%s) AS score
+     FROM AIRPORT ap
+     JOIN CITY c ON ap.CityID = c.CityID
+     JOIN COUNTRY co ON c.CountryCode = co.CountryCode
+     WHERE MATCH(ap.AirportName) AGAINST (%s)
+     ORDER BY score DESC LIMIT %s)
+    UNION ALL
+    (SELECT 'Passenger', p.PassengerID, CONCAT(p.FirstName, ' ', p.LastName),
+            CONCAT('Email: ', p.Email), NULL,
+            MATCH(p.FirstName, p.LastName) AGAINST (%s) AS score
+     FROM PASSENGER p
+     WHERE MATCH(p.FirstName, p.LastName) AGAINST (%s)
+     ORDER BY score DESC LIMIT %s)
+"""
+
+DETAIL_URLS = {
+    'Flight': 'flight_detail',
+    'Airline': 'airline_detail',
+    'Airport': 'airport_detail',
+    'Passenger': 'passenger_detail',
+}
+
+
+def _fulltext_candidates(connection, query, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(FULLTEXT_SQL, [query, query, limit] * 4)
+        return cursor.fetchall()
+
+
+def ngram_token_size(connection):
+    """The server's ngram_token_size; shorter terms produce no ngram tokens"""
+    size = _ngram_token_sizes.get(connection.alias)
+    if size is None:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT @@ngram_token_size')
+            row = cursor.fetchone()
+        size = int(row[0]) if row and row[0] else DEFAULT_NGRAM_TOKEN_SIZE
+        _ngram_token_sizes[connection.alias] = size
+    return size
+
+
+def _uses_fulltext(connection, query):
+    """
+    FULLTEXT needs at least one word as long as an ngram token; the ngram
+    parser drops anything shorter, so a one-character query would match nothing.
+    """
+    if connection.vendor != 'mysql':
+        return False
+    return max(len(word) for word in query.split()) >= ngram_token_size(connection)
+
+
+def _fallback_candidates(query, limit):
+    """Substring matching for terms too short for the ngram indexes, or backends without them (e.g. SQLite)"""
+    rows = []
+    flights = Flight.objects.filter(flightnumber__icontains=query).select_related(
+        'airlineid', 'departureairportcode', 'arrivalairportcode'
+    )[:limit]
+    for flight in flights:
+        rows.append(('Flight', flight.flightid, flight.flightnumber,
+                     f'{flight.airlineid.airlinename} - {flight.departureairportcode.airportname} '
+                     f'to {flight.arrivalairportcode.airportname}',
+                     flight.flightstatus, 0))
+    for airline in Airline.objects.filter(airlinename__icontains=query)[:limit]:
+        rows.append(('Airline', airline.airlineid, airline.airlinename,
+                     f'ICAO: {airline.airlineicao}', None, 0))
+    airports = Airport.objects.filter(airportname__icontains=query).select_related(
+        'cityid__countrycode'
+    )[:limit]
+    for airport in airports:
+        rows.append(('Airport', airport.airportcode, airport.airportname,
+                     f'{airport.cityid.cityname}, {airport.cityid.countrycode.countryname}', None, 0))
+    passengers = Passenger.objects.filter(
+        Q(firstname__icontains=query) | Q(lastname__icontains=query)
+    )[:limit]
+    for passenger in passengers:
+        rows.append(('Passenger', passenger.passengerid,
+                     f'{passenger.firstname} {passenger.lastname}',
+                     f'Email: {passenger.email}', None, 0))
+    return rows
+
+
+def similarity(query, text):
+    """Score how closely `text` matches `query`, tolerating small typos"""
+    query = query.lower()
+    text = (text or '').lower()
+    if text == query:
+        return 2.0
+    if text.startswith(query):
+        return 1.5
+    words = text.split() + [text]
+    return max(SequenceMatcher(None, query, word).ratio() for word in words)
+
+
+def search(query, limit=RESULT_LIMIT):
+    """
+    Ranked search across flights, airlines, airports and passengers.
+
+    Candidates come from the FULLTEXT ngram indexes in a single UNION query;
+    ngram matching also catches misspellings that share character pairs with
+    the stored value. Terms shorter than the ngram token size use substring
+    matching instead. Candidates are then re-ranked together by string
+    similarity so the best match wins regardless of entity type.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    connection = connections[read_alias()]
+    if _uses_fulltext(connection, query):
+        rows = _fulltext_candidates(connection, query, CANDIDATES_PER_TYPE)
+    else:
+        rows = _fallback_candidates(query, CANDIDATES_PER_TYPE)
+
+    ranked = sorted(
+        rows,
+        key=lambda row: (similarity(query, row[2]), row[5] or 0),
+        reverse=True,
+    )
+    return [
+        {
+            'type': kind,
+            'title': f'Flight {title}' if kind == 'Flight' else title,
+            'subtitle': subtitle,
+            'url': reverse(DETAIL_URLS[kind], args=[pk]),
+            'status': status,
+        }
+        for kind, pk, title, subtitle, status, score in ranked[:limit]
+    ]
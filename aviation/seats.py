@@ -0,0 +1,234 @@
+import re
+import threading
+from collections import OrderedDict
+
+from django.dispatch import receiver
+
+from .models import Flight, Ticket
+from .refdata import bump_version, table_versions
+from .routers import PRIMARY
+from .signals import table_changed
+
+# Cabin layout used to number seats: row 1 is 1A..1F, row 2 is 2A..2F, ...
+SEAT_LETTERS = 'ABCDEF'
+# Tickets in these states no longer hold their seat
+RELEASED_STATUSES = ('Cancelled', 'Refunded', 'Void')
+
+MAX_AVAILABILITY_FLIGHTS = 200
+# Inventories kept per process; size the 'rows' cache alias for at least as
+# many per-flight versions
+MAX_CACHED_FLIGHTS = 10000
+
+_SEAT_RE = re.compile(r'^\s*(\d{1,3})\s*([A-Za-z])\s*$')
+
+
+def seat_index(seat):
+    """Bit position of a seat label such as '12C', or None if it is not a seat"""
+    match = _SEAT_RE.match(seat or '')
+    if not match:
+        return None
+    row, letter = int(match.group(1)), SEAT_LETTERS.find(match.group(2).upper())
+    if row < 1 or letter < 0:
+        return None
+    return (row - 1) * len(SEAT_LETTERS) + letter
+
+
+def seat_label(index):
+    row, letter = divmod(index, len(SEAT_LETTERS))
+    return f'{row + 1}{SEAT_LETTERS[letter]}'
+
+
+class SeatInventory:
+    """
+    Seat map of one flight as a bitset, one bit per seat up to the aircraft
+    type's capacity, with ticket counts per seat class kept alongside so
+    availability questions never touch TICKET.
+    """
+
+    __slots__ = ('flight_id', 'capacity', 'bits', 'by_class', 'unplaced')
+
+    def __init__(self, flight_id, capacity):
+        self.flight_id = flight_id
+        self.capacity = capacity or 0
+        self.bits = bytearray((self.capacity + 7) // 8)
+        self.by_class = {}
+        # Tickets whose seat is outside the cabin or already taken
+        self.unplaced = 0
+
+    def copy(self):
+        other = SeatInventory(self.flight_id, self.capacity)
+        other.bits[:] = self.bits
+        other.by_class = dict(self.by_class)
+        other.unplaced = self.unplaced
+        return other
+
+    def _position(self, seat):
+        index = seat_index(seat)
+        if index is None or index >= self.capacity:
+            return None
+        return index
+
+    def is_valid(self, seat):
+        return self._position(seat) is not None
+
+    def is_free(self, seat):
+        index = self._position(seat)
+        return index is not None and not self.bits[index >> 3] & (1 << (index & 7))
+
+    def take(self, seat, seatclass):
+        """Mark a seat as held by a ticket of `seatclass`; False if it could not be placed"""
+        index = self._position(seat)
+        self.by_class[seatclass] = self.by_class.get(seatclass, 0) + 1
+        if index is None or self.bits[index >> 3] & (1 << (index & 7)):
+            self.unplaced += 1
+            return False
+        self.bits[index >> 3] |= 1 << (index & 7)
+        return True
+
+    @property
+    def taken(self):
+        return sum(self.by_class.values())
+
+    @property
+    def free(self):
+        return max(0, self.capacity - self.taken)
+
+    @property
+    def load_factor(self):
+        return self.taken / self.capacity if self.capacity else None
+
+    def free_seats(self):
+        return [seat_label(i) for i in range(self.capacity) if not self.bits[i >> 3] & (1 << (i & 7))]
+
+    def summary(self):
+        return {
+            'capacity': self.capacity,
+            'taken': self.taken,
+            'free': self.free,
+            'load_factor': round(self.load_factor, 4) if self.capacity else None,
+            'by_class': {str(seatclass): count for seatclass, count in sorted(self.by_class.items())},
+            'unplaced': self.unplaced,
+        }
+
+
+_lock = threading.Lock()
+# flight id -> (versions, SeatInventory), least recently used first
+_inventories = OrderedDict()
+
+
+def _versions(flight_ids):
+    """(all-tickets version, per-flight version) for each flight"""
+    (tickets,) = table_versions(('TICKET',))
+    versions = table_versions([f'SEATS:{flight_id}' for flight_id in flight_ids], rows=True)
+    return {flight_id: (tickets, version) for flight_id, version in zip(flight_ids, versions)}
+
+
+def _load(flight_ids):
+    capacities = dict(Flight.objects.using(PRIMARY).filter(flightid__in=flight_ids).values_list(
+        'flightid', 'aircraftid__aircrafttypecode__maxpassengers'))
+    inventories = {flight_id: SeatInventory(flight_id, capacity) for flight_id, capacity in capacities.items()}
+    tickets = Ticket.objects.using(PRIMARY).filter(flightid__in=list(inventories)).exclude(
+        ticketstatus__in=RELEASED_STATUSES).values_list('flightid', 'seatnumber', 'seatclass')
+    for flight_id, seat, seatclass in tickets.iterator():
+        inventories[flight_id].take(seat, seatclass)
+    return inventories
+
+
+def _store(flight_id, versions, inventory):
+    _inventories[flight_id] = (versions, inventory)
+    _inventories.move_to_end(flight_id)
+    while len(_inventories) > MAX_CACHED_FLIGHTS:
+        _inventories.popitem(last=False)
+
+
+def seat_inventories(flight_ids):
+    """
+    SeatInventory for each existing flight in `flight_ids`.
+
+    Cached inventories are reused while their versions in the shared cache
+    are unchanged; the rest are built together with one query for the
+    capacities and one for the tickets.
+    """
+    flight_ids = list(dict.fromkeys(flight_ids))
+    versions = _versions(flight_ids)
+    found = {}
+    with _lock:
+        for flight_id in flight_ids:
+            cached = _inventories.get(flight_id)
+            if cached and cached[0] == versions[flight_id]:
+                _inventories.move_to_end(flight_id)
+                found[flight_id] = cached[1]
+    missing = [flight_id for flight_id in flight_ids if flight_id not in found]
+    if missing:
+        loaded = _load(missing)
+        with _lock:
+            for flight_id, inventory in loaded.items():
+                _store(flight_id, versions[flight_id], inventory)
+        found.update(loaded)
+    return found
+
+
+def seat_inventory(flight_id):
+    return seat_inventories([flight_id]).get(flight_id)
+
+
+def check_ticket_rows(rows):
+    """
+    Seat checks for validated ticket rows about to be inserted.
+
+    Returns {line: message} for rows whose seat is not in the cabin, is
+    already held, or whose flight is full. Rows earlier in the batch hold
+    their seats for the rows after them. The inventories are built from the
+    tickets table rather than the cache: an upload announces its tickets
+    only after its last chunk, so the cache lacks its earlier chunks' seats.
+    """
+    inventories = _load(list({cleaned['flightid'] for _, cleaned in rows}))
+    rejected = {}
+    for line, cleaned in rows:
+        if cleaned['ticketstatus'] in RELEASED_STATUSES:
+            continue
+        inventory = inventories.get(cleaned['flightid'])
+        seat = cleaned['seatnumber']
+        if inventory is None:
+            continue
+        if not inventory.is_valid(seat):
+            rejected[line] = f'Seat {seat} is not in the cabin of flight {cleaned["flightid"]}'
+        elif not inventory.is_free(seat):
+            rejected[line] = f'Seat {seat} on flight {cleaned["flightid"]} is already taken'
+        elif not inventory.free:
+            rejected[line] = f'Flight {cleaned["flightid"]} is full'
+        else:
+            inventory.take(seat, cleaned['seatclass'])
+    return rejected
+
+
+@receiver(table_changed)
+def _apply_write(sender, table, action, pks, **kwargs):
+    if table == 'TICKET' and action == 'insert':
+        _apply_new_tickets(pks)
+    elif table == 'TICKET' or (table in ('AIRCRAFT', 'AIRCRAFT_TYPE') and action == 'update'):
+        # The flights affected are no longer known: start every inventory afresh
+        bump_version('TICKET')
+    elif table == 'FLIGHT' and action != 'insert':
+        for pk in pks:
+            bump_version(f'SEATS:{pk}', rows=True)
+
+
+def _apply_new_tickets(pks):
+    """Take the seats of newly inserted tickets in the cached inventories"""
+    rows = Ticket.objects.using(PRIMARY).filter(ticketid__in=pks).exclude(
+        ticketstatus__in=RELEASED_STATUSES).values_list('flightid', 'seatnumber', 'seatclass')
+    by_flight = {}
+    for flight_id, seat, seatclass in rows:
+        by_flight.setdefault(flight_id, []).append((seat, seatclass))
+    with _lock:
+        for flight_id, seats in by_flight.items():
+            cached = _inventories.pop(flight_id, None)
+            version = bump_version(f'SEATS:{flight_id}', rows=True)
+            if cached is None or version != cached[0][1] + 1:
+                # Another process changed this flight too; rebuild on next use
+                continue
+            inventory = cached[1]
+            for seat, seatclass in seats:
+                inventory.take(seat, seatclass)
+            _store(flight_id, (cached[0][0], version), inventory)
@@ -0,0 +1,47 @@
+import logging
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .changefeed import record_changes
+
+logger = logging.getLogger(__name__)
+
+# Sent by the raw-SQL write views once an INSERT, UPDATE or DELETE has
+# committed. Keyword arguments: table (e.g. 'FLIGHT'), action ('insert',
+# 'update' or 'delete'), pk (primary key of the affected row), rows (rows
+# affected), pks (every affected key; for bulk writes pk is None and only
+# pks is set) and related ({table: keys} of the parent rows the write touched,
+# old and new, or None when the writer did not supply them).
+table_changed = Signal()
+
+
+def notify_write(table, action, pk, rows=1, pks=None, outbox=True, related=None):
+    """
+    Announce a write to the change feed and to every subsystem that keeps
+    derived state.
+
+    Call it inside the write's transaction: the CHANGE_EVENT rows are
+    written there, and the receivers run once it commits. Pass
+    outbox=False when the caller has already recorded the rows with
+    record_changes(). Pass `related` for child rows whose parents the
+    receivers cannot find after the commit, such as a deleted ticket's
+    flight and booking. A failing receiver is logged rather than turned
+    into an error for the user.
+    """
+    if not rows:
+        return
+    if pks is None:
+        pks = [pk]
+    if outbox:
+        record_changes(table, action, pks)
+    transaction.on_commit(lambda: _dispatch(table, action, pk, rows, pks, related))
+
+
+def _dispatch(table, action, pk, rows, pks, related):
+    responses = table_changed.send_robust(sender=table, table=table, action=action,
+                                          pk=pk, rows=rows, pks=pks, related=related)
+    for receiver, response in responses:
+        if isinstance(response, Exception):
+            logger.error('table_changed receiver %r failed for %s %s', receiver, table, action,
+                         exc_info=response)
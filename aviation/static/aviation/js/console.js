@@ -0,0 +1,58 @@
+// Simple search functionality
+document.getElementById('searchInput').addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') {
+        const query = this.value;
+        if (query) {
+            window.location.href = '/search/?q=' + encodeURIComponent(query);
+        }
+    }
+});
+
+// Typeahead inputs: fill the linked <datalist> from the lookup endpoint as the user types
+document.querySelectorAll('input[data-lookup]').forEach(function(input) {
+    const options = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            return;
+        }
+        timer = setTimeout(function() {
+            fetch(input.dataset.lookup + '?q=' + encodeURIComponent(query))
+                .then(response => response.json())
+                .then(data => {
+                    options.innerHTML = '';
+                    data.results.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = item.id;
+                        option.label = item.label;
+                        option.textContent = item.label;
+                        options.appendChild(option);
+                    });
+                });
+        }, 200);
+    });
+});
+
+// Delete confirmation
+function confirmDelete(itemName) {
+    return confirm(`Are you sure you want to delete ${itemName}? This action cannot be undone.`);
+}
+
+// User profile dropdown toggle (Hybrid: Hover + Click)
+const userProfileBtn = document.getElementById('userProfileBtn');
+const userDropdown = document.getElementById('userDropdown');
+
+// Toggle on click
+userProfileBtn.addEventListener('click', function(e) {
+    e.stopPropagation();
+    this.classList.toggle('active');
+});
+
+// Close when clicking outside
+document.addEventListener('click', function(e) {
+    if (!userProfileBtn.contains(e.target)) {
+        userProfileBtn.classList.remove('active');
+    }
+});
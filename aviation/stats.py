@@ -0,0 +1,87 @@
+from django.db import connection
+from django.db.models import F
+from django.dispatch import receiver
+
+from .models import StatCounter
+from .signals import table_changed
+
+# Tables whose row counts appear on the dashboard
+COUNTED_TABLES = ('FLIGHT', 'AIRCRAFT', 'AIRPORT', 'COUNTRY')
+DATABASE_SIZE = 'DATABASE_SIZE'
+
+
+@receiver(table_changed)
+def _count_rows(sender, table, action, rows=1, **kwargs):
+    """Keep the dashboard counters in step with inserts and deletes"""
+    if table not in COUNTED_TABLES or action == 'update':
+        return
+    delta = rows if action == 'insert' else -rows
+    StatCounter.objects.filter(name=table).update(value=F('value') + delta)
+
+
+def reconcile_counts():
+    """Recount every tracked table and overwrite the cached counters"""
+    counts = {}
+    with connection.cursor() as cursor:
+        for table in COUNTED_TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+    for table, value in counts.items():
+        StatCounter.objects.update_or_create(name=table, defaults={'value': value})
+    return counts
+
+
+def measure_database_size():
+    """Return the on-disk size of the database in bytes, or None if unknown"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute("""
+                SELECT COALESCE(SUM(DATA_LENGTH + INDEX_LENGTH), 0)
+                FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE()
+            """)
+            return int(cursor.fetchone()[0])
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()")
+            return int(cursor.fetchone()[0])
+    return None
+
+
+def refresh_database_size():
+    size = measure_database_size()
+    if size is not None:
+        StatCounter.objects.update_or_create(name=DATABASE_SIZE, defaults={'value': size})
+    return size
+
+
+def refresh_stats():
+    """Periodic job: reconcile drifted counters and re-measure the database size"""
+    counts = reconcile_counts()
+    counts[DATABASE_SIZE] = refresh_database_size()
+    return counts
+
+
+def format_size(num_bytes):
+    if num_bytes is None:
+        return 'Unknown'
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+def dashboard_stats():
+    """Counters for the dashboard, read from STAT_COUNTER in a single query"""
+    stats = dict(StatCounter.objects.values_list('name', 'value'))
+    if any(table not in stats for table in COUNTED_TABLES):
+        # First run before the refresh job has seeded the counters
+        stats.update(reconcile_counts())
+    return {
+        'total_flights': stats['FLIGHT'],
+        'active_aircraft': stats['AIRCRAFT'],
+        'total_airports': stats['AIRPORT'],
+        'total_countries': stats['COUNTRY'],
+        'database_size': format_size(stats.get(DATABASE_SIZE)),
+    }
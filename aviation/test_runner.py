@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+
+
+class AviationTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner that also creates tables for the aviation models mapped
+    onto the existing schema (managed = False), which the test database
+    would otherwise lack.
+    """
+
+    def setup_databases(self, **kwargs):
+        unmanaged = [model for model in apps.get_app_config('aviation').get_models() if not model._meta.managed]
+        for model in unmanaged:
+            model._meta.managed = True
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            for model in unmanaged:
+                model._meta.managed = False
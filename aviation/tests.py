@@ -1,3 +1,1439 @@
-from django.test import TestCase
+import datetime
+import io
+import random
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk_upload, performance, refdata, revenue, routers, search as search_module, seats, views
+from .boards import TimeWindow, fleet_summary, flight_board, parse_window
+from .bulk_upload import UPLOADS, process_upload
+from .changefeed import GAP_TIMEOUT_SECONDS, ChangeFeedConsumer, read_changes
+from .crew import MAX_SIT, MIN_REST, CrewLeg, CrewTimeline, assign_crew, unassign_crew
+from .gates import GateSchedule, Occupancy, check_flight_gates, check_gate_rows, day_conflicts
+from .geo import AirportIndex, haversine_km, haversine_many
+from .itineraries import MAX_CONNECTION_HOURS, MIN_CONNECTION_MINUTES, Timetable, _connections, _pareto
+from .lookups import MAX_ID_DIGITS, id_prefix_ranges, lookup_results
+from .maintenance import due_counts, due_within, overdue
+from .metrics import registry
+from .models import (Aircraft, AircraftType, Airline, Airport, Alliance, Booking, ChangeEvent, City, Country,
+                     CrewAssignment, CrewMember, Currency, CurrencyRate, Flight, FlightPerformance, FlightRollupState,
+                     MaintenanceType, Passenger, RevenueContribution, RevenueDaily, SeatClass, StatCounter, Technician,
+                     Terminal, Ticket)
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .performance import performance_table
+from .refdata import bump_version, reference_data
+from .revenue import revenue_table, revenue_totals
+from .routers import PRIMARY, STICKY_COOKIE, ReplicaReadsMiddleware
+from .rotations import check_flight_rotation, check_rotation, check_rotation_rows, rotation_report
+from .route_graph import RouteGraph, describe_path
+from .search import search
+from .seats import SeatInventory, seat_index, seat_inventory, seat_label
+from .signals import notify_write, table_changed
+from .stats import dashboard_stats, reconcile_counts
+
+T0 = timezone.make_aware(datetime.datetime(2026, 6, 1, 6, 0))
+
+
+def create_network(airports=3, aircraft=2, capacity=180):
+    """The reference rows a Flight needs: airports 1..n with terminal n, one airline and its aircraft"""
+    country = Country.objects.create(countrycode=1, countryname='Ireland')
+    city = City.objects.create(cityid=1, cityname='Dublin', countrycode=country)
+    alliance = Alliance.objects.create(allianceid=1, alliancename='Test Alliance', allianceheadquarters=city)
+    Airline.objects.create(airlineid=1, airlinename='Test Air', airlineicao='TST', headquarterscityid=city,
+                           foundedyear=1990, allianceid=alliance)
+    AircraftType.objects.create(aircrafttypecode=1, typename='A320', maxpassengers=capacity, maintenancetypeid=1)
+    for i in range(1, airports + 1):
+        airport = Airport.objects.create(airportcode=i, airportname=f'Airport {i}', latitude=Decimal('53.0'),
+                                         longitude=Decimal(f'{i}.0'), timezone='UTC', cityid=city)
+        Terminal.objects.create(terminalid=i, terminalname='T1', isinternational=True, airportcode=airport)
+    for i in range(1, aircraft + 1):
+        Aircraft.objects.create(aircraftid=i, manufactureyear=2015, lastmaintenancedate=datetime.date(2026, 1, 1),
+                                airlineid_id=1, aircrafttypecode_id=1)
+
+
+def create_booking(booking_id=1):
+    """A passenger and a booking of theirs; returns the booking"""
+    Currency.objects.get_or_create(currencycode=1, defaults={'currencyname': 'Euro', 'currencysymbol': 'EUR'})
+    passenger = Passenger.objects.create(
+        passengerid=booking_id, firstname='Test', lastname='Passenger', email=f'p{booking_id}@example.com',
+        phone='000', dateofbirth=datetime.date(1990, 1, 1), passportnumber=f'P{booking_id}', countrycode_id=1,
+        nationality='Irish')
+    return Booking.objects.create(bookingid=booking_id, bookingdate=T0, totalamount=Decimal('100.00'),
+                                  bookingstatus='Confirmed', bookingchannel='Website', passengerid=passenger,
+                                  currencycode_id=1)
+
+
+def create_ticket(ticket_id, flight_id, seat, booking=None, seatclass=1, status='Issued'):
+    booking = booking or Booking.objects.get(bookingid=1)
+    return Ticket.objects.create(ticketid=ticket_id, seatnumber=seat, ticketstatus=status, bookingid=booking,
+                                 flightid_id=flight_id, seatclass_id=seatclass,
+                                 passengerid_id=booking.passengerid_id)
+
+
+def clear_caches():
+    for store in caches.all():
+        store.clear()
+
+
+def create_flight(flight_id, departure, hours=2, aircraft=1, origin=1, destination=2,
+                  departure_gate=1, arrival_gate=1, status='Scheduled'):
+    return Flight.objects.create(
+        flightid=flight_id, flightnumber=f'TS{flight_id}', scheduleddeparture=departure,
+        scheduledarrival=departure + datetime.timedelta(hours=hours), flightstatus=status, airlineid_id=1,
+        aircraftid_id=aircraft, departureairportcode_id=origin, arrivalairportcode_id=destination,
+        departureterminalid_id=origin, arrivalterminalid_id=destination,
+        departuregatenumber=departure_gate, arrivalgatenumber=arrival_gate,
+    )
+
+
+class KeysetPaginationTests(TestCase):
+    KEYS = ['scheduleddeparture', 'flightid']
+
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        # Departures repeat in threes, so pages split runs of equal sort keys
+        for i in range(1, 23):
+            create_flight(i, T0 + datetime.timedelta(hours=(i - 1) // 3))
+        cls.expected = list(Flight.objects.order_by(*cls.KEYS).values_list('flightid', flat=True))
+
+    def walk_forward(self, page_size):
+        page = keyset_paginate(Flight.objects.all(), self.KEYS, page_size=page_size)
+        pages = [page]
+        while page.has_next:
+            page = keyset_paginate(Flight.objects.all(), self.KEYS, cursor=page.next_cursor, page_size=page_size)
+            pages.append(page)
+        return pages
+
+    def ids(self, page):
+        return [flight.flightid for flight in page]
+
+    def test_cursor_round_trip(self):
+        flight = Flight.objects.get(flightid=5)
+        fields = [Flight._meta.get_field(key) for key in self.KEYS]
+        token = encode_cursor([flight.scheduleddeparture, flight.flightid])
+        self.assertEqual(decode_cursor(token, fields), [flight.scheduleddeparture, 5])
+
+    def test_invalid_cursor_is_rejected(self):
+        fields = [Flight._meta.get_field(key) for key in self.KEYS]
+        self.assertIsNone(decode_cursor('not-a-cursor', fields))
+        self.assertIsNone(decode_cursor(encode_cursor([1]), fields))
+
+    def test_forward_walk_visits_every_row_once_across_ties(self):
+        for page_size in (1, 2, 4, 5, 22):
+            pages = self.walk_forward(page_size)
+            self.assertEqual([i for page in pages for i in self.ids(page)], self.expected, page_size)
+
+    def test_first_and_last_pages(self):
+        pages = self.walk_forward(5)
+        self.assertEqual(len(pages), 5)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[0].has_next)
+        self.assertTrue(pages[-1].has_previous)
+        self.assertFalse(pages[-1].has_next)
+        self.assertEqual(self.ids(pages[-1]), self.expected[20:])
+
+    def test_backward_walk_mirrors_forward_walk(self):
+        pages = self.walk_forward(4)
+        page = pages[-1]
+        seen = [self.ids(page)]
+        while page.has_previous:
+            page = keyset_paginate(Flight.objects.all(), self.KEYS, cursor=page.previous_cursor,
+                                   direction='prev', page_size=4)
+            seen.append(self.ids(page))
+        self.assertEqual(seen[::-1], [self.ids(p) for p in pages])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_exact_multiple_of_page_size_has_no_empty_last_page(self):
+        pages = self.walk_forward(11)
+        self.assertEqual([len(page) for page in pages], [11, 11])
+        self.assertFalse(pages[-1].has_next)
+
+    def test_empty_queryset(self):
+        page = keyset_paginate(Flight.objects.none(), self.KEYS)
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_other_pages)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        create_flight(1, T0)
+        create_flight(2, T0 + datetime.timedelta(days=2))
+        cls.user = User.objects.create_user('staff')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_flights'), params)
+        self.assertEqual(response.status_code, 200)
+        rows = b''.join(response.streaming_content).decode().splitlines()[1:]
+        return response, [int(row.split(',')[0]) for row in rows]
+
+    def test_date_range_is_inclusive(self):
+        self.assertEqual(self.export(to=T0.date().isoformat())[1], [1])
+        self.assertEqual(self.export(**{'from': T0.date().isoformat()})[1], [1, 2])
+
+    def test_impossible_dates_are_ignored(self):
+        self.assertEqual(self.export(**{'from': '2024-02-30', 'to': '9999-12-31'})[1], [1, 2])
+
+    def test_filename_is_stamped_with_the_local_date(self):
+        response, _ = self.export()
+        self.assertIn(f'flights-{timezone.localdate().isoformat()}.csv', response['Content-Disposition'])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        create_flight(1, T0)
+        create_booking()
+
+    def titles(self, query):
+        return [(result['type'], result['title']) for result in search(query)]
+
+    def test_best_match_wins_across_types(self):
+        self.assertEqual(self.titles('Airport 2')[0], ('Airport', 'Airport 2'))
+        self.assertEqual(self.titles('TS1')[0], ('Flight', 'Flight TS1'))
+        self.assertEqual(self.titles('passenger'), [('Passenger', 'Test Passenger')])
+        self.assertEqual(self.titles('  '), [])
+
+    def test_terms_shorter_than_an_ngram_use_substring_matching(self):
+        mysql = mock.Mock(vendor='mysql', alias='mysql')
+        with mock.patch.dict(search_module._ngram_token_sizes, {'mysql': 2}):
+            self.assertFalse(search_module._uses_fulltext(mysql, 'A'))
+            self.assertFalse(search_module._uses_fulltext(mysql, 'A 1'))
+            self.assertTrue(search_module._uses_fulltext(mysql, 'TS'))
+            # A one-character query reaches the icontains candidates, never the FULLTEXT SQL
+            with mock.patch.object(search_module, 'connections', {PRIMARY: mysql}):
+                self.assertIn(('Airline', 'Test Air'), self.titles('T'))
+        mysql.cursor.assert_not_called()
+
+
+class StatCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        create_flight(1, T0)
+
+    def setUp(self):
+        reconcile_counts()
+
+    def counter(self, table):
+        return StatCounter.objects.get(name=table).value
+
+    def test_committed_writes_move_the_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_flight(2, T0)
+            notify_write('FLIGHT', 'insert', 2)
+        self.assertEqual(self.counter('FLIGHT'), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.filter(flightid__in=[1, 2]).delete()
+            notify_write('FLIGHT', 'delete', None, 2, pks=[1, 2])
+        self.assertEqual(self.counter('FLIGHT'), 0)
+        # Updates leave the counts alone
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_write('AIRCRAFT', 'update', 1)
+        self.assertEqual(dashboard_stats()['active_aircraft'], 2)
+
+    def test_rolled_back_writes_leave_the_counters(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                create_flight(2, T0)
+                notify_write('FLIGHT', 'insert', 2)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.counter('FLIGHT'), 1)
+        self.assertEqual(dashboard_stats()['total_flights'], 1)
+
+    def test_missing_counters_are_reconciled(self):
+        StatCounter.objects.all().delete()
+        self.assertEqual(dashboard_stats()['total_airports'], 3)
+        self.assertEqual(self.counter('AIRPORT'), 3)
+
+
+class RefDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+
+    def setUp(self):
+        clear_caches()
+        refdata._snapshots.clear()
+
+    def test_snapshot_is_reused_until_its_table_version_moves(self):
+        self.assertEqual([a.airlinename for a in reference_data('AIRLINE')], ['Test Air'])
+        reference_data('COUNTRY')
+        with self.assertNumQueries(0):
+            reference_data('AIRLINE')
+        Airline.objects.filter(airlineid=1).update(airlinename='Renamed Air')
+        with self.assertNumQueries(0):
+            self.assertEqual(reference_data('AIRLINE')[0].airlinename, 'Test Air')
+        bump_version('AIRLINE')
+        with self.assertNumQueries(1):
+            self.assertEqual(reference_data('AIRLINE')[0].airlinename, 'Renamed Air')
+        # Other snapshots keep their rows
+        with self.assertNumQueries(0):
+            reference_data('COUNTRY')
+
+    def test_announced_writes_reload_every_dependent_snapshot(self):
+        CrewMember.objects.create(crewid=1, firstname='Test', lastname='Technician',
+                                  dateofbirth=datetime.date(1980, 1, 1), hiredate=datetime.date(2010, 1, 1),
+                                  crewtype=3, airlineid_id=1, airportcode_id=1)
+        Technician.objects.create(technicianid=1, licensenumber='L1', licenseexpiry=datetime.date(2030, 1, 1),
+                                  crewid_id=1)
+        self.assertEqual(reference_data('TECHNICIAN')[0].crewid.lastname, 'Technician')
+        # TECHNICIAN snapshots embed their crew member, so a CREW_MEMBER write reloads them too
+        with self.captureOnCommitCallbacks(execute=True):
+            CrewMember.objects.filter(crewid=1).update(lastname='Renamed')
+            notify_write('CREW_MEMBER', 'update', 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(reference_data('TECHNICIAN')[0].crewid.lastname, 'Renamed')
+
+
+class IdPrefixTests(TestCase):
+    def test_ranges_ascend_without_overlap(self):
+        ranges = id_prefix_ranges('12')
+        self.assertEqual(ranges[:3], [(12, 12), (120, 129), (1200, 1299)])
+        self.assertEqual(len(ranges), MAX_ID_DIGITS - 1)
+        self.assertTrue(all(high < low for (_, high), (low, _) in zip(ranges, ranges[1:])))
+
+    def test_leading_zeros(self):
+        self.assertEqual(id_prefix_ranges('0'), [(0, 0)])
+        self.assertEqual(id_prefix_ranges('05'), [])
+
+    def test_lookup_reads_ranges_in_key_order(self):
+        create_network(aircraft=12)
+        self.assertEqual([row['id'] for row in lookup_results('aircraft', '1', limit=5)], [1, 10, 11, 12])
+        self.assertEqual([row['id'] for row in lookup_results('aircraft', '1', limit=2)], [1, 10])
+        self.assertEqual(lookup_results('aircraft', '01'), [])
+        self.assertEqual(lookup_results('aircraft', '0'), [])
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('admin', is_staff=True)
+        cls.user = User.objects.create_user('agent')
+
+    def setUp(self):
+        registry.reset()
+
+    def test_only_staff_may_scrape(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        # Every earlier request is recorded, refused ones included
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4')
+        self.assertContains(response, 'aviation_view_latency_seconds_count{view="metrics"} 3')
+
+    @override_settings(AVIATION_METRICS_TOKEN='secret')
+    def test_scrape_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer secret'}).status_code, 200)
+
+    @override_settings(AVIATION_METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_address(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.6').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+
+PASSENGER_HEADER = 'passengerid,firstname,lastname,email,phone,dateofbirth,passportnumber,countrycode,nationality'
+TICKET_HEADER = 'ticketid,seatnumber,ticketstatus,checkedinat,bookingid,flightid,seatclass,passengerid'
+
+
+def passenger_line(passenger_id, passport, country=1, email=None):
+    email = email or f'p{passenger_id}@example.com'
+    return f'{passenger_id},Ann,Lee,{email},000,1990-01-01,{passport},{country},Irish'
+
+
+class BulkUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network(capacity=12)
+        SeatClass.objects.create(seatclass=1, basefare=100, baggageallowance=20)
+        create_flight(1, T0)
+        create_booking()
+
+    def setUp(self):
+        clear_caches()
+        seats._inventories.clear()
+
+    def upload(self, kind, *lines, data=b''):
+        return process_upload(UPLOADS[kind], io.BytesIO('\n'.join(lines).encode() + data))
+
+    def test_rejected_rows_are_reported_with_their_line(self):
+        result = self.upload('passengers', PASSENGER_HEADER,
+                             passenger_line(2, 'P2'),
+                             passenger_line(3, 'P3', country=9),
+                             passenger_line(2, 'P4'),
+                             passenger_line(4, 'P1'),
+                             passenger_line(5, 'P5', email='not-an-email'))
+        self.assertEqual((result.processed, result.inserted, result.error_count), (5, 1, 4))
+        self.assertEqual(sorted(result.errors), [
+            (3, 'Unknown country: 9'),
+            (4, 'passengerid 2 appears earlier in the file'),
+            (5, 'passportnumber P1 already exists'),
+            (6, 'email: Enter a valid email address.'),
+        ])
+        self.assertEqual(list(Passenger.objects.values_list('pk', flat=True).order_by('pk')), [1, 2])
+
+    def test_missing_columns(self):
+        result = self.upload('passengers', 'passengerid,firstname', '2,Ann')
+        self.assertEqual(result.errors, [(1, 'Missing columns: lastname, email, phone, dateofbirth, '
+                                             'passportnumber, countrycode, nationality')])
+        self.assertEqual(result.inserted, 0)
+
+    def test_file_that_is_not_utf8_keeps_the_rows_before_it(self):
+        result = self.upload('passengers', PASSENGER_HEADER, passenger_line(2, 'P2'), '',
+                             data=b'3,Ren\xe9e,Lee')
+        self.assertEqual(result.inserted, 1)
+        self.assertTrue(result.file_error.startswith('Line 3 is not UTF-8 text'))
+
+    def test_one_announcement_per_upload(self):
+        announced = []
+
+        def receiver(sender, **kwargs):
+            announced.append((kwargs['rows'], kwargs['pks']))
+
+        table_changed.connect(receiver)
+        self.addCleanup(table_changed.disconnect, receiver)
+        lines = [passenger_line(passenger_id, f'P{passenger_id}') for passenger_id in range(2, 7)]
+        with mock.patch.object(bulk_upload, 'UPLOAD_CHUNK_SIZE', 2), \
+                self.captureOnCommitCallbacks(execute=True):
+            result = self.upload('passengers', PASSENGER_HEADER, *lines)
+        self.assertEqual(result.inserted, 5)
+        self.assertEqual(announced, [(5, [2, 3, 4, 5, 6])])
+        self.assertEqual(ChangeEvent.objects.filter(tablename='PASSENGER').count(), 5)
+
+    def test_seats_taken_in_an_earlier_chunk_are_held(self):
+        lines = [f'{ticket_id},{seat},Issued,,1,1,1,1' for ticket_id, seat in ((1, '1A'), (2, '1B'), (3, '1A'))]
+        with mock.patch.object(bulk_upload, 'UPLOAD_CHUNK_SIZE', 2):
+            result = self.upload('tickets', TICKET_HEADER, *lines)
+        self.assertEqual(result.errors, [(4, 'Seat 1A on flight 1 is already taken')])
+
+
+class FlightBoardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        hour = datetime.timedelta(hours=1)
+        create_flight(1, T0 - 7 * hour)
+        create_flight(2, T0 - hour, status='Delayed')
+        create_flight(3, T0)
+        create_flight(4, T0 + 5 * hour, status='Cancelled')
+        create_flight(5, T0 + 6 * hour)
+        create_flight(6, T0, origin=2, destination=3)
+
+    def test_window_and_status_counts(self):
+        board = flight_board(TimeWindow(T0, 6), 'scheduleddeparture', departureairportcode=1)
+        self.assertEqual([f.flightid for f in board.flights], [2, 3, 4])
+        self.assertEqual(board.status_counts, [('Scheduled', 1), ('Delayed', 1), ('Cancelled', 1)])
+        self.assertEqual(board.hidden, 0)
+        # Arrivals are windowed on their own time column, and the end is exclusive
+        board = flight_board(TimeWindow(T0, 2), 'scheduledarrival', arrivalairportcode=2)
+        self.assertEqual([f.flightid for f in board.flights], [2])
+
+    def test_counts_cover_rows_beyond_the_limit(self):
+        with mock.patch('aviation.boards.BOARD_LIMIT', 2):
+            board = flight_board(TimeWindow(T0, 6), 'scheduleddeparture', departureairportcode=1)
+        self.assertEqual([f.flightid for f in board.flights], [2, 3])
+        self.assertEqual((board.total, board.hidden), (3, 1))
+
+    def test_parse_window(self):
+        factory = RequestFactory()
+        window = parse_window(factory.get('/', {'at': '2026-06-01T06:00', 'hours': '3'}))
+        self.assertEqual((window.at, window.start, window.later),
+                         (T0, T0 - datetime.timedelta(hours=3), T0 + datetime.timedelta(hours=6)))
+        self.assertEqual(parse_window(factory.get('/', {'at': '2026-06-01T06:00', 'hours': '500'})).hours, 48)
+        self.assertEqual(parse_window(factory.get('/', {'at': '2026-06-01T06:00', 'hours': 'x'})).hours, 6)
+        # Impossible, malformed and unrepresentable anchors fall back to now
+        now = timezone.now()
+        for at in ('2026-02-30T10:00', 'yesterday', '9999-12-31T12:00'):
+            with self.subTest(at=at), mock.patch('django.utils.timezone.now', return_value=now):
+                self.assertEqual(parse_window(factory.get('/', {'at': at})).at, now)
+
+    def test_fleet_summary(self):
+        self.assertEqual(fleet_summary(1), [{'aircrafttypecode__typename': 'A320', 'count': 2}])
+
+
+class RouteGraphTests(SimpleTestCase):
+    # (route id, origin, destination, km, minutes); 5 and 6 are parallel routes from 1 to 4
+    ROUTES = [(1, 1, 2, 100, 60), (2, 2, 4, 100, 60), (3, 1, 3, 50, 100), (4, 3, 4, 100, 100),
+              (5, 1, 4, 300, 30), (6, 1, 4, 250, 200), (7, 2, 3, 10, 10)]
+
+    def setUp(self):
+        self.graph = RouteGraph(self.ROUTES)
+
+    def routes(self, paths):
+        return [[leg[0] for leg in legs] for legs in paths]
+
+    def test_k_shortest_paths(self):
+        self.assertEqual(self.routes(self.graph.shortest_paths(1, 4, k=4)), [[3, 4], [1, 2], [1, 7, 4], [6]])
+        self.assertEqual(self.routes(self.graph.shortest_paths(1, 4, k=2, weight='duration')), [[5], [1, 2]])
+        self.assertEqual(self.routes(self.graph.shortest_paths(1, 4, max_stops=0)), [[6]])
+        self.assertEqual(self.graph.shortest_paths(4, 1), [])
+        self.assertEqual(describe_path(self.graph.shortest_paths(1, 4, k=1)[0]),
+                         {'airports': [1, 3, 4], 'routes': [3, 4], 'stops': 1,
+                          'distance_km': 150, 'duration_mins': 200})
+
+    def test_shortest_paths_match_brute_force(self):
+        rng = random.Random(11)
+        pairs = [(a, b) for a in range(1, 9) for b in range(1, 9) if a != b]
+        routes = [(i, a, b, rng.randint(1, 1000), 0) for i, (a, b) in enumerate(rng.sample(pairs, 24), 1)]
+        graph = RouteGraph(routes)
+        legs = {(a, b): km for _, a, b, km, _ in routes}
+
+        def costs(path, destination, max_legs):
+            if path[-1] == destination:
+                yield sum(legs[hop] for hop in zip(path, path[1:]))
+            elif len(path) <= max_legs:
+                for (a, b) in legs:
+                    if a == path[-1] and b not in path:
+                        yield from costs(path + [b], destination, max_legs)
+
+        for origin, destination in pairs:
+            expected = sorted(costs([origin], destination, 3))[:5]
+            paths = graph.shortest_paths(origin, destination, k=5)
+            self.assertEqual([describe_path(p)['distance_km'] for p in paths], expected)
+
+    def test_min_hops(self):
+        self.assertEqual(self.graph.min_hops(1, 4), [(6, 1, 4, 250, 200)])
+        self.assertEqual([leg[0] for leg in self.graph.min_hops(2, 4)], [2])
+        self.graph.remove(2)
+        self.assertEqual([leg[0] for leg in self.graph.min_hops(2, 4)], [7, 4])
+        self.assertIsNone(self.graph.min_hops(4, 1))
+        self.assertIsNone(self.graph.min_hops(1, 1))
+        self.assertEqual(self.graph.reachable(2, 0), {3: 0})
+
+
+def located_airport(code, lat, lon):
+    return Airport(airportcode=code, airportname=f'Airport {code}', latitude=lat, longitude=lon)
+
+
+class AirportIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = random.Random(12)
+        cls.airports = [located_airport(code, rng.uniform(-90, 90), rng.uniform(-180, 180))
+                        for code in range(1, 501)]
+        # Either side of the antimeridian, and one without coordinates
+        cls.airports += [located_airport(501, 0.0, 179.95), located_airport(502, 0.0, -179.95),
+                         located_airport(503, None, None)]
+        cls.index = AirportIndex(cls.airports)
+        cls.targets = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(50)] + [(89.9, 0.0)]
+
+    def brute_force(self, lat, lon):
+        located = [a for a in self.airports if a.latitude is not None]
+        return sorted(located, key=lambda a: haversine_km(lat, lon, a.latitude, a.longitude))
+
+    def test_nearest_matches_brute_force(self):
+        self.assertEqual(len(self.index), 502)
+        for lat, lon in self.targets:
+            with self.subTest(lat=lat, lon=lon):
+                expected = [a.airportcode for a in self.brute_force(lat, lon)[:7]]
+                self.assertEqual([r['airport'] for r in self.index.nearest(lat, lon, k=7)], expected)
+        nearest = self.index.nearest(0.0, 179.95, k=2)
+        self.assertEqual([r['airport'] for r in nearest], [501, 502])
+        self.assertAlmostEqual(nearest[1]['distance_km'], 11.1, places=1)
+
+    def test_within_matches_brute_force(self):
+        for lat, lon in self.targets:
+            with self.subTest(lat=lat, lon=lon):
+                expected = {a.airportcode for a in self.brute_force(lat, lon)
+                            if haversine_km(lat, lon, a.latitude, a.longitude) <= 1500}
+                self.assertEqual({r['airport'] for r in self.index.within(lat, lon, 1500)}, expected)
+
+    def test_haversine_many_matches_haversine(self):
+        points = [(a.latitude, a.longitude) for a in self.airports[:20]]
+        lat1, lon1 = zip(*points)
+        lat2, lon2 = zip(*reversed(points))
+        for km, args in zip(haversine_many(lat1, lon1, lat2, lon2), zip(lat1, lon1, lat2, lon2)):
+            self.assertAlmostEqual(km, haversine_km(*args), places=6)
+
+
+def leg(flight_id, origin, destination, departs, arrives):
+    """A Timetable flight tuple with times given in minutes"""
+    return (departs * 60, arrives * 60, origin, destination, flight_id, f'TS{flight_id}')
+
+
+class ConnectionSearchTests(SimpleTestCase):
+    DAY = (0, 24 * 3600 - 1)
+
+    def search(self, *flights, origin=1, destination=3):
+        chains = _connections(Timetable(flights), origin, destination, *self.DAY)
+        return sorted(tuple(f[4] for f in chain) for chain in chains)
+
+    def test_direct_flight(self):
+        self.assertEqual(self.search(leg(1, 1, 3, 60, 180), leg(2, 3, 1, 60, 180)), [(1,)])
+
+    def test_connection_must_respect_minimum_and_maximum(self):
+        first = leg(1, 1, 2, 0, 60)
+        too_short = leg(2, 2, 3, 60 + MIN_CONNECTION_MINUTES - 1, 200)
+        just_enough = leg(3, 2, 3, 60 + MIN_CONNECTION_MINUTES, 210)
+        too_long = leg(4, 2, 3, 60 + MAX_CONNECTION_HOURS * 60 + 1, 800)
+        self.assertEqual(self.search(first, too_short, just_enough, too_long), [(1, 3)])
+
+    def test_one_stop_beaten_by_a_later_direct_is_pruned(self):
+        first = leg(1, 1, 2, 0, 60)
+        slow = leg(2, 2, 3, 120, 240)
+        direct = leg(3, 1, 3, 10, 200)
+        self.assertEqual(self.search(first, slow, direct), [(3,)])
+
+    def test_one_stop_arriving_sooner_than_the_direct_is_kept(self):
+        first = leg(1, 1, 2, 0, 60)
+        fast = leg(2, 2, 3, 110, 170)
+        direct = leg(3, 1, 3, 0, 300)
+        self.assertEqual(self.search(first, fast, direct), [(1, 2), (3,)])
+
+    def test_two_stop_chain(self):
+        flights = [leg(1, 1, 2, 0, 60), leg(2, 2, 4, 110, 170), leg(3, 4, 3, 220, 280)]
+        self.assertEqual(self.search(*flights), [(1, 2, 3)])
+
+    def test_two_stop_beaten_by_a_one_stop_is_pruned(self):
+        flights = [leg(1, 1, 2, 0, 60), leg(2, 2, 4, 110, 170), leg(3, 4, 3, 220, 280),
+                   leg(4, 2, 3, 120, 240)]
+        self.assertEqual(self.search(*flights), [(1, 4)])
+
+    def test_chain_never_returns_to_the_origin(self):
+        flights = [leg(1, 1, 2, 0, 60), leg(2, 2, 1, 110, 170), leg(3, 1, 3, 220, 280)]
+        self.assertEqual(self.search(*flights), [(3,)])
+
+
+class ParetoTests(SimpleTestCase):
+    def test_dominated_chains_are_dropped(self):
+        direct = (leg(1, 1, 3, 0, 300),)
+        later_direct = (leg(2, 1, 3, 60, 300),)
+        faster_one_stop = (leg(3, 1, 2, 0, 60), leg(4, 2, 3, 120, 240))
+        slower_one_stop = (leg(5, 1, 2, 0, 60), leg(6, 2, 3, 200, 360))
+        kept = _pareto([direct, later_direct, faster_one_stop, slower_one_stop])
+        self.assertCountEqual(kept, [later_direct, faster_one_stop])
+
+    def test_more_stops_never_beat_fewer_at_the_same_times(self):
+        direct = (leg(1, 1, 3, 0, 240),)
+        one_stop = (leg(2, 1, 2, 0, 60), leg(3, 2, 3, 120, 240))
+        self.assertEqual(_pareto([one_stop, direct]), [direct])
+
+    def test_trade_offs_are_kept(self):
+        early = (leg(1, 1, 3, 0, 120),)
+        late = (leg(2, 1, 3, 180, 300),)
+        self.assertCountEqual(_pareto([early, late]), [early, late])
+
+
+class SeatBitsetTests(SimpleTestCase):
+    def test_seat_labels_round_trip(self):
+        self.assertEqual(seat_index('1A'), 0)
+        self.assertEqual(seat_index(' 12c '), 68)
+        for index in (0, 5, 6, 68, 179):
+            self.assertEqual(seat_index(seat_label(index)), index)
+
+    def test_invalid_seat_labels(self):
+        for seat in ('', None, '0A', '1G', 'A1', '1AA', '1000A'):
+            self.assertIsNone(seat_index(seat), seat)
+
+    def test_take_marks_the_seat(self):
+        inventory = SeatInventory(1, 10)
+        self.assertEqual(len(inventory.bits), 2)
+        self.assertTrue(inventory.is_free('2D'))
+        self.assertTrue(inventory.take('2D', 1))
+        self.assertFalse(inventory.is_free('2D'))
+        self.assertNotIn('2D', inventory.free_seats())
+        self.assertEqual(len(inventory.free_seats()), 9)
+        self.assertEqual((inventory.taken, inventory.free, inventory.load_factor), (1, 9, 0.1))
+
+    def test_seats_outside_the_cabin_or_taken_twice_are_unplaced(self):
+        inventory = SeatInventory(1, 10)
+        inventory.take('1A', 1)
+        self.assertFalse(inventory.take('1A', 2))
+        # 2E is the eleventh seat
+        self.assertFalse(inventory.is_valid('2E'))
+        self.assertFalse(inventory.take('2E', 2))
+        self.assertEqual(inventory.unplaced, 2)
+        self.assertEqual(inventory.summary()['by_class'], {'1': 1, '2': 2})
+        self.assertEqual(inventory.free, 7)
+
+    def test_copy_is_independent(self):
+        inventory = SeatInventory(1, 10)
+        inventory.take('1A', 1)
+        other = inventory.copy()
+        other.take('1B', 1)
+        self.assertTrue(inventory.is_free('1B'))
+        self.assertEqual(inventory.taken, 1)
+
+    def test_unknown_capacity(self):
+        inventory = SeatInventory(1, None)
+        self.assertEqual((inventory.capacity, inventory.free, inventory.load_factor), (0, 0, None))
+
+
+class SeatInventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network(capacity=12)
+        SeatClass.objects.create(seatclass=1, basefare=100, baggageallowance=20)
+        create_flight(1, T0)
+        create_booking()
+        create_ticket(1, 1, '1A')
+        create_ticket(2, 1, '1B', status='Cancelled')
+
+    def setUp(self):
+        clear_caches()
+        seats._inventories.clear()
+
+    def test_inventory_skips_released_tickets(self):
+        inventory = seat_inventory(1)
+        self.assertEqual((inventory.capacity, inventory.taken), (12, 1))
+        self.assertFalse(inventory.is_free('1A'))
+        self.assertTrue(inventory.is_free('1B'))
+
+    def test_new_tickets_update_the_cached_inventory(self):
+        inventory = seat_inventory(1)
+        create_ticket(3, 1, '2C')
+        seats._apply_new_tickets([3])
+        with self.assertNumQueries(0):
+            cached = seat_inventory(1)
+        self.assertIs(cached, inventory)
+        self.assertFalse(cached.is_free('2C'))
+        self.assertEqual(cached.taken, 2)
+
+    def test_released_new_tickets_take_no_seat(self):
+        inventory = seat_inventory(1)
+        create_ticket(3, 1, '2C', status='Void')
+        seats._apply_new_tickets([3])
+        self.assertTrue(seat_inventory(1).is_free('2C'))
+        self.assertEqual(inventory.taken, 1)
+
+    def test_write_from_another_process_forces_a_reload(self):
+        inventory = seat_inventory(1)
+        # Another process took a seat on this flight and bumped its version
+        create_ticket(3, 1, '2C')
+        bump_version('SEATS:1', rows=True)
+        create_ticket(4, 1, '2D')
+        seats._apply_new_tickets([4])
+        reloaded = seat_inventory(1)
+        self.assertIsNot(reloaded, inventory)
+        self.assertFalse(reloaded.is_free('2C'))
+        self.assertFalse(reloaded.is_free('2D'))
+
+
+def occupancy(flight_id, start, end, gate=1, terminal=1, kind='departure'):
+    """An Occupancy with times given in minutes after T0"""
+    return Occupancy(T0 + datetime.timedelta(minutes=start), T0 + datetime.timedelta(minutes=end),
+                     flight_id, f'TS{flight_id}', kind, 1, terminal, gate)
+
+
+class GateScheduleTests(SimpleTestCase):
+    def window(self, start, end):
+        return T0 + datetime.timedelta(minutes=start), T0 + datetime.timedelta(minutes=end)
+
+    def test_overlapping_is_per_gate_and_half_open(self):
+        schedule = GateSchedule([occupancy(1, 0, 60), occupancy(2, 60, 120), occupancy(3, 0, 60, gate=2),
+                                 occupancy(4, 0, 60, terminal=2)])
+        found = schedule.overlapping(1, 1, *self.window(30, 60))
+        self.assertEqual([o.flight_id for o in found], [1])
+        found = schedule.overlapping(1, 1, *self.window(59, 61))
+        self.assertEqual([o.flight_id for o in found], [1, 2])
+        self.assertEqual(schedule.overlapping(1, 9, *self.window(0, 60)), [])
+
+    def test_overlapping_finds_a_long_interval_behind_short_ones(self):
+        schedule = GateSchedule([occupancy(1, 0, 600)] + [occupancy(i, 10 * i, 10 * i + 5) for i in range(2, 30)])
+        found = schedule.overlapping(1, 1, *self.window(296, 299))
+        self.assertEqual([o.flight_id for o in found], [1])
+
+    def test_overlapping_excludes_the_flight_itself(self):
+        schedule = GateSchedule([occupancy(1, 0, 60), occupancy(2, 30, 90)])
+        found = schedule.overlapping(1, 1, *self.window(0, 60), exclude=1)
+        self.assertEqual([o.flight_id for o in found], [2])
+
+    def test_conflicts(self):
+        schedule = GateSchedule([
+            occupancy(1, 0, 60), occupancy(2, 30, 90), occupancy(3, 90, 120),
+            # A flight arriving and departing at the same gate does not clash with itself
+            occupancy(4, 200, 240, kind='arrival'), occupancy(4, 230, 280),
+            occupancy(5, 0, 60, gate=2),
+        ])
+        pairs = [(a.flight_id, b.flight_id) for a, b in schedule.conflicts()]
+        self.assertEqual(pairs, [(1, 2)])
+
+    def test_conflicts_match_brute_force(self):
+        rng = random.Random(7)
+        occupancies = []
+        for i in range(300):
+            start = rng.randint(0, 1440)
+            occupancies.append(occupancy(i, start, start + rng.randint(20, 90), gate=rng.randint(1, 8)))
+        found = {tuple(sorted((a.flight_id, b.flight_id))) for a, b in GateSchedule(occupancies).conflicts()}
+        expected = {
+            (a.flight_id, b.flight_id)
+            for i, a in enumerate(occupancies) for b in occupancies[i + 1:]
+            if a.gate == b.gate and a.overlaps(b.start, b.end)
+        }
+        self.assertEqual(found, expected)
+
+
+class GateCheckTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        cls.flight = create_flight(1, T0, departure_gate=1, arrival_gate=1)
+
+    def data(self, departs=0, **changes):
+        departure = timezone.localtime(T0 + datetime.timedelta(minutes=departs))
+        arrival = departure + datetime.timedelta(hours=2)
+        data = {
+            'scheduleddeparture': departure.strftime('%Y-%m-%dT%H:%M'),
+            'scheduledarrival': arrival.strftime('%Y-%m-%dT%H:%M'),
+            'flightstatus': 'Scheduled', 'departureterminalid': '1', 'departuregatenumber': '1',
+            'arrivalterminalid': '2', 'arrivalgatenumber': '1',
+        }
+        data.update(changes)
+        return data
+
+    def test_gate_held_by_another_flight(self):
+        errors = check_flight_gates(2, self.data(departs=20))
+        self.assertEqual(len(errors), 2)
+        self.assertIn('Departure gate 1 (terminal 1) is already held by flight TS1', errors[0])
+
+    def test_other_gate_or_time_is_free(self):
+        self.assertEqual(check_flight_gates(2, self.data(departuregatenumber='2', arrivalgatenumber='2')), [])
+        self.assertEqual(check_flight_gates(2, self.data(departs=180)), [])
+
+    def test_cancelled_flights_are_not_checked_or_counted(self):
+        self.assertEqual(check_flight_gates(2, self.data(flightstatus='Cancelled')), [])
+        Flight.objects.filter(flightid=1).update(flightstatus='Cancelled')
+        self.assertEqual(check_flight_gates(2, self.data()), [])
+
+    def test_edit_without_schedule_change_is_not_checked(self):
+        create_flight(2, T0 + datetime.timedelta(minutes=20))
+        stored = Flight.objects.get(flightid=2)
+        self.assertEqual(check_flight_gates(2, self.data(departs=20), current=stored), [])
+        self.assertEqual(len(check_flight_gates(2, self.data(departs=30), current=stored)), 2)
+
+    def test_reinstating_a_cancelled_flight_is_checked(self):
+        create_flight(2, T0 + datetime.timedelta(minutes=20), status='Cancelled')
+        stored = Flight.objects.get(flightid=2)
+        self.assertEqual(len(check_flight_gates(2, self.data(departs=20), current=stored)), 2)
+
+    def test_day_conflicts(self):
+        create_flight(2, T0 + datetime.timedelta(minutes=20))
+        pairs = [(a.flight_id, b.flight_id, a.kind) for a, b in day_conflicts(T0.date())]
+        self.assertEqual(pairs, [(1, 2, 'departure'), (1, 2, 'arrival')])
+
+    def row(self, flight_id, departs, gate=1, status='Scheduled'):
+        departure = T0 + datetime.timedelta(minutes=departs)
+        return {
+            'flightid': flight_id, 'flightnumber': f'TS{flight_id}', 'flightstatus': status,
+            'scheduleddeparture': departure, 'scheduledarrival': departure + datetime.timedelta(hours=2),
+            'departureairportcode': 1, 'arrivalairportcode': 2, 'departureterminalid': 1,
+            'arrivalterminalid': 2, 'departuregatenumber': gate, 'arrivalgatenumber': gate,
+        }
+
+    def test_upload_rows_against_existing_flights(self):
+        rejected = check_gate_rows([(2, self.row(2, 20)), (3, self.row(3, 20, gate=2)),
+                                    (4, self.row(4, 20, status='Cancelled'))])
+        self.assertEqual(list(rejected), [2])
+        self.assertIn('Departure gate 1 (terminal 1) is already held by flight TS1', rejected[2])
+
+    def test_upload_rows_hold_gates_for_later_rows(self):
+        rejected = check_gate_rows([(2, self.row(2, 240)), (3, self.row(3, 260)), (4, self.row(4, 480))])
+        self.assertEqual(list(rejected), [3])
+        self.assertIn('already held by flight TS2', rejected[3])
+
+
+def at(minutes):
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+class RotationCheckTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        # Aircraft 1: airport 1 -> 2 from 06:00 to 08:00, then 2 -> 3 from 09:00 to 11:00
+        create_flight(1, at(0), origin=1, destination=2)
+        create_flight(2, at(180), origin=2, destination=3)
+
+    def test_continuing_leg_is_accepted(self):
+        self.assertEqual(check_rotation(3, 1, at(360), at(480), 3, 1), [])
+
+    def test_overlapping_leg(self):
+        errors = check_rotation(3, 1, at(240), at(300), 3, 1)
+        self.assertTrue(errors[0].startswith('Aircraft #1 is already flying TS2'))
+
+    def test_short_turnaround_counts_as_overlap(self):
+        errors = check_rotation(3, 1, at(315), at(400), 3, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('turnaround 30 min', errors[0])
+
+    def test_leg_must_start_where_the_previous_one_ended(self):
+        errors = check_rotation(3, 1, at(360), at(480), 1, 2)
+        self.assertEqual(errors, ['Aircraft #1 ends its previous leg TS2 at airport 3, not at departure airport 1'])
+
+    def test_leg_must_end_where_the_next_one_starts(self):
+        errors = check_rotation(3, 1, at(-240), at(-120), 2, 3)
+        self.assertEqual(errors, ['Aircraft #1 starts its next leg TS1 at airport 1, not at arrival airport 3'])
+
+    def test_arrival_before_departure(self):
+        self.assertEqual(check_rotation(3, 1, at(400), at(360), 3, 1),
+                         ['Scheduled arrival must be after scheduled departure'])
+
+    def test_leg_is_not_checked_against_itself_or_cancelled_legs(self):
+        self.assertEqual(check_rotation(2, 1, at(190), at(310), 2, 3), [])
+        Flight.objects.filter(flightid=2).update(flightstatus='Cancelled')
+        self.assertEqual(check_rotation(3, 1, at(180), at(300), 2, 1), [])
+
+    def test_cancellation_and_unchanged_edits_are_not_checked(self):
+        # Aircraft 1 already breaks continuity at this leg
+        create_flight(3, at(360), origin=1, destination=2)
+        stored = Flight.objects.get(flightid=3)
+        data = {
+            'scheduleddeparture': timezone.localtime(at(360)).strftime('%Y-%m-%dT%H:%M'),
+            'scheduledarrival': timezone.localtime(at(480)).strftime('%Y-%m-%dT%H:%M'),
+            'aircraftid': '1', 'departureairportcode': '1', 'arrivalairportcode': '2',
+            'flightstatus': 'Completed',
+        }
+        self.assertEqual(check_flight_rotation(3, data, current=stored), [])
+        self.assertEqual(check_flight_rotation(3, {**data, 'flightstatus': 'Cancelled'}), [])
+        self.assertEqual(len(check_flight_rotation(3, data)), 1)
+        self.assertEqual(len(check_flight_rotation(3, {**data, 'arrivalairportcode': '3'}, current=stored)), 1)
+
+    def row(self, flight_id, departs, arrives, origin, destination, aircraft=1):
+        return {'flightid': flight_id, 'flightnumber': f'TS{flight_id}', 'aircraftid': aircraft,
+                'scheduleddeparture': at(departs), 'scheduledarrival': at(arrives),
+                'departureairportcode': origin, 'arrivalairportcode': destination, 'flightstatus': 'Scheduled'}
+
+    def test_upload_rows_form_a_rotation_in_any_line_order(self):
+        # 3 -> 1 -> 2 after the existing legs, listed out of order
+        rows = [(2, self.row(4, 600, 700, 1, 2)), (3, self.row(3, 360, 480, 3, 1))]
+        self.assertEqual(check_rotation_rows(rows), {})
+
+    def test_upload_rows_are_checked_against_existing_legs_and_each_other(self):
+        rows = [(2, self.row(3, 240, 300, 3, 1)), (3, self.row(4, 360, 480, 3, 1)),
+                (4, self.row(5, 520, 600, 1, 2)), (5, self.row(6, 540, 580, 1, 2))]
+        rejected = check_rotation_rows(rows)
+        self.assertEqual(sorted(rejected), [2, 5])
+        self.assertTrue(rejected[2].startswith('Aircraft #1 is already flying TS2'))
+        self.assertTrue(rejected[5].startswith('Aircraft #1 is already flying TS5'))
+
+
+class RotationReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        # Aircraft 1: a 10 minute turnaround, then a leg departing before the previous one lands, from elsewhere
+        create_flight(1, at(0), origin=1, destination=2)
+        create_flight(2, at(130), hours=1, origin=2, destination=3)
+        create_flight(3, at(180), origin=1, destination=2)
+        create_flight(4, at(190), origin=3, destination=1, status='Cancelled')
+        # Aircraft 2: a long leg that later, shorter legs still overlap
+        create_flight(11, at(0), hours=10, aircraft=2, origin=1, destination=2)
+        create_flight(12, at(60), hours=1, aircraft=2, origin=2, destination=3)
+        create_flight(13, at(240), hours=1, aircraft=2, origin=3, destination=1)
+
+    def issues(self, **kwargs):
+        return [(issue.kind, issue.first.flight_id, issue.second.flight_id)
+                for issue in rotation_report(at(-600), at(600), **kwargs)]
+
+    def test_report(self):
+        self.assertEqual(self.issues(), [
+            ('turnaround', 1, 2), ('overlap', 2, 3), ('break', 2, 3),
+            ('overlap', 11, 12), ('overlap', 11, 13),
+        ])
+
+    def test_report_for_one_aircraft(self):
+        self.assertEqual(self.issues(aircraft=2), [('overlap', 11, 12), ('overlap', 11, 13)])
+
+    def test_window_is_by_departure(self):
+        self.assertEqual([(i.kind, i.second.flight_id) for i in rotation_report(at(100), at(600), aircraft=1)],
+                         [('overlap', 3), ('break', 3)])
+
+
+class CrewTimelineTests(SimpleTestCase):
+    def setUp(self):
+        self.ids = iter(range(1, 1000))
+
+    def leg(self, departs, hours, origin=1, destination=2):
+        """A leg of crew member 1 departing `departs` hours after T0"""
+        flight_id = next(self.ids)
+        departure = T0 + datetime.timedelta(hours=departs)
+        return CrewLeg(1, flight_id, f'TS{flight_id}', departure, departure + datetime.timedelta(hours=hours),
+                       origin, destination)
+
+    def kinds(self, legs):
+        return [issue.kind for issue in CrewTimeline(1, 1, legs).limit_issues()]
+
+    def test_sits_up_to_the_limit_stay_in_one_duty(self):
+        sit = MAX_SIT.total_seconds() / 3600
+        legs = [self.leg(0, 2, 1, 2), self.leg(2 + sit, 2, 2, 1), self.leg(4 + 2 * sit + 0.25, 1, 1, 2)]
+        timeline = CrewTimeline(1, 1, legs)
+        self.assertEqual([len(duty.legs) for duty in timeline.duties], [2, 1])
+        # Reported an hour before the first departure, released half an hour after the last arrival
+        self.assertEqual(timeline.duties[0].length, datetime.timedelta(hours=4 + sit + 1.5))
+
+    def test_overlapping_legs(self):
+        self.assertEqual(self.kinds([self.leg(0, 3), self.leg(2, 1, 2, 3)]), ['overlap'])
+
+    def test_over_long_duty(self):
+        # Exactly 13 hours from report to release
+        self.assertEqual(self.kinds([self.leg(0, 6), self.leg(7, 4.5, 2, 1)]), [])
+        self.assertEqual(self.kinds([self.leg(0, 6), self.leg(7, 4.75, 2, 1)]), ['duty'])
+
+    def test_minimum_rest_between_duties(self):
+        rest = MIN_REST.total_seconds() / 3600
+        # Duty ends 2.5 hours after T0; the next one reports an hour before departing
+        self.assertEqual(self.kinds([self.leg(0, 2), self.leg(2.5 + rest + 1, 2, 2, 1)]), [])
+        issues = CrewTimeline(1, 1, [self.leg(0, 2), self.leg(2.5 + rest + 0.5, 2, 2, 1)]).limit_issues()
+        self.assertEqual([(issue.kind, issue.detail) for issue in issues],
+                         [('rest', 'rest of 9.5h, 10.0h needed')])
+
+    def daily_duties(self, first_day, days):
+        """Ten-hour duties, one a day"""
+        return [self.leg(24 * day, 8.5, *((1, 2) if day % 2 == 0 else (2, 1)))
+                for day in range(first_day, first_day + days)]
+
+    def test_rolling_duty_limit_allows_exactly_sixty_hours(self):
+        self.assertEqual(self.kinds(self.daily_duties(0, 6)), [])
+
+    def test_rolling_duty_limit_is_reported_once_per_breach(self):
+        issues = CrewTimeline(1, 1, self.daily_duties(0, 9) + self.daily_duties(16, 7)).limit_issues()
+        self.assertEqual([(issue.kind, issue.first.departure.day - T0.day, issue.second.departure.day - T0.day)
+                          for issue in issues], [('cumulative', 0, 6), ('cumulative', 16, 22)])
+        self.assertTrue(issues[0].detail.startswith('70.0h on duty within 7 days'))
+
+    def test_duties_leave_the_window_after_seven_days(self):
+        # Six duties, a day off, then one a day: never more than six in any week
+        legs = self.daily_duties(0, 6) + self.daily_duties(7, 6) + self.daily_duties(14, 6)
+        self.assertEqual(self.kinds(legs), [])
+
+    def test_base_issues(self):
+        legs = [self.leg(0, 2, 1, 2), self.leg(20, 2, 3, 1), self.leg(40, 2, 1, 2)]
+        issues = CrewTimeline(1, 1, legs).base_issues()
+        self.assertEqual([issue.kind for issue in issues], ['position', 'base'])
+
+
+class CrewAssignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        for crew in (1, 2):
+            CrewMember.objects.create(crewid=crew, firstname='Test', lastname=f'Crew {crew}',
+                                      dateofbirth=datetime.date(1980, 1, 1), hiredate=datetime.date(2010, 1, 1),
+                                      crewtype=1, airlineid_id=1, airportcode_id=1)
+        create_flight(1, T0)
+        create_flight(2, T0 + datetime.timedelta(hours=3), origin=2, destination=1)
+
+    def deletes(self):
+        return list(ChangeEvent.objects.filter(tablename='CREW_ASSIGNMENT', action='delete')
+                    .values_list('rowkey', flat=True))
+
+    def test_unassign_announces_only_the_assignments_removed(self):
+        assign_crew([1], [1, 2])
+        self.assertEqual(unassign_crew([1, 2], [1, 2]), 2)
+        self.assertEqual(self.deletes(), ['[1,1]', '[1,2]'])
+        self.assertFalse(CrewAssignment.objects.exists())
+
+    def test_unassign_without_assignments(self):
+        self.assertEqual(unassign_crew([1, 2], [1]), 0)
+        self.assertEqual(self.deletes(), [])
+
+
+class MaintenanceDueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        CrewMember.objects.create(crewid=1, firstname='Test', lastname='Technician',
+                                  dateofbirth=datetime.date(1980, 1, 1), hiredate=datetime.date(2010, 1, 1),
+                                  crewtype=3, airlineid_id=1, airportcode_id=1)
+        Technician.objects.create(technicianid=1, licensenumber='L1', licenseexpiry=datetime.date(2030, 1, 1),
+                                  crewid_id=1)
+        MaintenanceType.objects.create(maintenancetypeid=1, maintenancetype='A check')
+        cls.user = User.objects.create_user('staff')
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.user)
+
+    def add(self, maintenance_id, done_days_ago, due_in_days, aircraft=1):
+        today = timezone.localdate()
+        return self.client.post(reverse('add_maintenance'), {
+            'maintenanceid': maintenance_id, 'description': 'Check', 'cost': '100.00', 'technicianid': 1,
+            'aircraftid': aircraft, 'maintenancetypeid': 1,
+            'maintenancedate': today - datetime.timedelta(days=done_days_ago),
+            'nextduedate': today + datetime.timedelta(days=due_in_days),
+        })
+
+    def aircraft_events(self):
+        return list(ChangeEvent.objects.filter(tablename='AIRCRAFT').values_list('rowkey', flat=True))
+
+    def test_due_and_overdue_follow_the_latest_record(self):
+        self.add(1, 100, 10)
+        self.assertEqual([due.maintenanceid for due in due_within(30)], [1])
+        self.assertEqual(overdue(), [])
+        self.add(2, 50, -1)
+        self.assertEqual(due_within(30), [])
+        self.assertEqual([due.maintenanceid for due in overdue()], [2])
+        self.assertEqual(due_counts(30), {'overdue': 1, 'due': 0})
+
+    def test_last_maintenance_date_is_announced_only_when_it_changes(self):
+        self.add(1, 10, 10)
+        self.assertEqual(Aircraft.objects.get(aircraftid=1).lastmaintenancedate,
+                         timezone.localdate() - datetime.timedelta(days=10))
+        self.assertEqual(self.aircraft_events(), ['1'])
+        # An older record leaves the date, and AIRCRAFT, alone
+        self.add(2, 20, 5)
+        self.assertEqual(self.aircraft_events(), ['1'])
+
+    def test_deleting_the_last_record_clears_the_aircraft(self):
+        self.add(1, 10, 10, aircraft=2)
+        self.client.post(reverse('delete_maintenance', args=[1]))
+        self.assertEqual(due_within(30), [])
+        self.assertIsNone(Aircraft.objects.get(aircraftid=2).lastmaintenancedate)
+        self.assertEqual(self.aircraft_events(), ['2', '2'])
+
+
+class PerformanceRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        create_flight(1, T0)
+        create_flight(2, T0 + datetime.timedelta(hours=3), origin=2, destination=1)
+        create_flight(3, T0 + datetime.timedelta(days=1))
+
+    def setUp(self):
+        performance.refresh_all()
+
+    def rollups(self):
+        return sorted(FlightPerformance.objects.values_list('period', 'periodstart', 'dimension', 'dimensionkey',
+                                                            *performance.COUNTERS))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        states = sorted(FlightRollupState.objects.values_list())
+        performance.refresh_all()
+        self.assertEqual(incremental, self.rollups())
+        self.assertEqual(states, sorted(FlightRollupState.objects.values_list()))
+
+    def test_rollups(self):
+        day = T0.date()
+        self.assertEqual(performance_table('AIRLINE', 'D', day)[0].flights, 2)
+        self.assertEqual(performance_table('AIRLINE', 'M', day)[0].flights, 3)
+        self.assertEqual([row.key for row in performance_table('ROUTE', 'D', day)], ['1-2', '2-1'])
+
+    def test_flight_moved_to_another_day(self):
+        Flight.objects.filter(flightid=2).update(scheduleddeparture=T0 + datetime.timedelta(days=1, hours=3),
+                                                 scheduledarrival=T0 + datetime.timedelta(days=1, hours=5))
+        performance.refresh_flights([2])
+        self.assertEqual([row.key for row in performance_table('ROUTE', 'D', T0.date())], ['1-2'])
+        self.assertEqual(performance_table('AIRLINE', 'D', T0.date() + datetime.timedelta(days=1))[0].flights, 2)
+        self.assertMatchesRebuild()
+
+    def test_cancelled_and_delayed_flights(self):
+        Flight.objects.filter(flightid=1).update(flightstatus='Cancelled')
+        Flight.objects.filter(flightid=2).update(actualarrival=T0 + datetime.timedelta(hours=5, minutes=40),
+                                                 flightstatus='Arrived')
+        performance.refresh_flights([1, 2])
+        (airline,) = performance_table('AIRLINE', 'D', T0.date())
+        self.assertEqual((airline.flights, airline.cancelled, airline.operated, airline.delayminutes),
+                         (2, 1, 1, 40))
+        self.assertEqual(airline.on_time_pct, 0)
+        self.assertMatchesRebuild()
+
+    def test_deleted_flight_is_backed_out(self):
+        Flight.objects.filter(flightid=3).delete()
+        performance.refresh_flights([3])
+        self.assertEqual(performance_table('AIRLINE', 'D', T0.date() + datetime.timedelta(days=1)), [])
+        self.assertMatchesRebuild()
+
+    def test_one_flight_write_touches_only_its_rows(self):
+        Flight.objects.filter(flightid=1).update(flightstatus='Diverted')
+        # Savepoint, state, flight and rollup reads, one UPDATE batch, state rewrite, release
+        with self.assertNumQueries(8):
+            performance.refresh_flights([1])
+        self.assertMatchesRebuild()
+
+    def test_state_from_before_contributions_were_stored(self):
+        FlightRollupState.objects.update(airlineid=None)
+        Flight.objects.filter(flightid=1).update(flightstatus='Cancelled')
+        performance.refresh_flights([1])
+        rollups = self.rollups()
+        performance.refresh_all()
+        self.assertEqual(rollups, self.rollups())
+        self.assertEqual(FlightRollupState.objects.get(flightid=1).cancelled, 1)
+
+
+class RevenueRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        SeatClass.objects.create(seatclass=1, basefare=100, baggageallowance=20)
+        airline = Airline.objects.get()
+        airline.pk, airline.airlinename = 2, 'Other Air'
+        airline.save()
+        create_flight(1, T0)
+        create_flight(2, T0 + datetime.timedelta(hours=3), origin=2, destination=1)
+        Flight.objects.filter(flightid=2).update(airlineid=2)
+        booking = create_booking()
+        create_ticket(1, 1, '1A', booking)
+        create_ticket(2, 1, '1B', booking)
+        create_ticket(3, 2, '1A', booking)
+        Currency.objects.create(currencycode=2, currencyname='Dollar', currencysymbol='USD')
+        other = create_booking(2)
+        Booking.objects.filter(bookingid=2).update(currencycode=2, bookingdate=T0 + datetime.timedelta(days=1))
+
+    def setUp(self):
+        clear_caches()
+        revenue._rate_table = None
+        settings = self.settings(AVIATION_REPORTING_CURRENCY=1)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        revenue.refresh_all()
+
+    def rollups(self):
+        return sorted(RevenueDaily.objects.values_list('day', 'dimension', 'dimensionkey', 'bookings', 'amount',
+                                                       'unconverted'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        revenue.refresh_all()
+        self.assertEqual(incremental, self.rollups())
+
+    def totals(self, dimension):
+        return {row['dimensionkey']: row['amount_total']
+                for row in revenue_table(dimension, T0.date(), T0.date() + datetime.timedelta(days=1))}
+
+    def test_rollups(self):
+        totals = revenue_totals(T0.date(), T0.date() + datetime.timedelta(days=1))
+        self.assertEqual((totals['bookings'], totals['amount'], totals['unconverted']), (2, Decimal('100'), 1))
+        # Two of the booking's three tickets are on airline 1
+        self.assertEqual(self.totals('AIRLINE'), {'1': Decimal('66.67'), '2': Decimal('33.33'), '': 0})
+
+    def test_booking_change(self):
+        Booking.objects.filter(bookingid=1).update(totalamount=Decimal('250.00'), bookingstatus='Cancelled')
+        revenue.refresh_bookings([1])
+        self.assertEqual(self.totals('STATUS'), {'Cancelled': Decimal('250'), 'Confirmed': 0})
+        self.assertMatchesRebuild()
+
+    def test_booking_moved_to_another_day(self):
+        Booking.objects.filter(bookingid=1).update(bookingdate=T0 + datetime.timedelta(days=1))
+        revenue.refresh_bookings([1])
+        self.assertEqual(revenue_totals(T0.date(), T0.date())['bookings'], None)
+        self.assertMatchesRebuild()
+
+    def test_ticket_moved_to_another_airline(self):
+        Ticket.objects.filter(ticketid=1).update(flightid=2)
+        revenue.refresh_bookings([1])
+        self.assertEqual(self.totals('AIRLINE'), {'2': Decimal('66.67'), '1': Decimal('33.33'), '': 0})
+        self.assertMatchesRebuild()
+
+    def test_rate_insert_is_applied_by_the_rate_refresh(self):
+        CurrencyRate.objects.create(currencycode_id=2, ratedate=T0.date(), rate=Decimal('0.5'))
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_write('CURRENCY_RATE', 'insert', None, pks=[(2, T0.date())])
+        # The write itself leaves the bookings already rolled up alone
+        self.assertEqual(self.totals('CHANNEL'), {'Website': Decimal('100')})
+        self.assertEqual(revenue.refresh_rate_changes(), 1)
+        self.assertEqual(self.totals('CHANNEL'), {'Website': Decimal('150')})
+        self.assertEqual(revenue.refresh_rate_changes(), 0)
+        self.assertMatchesRebuild()
+
+    def test_state_from_before_contributions_were_stored(self):
+        RevenueContribution.objects.all().delete()
+        Booking.objects.filter(bookingid=1).update(totalamount=Decimal('250.00'))
+        revenue.refresh_bookings([1])
+        self.assertEqual(RevenueContribution.objects.filter(bookingid=1).count(), 5)
+        self.assertMatchesRebuild()
+
+
+class ReplicaRoutingTests(TestCase):
+    databases = {PRIMARY, 'replica'}
+    # The router keeps the schema off replicas, so the tables read here are created by hand
+    REPLICA_MODELS = (Country, City, Alliance, Airline)
+
+    @classmethod
+    def setUpClass(cls):
+        with connections['replica'].schema_editor() as editor:
+            for model in cls.REPLICA_MODELS:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connections['replica'].schema_editor() as editor:
+            for model in reversed(cls.REPLICA_MODELS):
+                editor.delete_model(model)
+
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        for model in cls.REPLICA_MODELS:
+            model.objects.using('replica').bulk_create(model.objects.using(PRIMARY).all())
+        Airline.objects.using('replica').filter(airlineid=1).update(airlinename='Replica Air')
+        cls.user = User.objects.create_user('staff')
+
+    def setUp(self):
+        replicas = self.settings(AVIATION_READ_REPLICAS=['replica'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        self.addCleanup(routers._unavailable.clear)
+        self.factory = RequestFactory()
+
+    def airline_name(self, **cookies):
+        """Read airline 1 in a GET request passing through the middleware"""
+        request = self.factory.get('/airlines/')
+        request.COOKIES.update(cookies)
+        middleware = ReplicaReadsMiddleware(lambda request: HttpResponse(Airline.objects.get(airlineid=1).airlinename))
+        return middleware(request).content.decode()
+
+    def test_get_reads_from_the_replica(self):
+        self.assertEqual(self.airline_name(), 'Replica Air')
+        # Outside a request, such as in commands and receivers, reads use the primary
+        self.assertEqual(Airline.objects.get(airlineid=1).airlinename, 'Test Air')
+
+    def test_raw_sql_write_goes_to_the_primary_and_sets_the_sticky_cookie(self):
+        request = self.factory.post(reverse('add_airline'), {
+            'airlineid': 2, 'airlinename': 'New Air', 'airlineicao': 'NEW', 'headquarterscityid': 1,
+            'foundedyear': 2020, 'allianceid': 1,
+        })
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        response = ReplicaReadsMiddleware(views.add_airline)(request)
+        self.assertTrue(Airline.objects.using(PRIMARY).filter(airlineid=2).exists())
+        self.assertFalse(Airline.objects.using('replica').filter(airlineid=2).exists())
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_sticky_cookie_pins_reads_to_the_primary(self):
+        self.assertEqual(self.airline_name(**{STICKY_COOKIE: '1'}), 'Test Air')
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        replica = connections['replica']
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError('down')) as connect:
+            self.assertEqual(self.airline_name(), 'Test Air')
+            # Skipped without another connection attempt until REPLICA_RETRY_SECONDS pass
+            self.assertEqual(self.airline_name(), 'Test Air')
+        self.assertEqual(connect.call_count, 1)
+
+
+@override_settings(AVIATION_CONDITIONAL_GET=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_network()
+        create_flight(1, T0)
+        create_booking(1)
+        create_booking(2)
+        SeatClass.objects.create(seatclass=1, basefare=100, baggageallowance=20)
+        cls.user = User.objects.create_user('staff')
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.user)
+        self.url = reverse('booking_detail', args=[1])
+
+    def revalidate(self, etag):
+        return self.client.get(self.url, headers={'If-None-Match': etag})
+
+    def announce(self, table, action, pk, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_write(table, action, pk, **kwargs)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Another booking's write leaves this page's rows alone
+        self.announce('BOOKING', 'update', 2)
+        self.assertEqual(self.revalidate(etag).status_code, 304)
+
+    def test_writes_issue_a_fresh_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            create_ticket(1, 1, '1A')
+            notify_write('TICKET', 'insert', 1)
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1A')
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+        self.assertEqual(self.revalidate(etag).status_code, 304)
+        self.announce('PASSENGER', 'update', 2)
+        self.assertEqual(self.revalidate(etag).status_code, 200)
+
+    def test_etags_are_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.revalidate(etag).status_code, 200)
+
+    @override_settings(AVIATION_CONDITIONAL_GET=None)
+    def test_local_memory_caches_disable_validators(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(self.revalidate('*').status_code, 200)
+
+
+class ChangeFeedTests(TestCase):
+    def event(self, event_id, table='FLIGHT', age=0):
+        changed = timezone.now() - datetime.timedelta(seconds=age)
+        ChangeEvent.objects.create(eventid=event_id, tablename=table, action='update', rowkey=str(event_id),
+                                   changedat=changed)
+
+    def ids(self, batch):
+        return [event.eventid for event in batch.events]
+
+    def test_committed_events_are_handed_out_at_once(self):
+        self.event(1)
+        self.event(2)
+        batch = read_changes()
+        self.assertEqual((self.ids(batch), batch.after, batch.gaps), ([1, 2], 2, []))
+
+    def test_gap_is_polled_until_its_event_commits(self):
+        self.event(1)
+        self.event(3)
+        batch = read_changes()
+        self.assertEqual((self.ids(batch), batch.after, batch.gaps), ([1, 3], 3, [2]))
+        self.event(2)
+        self.event(4)
+        batch = read_changes(batch.after, gaps=batch.gaps)
+        self.assertEqual((self.ids(batch), batch.after, batch.gaps), ([2, 4], 4, []))
+
+    def test_gap_is_given_up_after_the_timeout(self):
+        self.event(1)
+        self.event(3, age=GAP_TIMEOUT_SECONDS + 1)
+        self.assertEqual(read_changes().gaps, [])
+        self.assertEqual(read_changes(3, gaps=[2]).gaps, [])
+
+    def test_other_tables_do_not_open_gaps(self):
+        self.event(1)
+        self.event(2, table='AIRLINE')
+        self.event(3)
+        batch = read_changes(tables=['FLIGHT'])
+        self.assertEqual((self.ids(batch), batch.after, batch.gaps), ([1, 3], 3, []))
+
+    def test_consumer_checkpoints_its_gaps(self):
+        seen = []
+        feed = ChangeFeedConsumer('test', batch_size=2)
+        self.event(1)
+        self.event(3)
+        feed.drain(lambda events: seen.extend(event.eventid for event in events))
+        self.assertEqual(feed.position(), (3, [2]))
+        self.event(2)
+        feed.drain(lambda events: seen.extend(event.eventid for event in events))
+        self.assertEqual((seen, feed.position()), ([1, 3, 2], (3, [])))
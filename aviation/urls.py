@@ -16,6 +16,11 @@ urlpatterns = [
     path('flights/add/', views.add_flight, name='add_flight'),
     path('flights/<int:flight_id>/edit/', views.edit_flight, name='edit_flight'),
     path('flights/<int:flight_id>/delete/', views.delete_flight, name='delete_flight'),
+    path('flights/gate-conflicts/', views.gate_conflicts, name='gate_conflicts'),
+    path('flights/performance/', views.on_time_performance, name='on_time_performance'),
+    path('flights/availability/', views.seat_availability, name='seat_availability'),
+    path('flights/export/', views.export_flights, name='export_flights'),
+    path('flights/upload/', views.upload_flights, name='upload_flights'),
     
     # Passengers
     path('passengers/', views.passengers_list, name='passengers_list'),
@@ -23,6 +28,8 @@ urlpatterns = [
     path('passengers/add/', views.add_passenger, name='add_passenger'),
     path('passengers/<int:passenger_id>/edit/', views.edit_passenger, name='edit_passenger'),
     path('passengers/<int:passenger_id>/delete/', views.delete_passenger, name='delete_passenger'),
+    path('passengers/export/', views.export_passengers, name='export_passengers'),
+    path('passengers/upload/', views.upload_passengers, name='upload_passengers'),
     
     # Bookings
     path('bookings/', views.bookings_list, name='bookings_list'),
@@ -30,6 +37,15 @@ urlpatterns = [
     path('bookings/add/', views.add_booking, name='add_booking'),
     path('bookings/<int:booking_id>/edit/', views.edit_booking, name='edit_booking'),
     path('bookings/<int:booking_id>/delete/', views.delete_booking, name='delete_booking'),
+    path('bookings/export/', views.export_bookings, name='export_bookings'),
+    path('bookings/upload/', views.upload_bookings, name='upload_bookings'),
+    path('bookings/revenue/', views.revenue_report, name='revenue_report'),
+    path('bookings/revenue/rates/', views.currency_rates, name='currency_rates'),
+    path('bookings/revenue/rates/<int:rate_id>/delete/', views.delete_currency_rate, name='delete_currency_rate'),
+    
+    # Tickets
+    path('tickets/export/', views.export_tickets, name='export_tickets'),
+    path('tickets/upload/', views.upload_tickets, name='upload_tickets'),
     
     # Airlines
     path('airlines/', views.airlines_list, name='airlines_list'),
@@ -44,9 +60,12 @@ urlpatterns = [
     path('airports/add/', views.add_airport, name='add_airport'),
     path('airports/<int:airport_code>/edit/', views.edit_airport, name='edit_airport'),
     path('airports/<int:airport_code>/delete/', views.delete_airport, name='delete_airport'),
+    path('airports/nearest/', views.airports_nearest, name='airports_nearest'),
+    path('airports/within/', views.airports_within, name='airports_within'),
     
     # Aircraft
     path('aircraft/', views.aircraft_list, name='aircraft_list'),
+    path('aircraft/rotations/', views.rotation_integrity, name='rotation_integrity'),
     path('aircraft/add/', views.add_aircraft, name='add_aircraft'),
     path('aircraft/<int:aircraft_id>/edit/', views.edit_aircraft, name='edit_aircraft'),
     path('aircraft/<int:aircraft_id>/delete/', views.delete_aircraft, name='delete_aircraft'),
@@ -56,16 +75,22 @@ urlpatterns = [
     path('routes/add/', views.add_route, name='add_route'),
     path('routes/<int:route_id>/edit/', views.edit_route, name='edit_route'),
     path('routes/<int:route_id>/delete/', views.delete_route, name='delete_route'),
+    path('routes/paths/', views.route_paths, name='route_paths'),
+    path('routes/reachable/', views.route_reachable, name='route_reachable'),
+    path('routes/min-hops/', views.route_min_hops, name='route_min_hops'),
     
     # Crew
     path('crew/', views.crew_list, name='crew_list'),
     path('crew/add/', views.add_crew, name='add_crew'),
+    path('crew/assignments/', views.crew_assignments, name='crew_assignments'),
+    path('crew/roster-check/', views.crew_roster_check, name='crew_roster_check'),
     path('crew/<int:crew_id>/edit/', views.edit_crew, name='edit_crew'),
     path('crew/<int:crew_id>/delete/', views.delete_crew, name='delete_crew'),
     
     # Maintenance
     path('maintenance/', views.maintenance_list, name='maintenance_list'),
     path('maintenance/add/', views.add_maintenance, name='add_maintenance'),
+    path('maintenance/due/', views.maintenance_due, name='maintenance_due'),
     path('maintenance/<int:maintenance_id>/edit/', views.edit_maintenance, name='edit_maintenance'),
     path('maintenance/<int:maintenance_id>/delete/', views.delete_maintenance, name='delete_maintenance'),
     
@@ -75,6 +100,18 @@ urlpatterns = [
     path('countries/<int:country_code>/edit/', views.edit_country, name='edit_country'),
     path('countries/<int:country_code>/delete/', views.delete_country, name='delete_country'),
     
+    # Itinerary search
+    path('itineraries/', views.itinerary_search, name='itinerary_search'),
+    
+    # Typeahead lookups
+    path('lookup/<str:kind>/', views.lookup, name='lookup'),
+    
+    # Change feed
+    path('changes/', views.change_feed, name='change_feed'),
+    
+    # Metrics
+    path('metrics/', views.metrics, name='metrics'),
+    
     # Search
     path('search/', views.search_flights, name='search_flights'),
 ]
\ No newline at end of file
@@ -1,13 +1,45 @@
+import datetime
+import hmac
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db import connection
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import (Flight, Passenger, Booking, Airline, Airport, 
                      Aircraft, Country, Ticket, AircraftType, Currency, Alliance, City,
-                     Route, CrewMember, MaintenanceType, MaintenanceRecord, Technician)
-from .forms import FlightForm, PassengerForm, BookingForm
+                     Route, CrewMember, MaintenanceType, MaintenanceRecord, Technician,
+                     CrewAssignment, CurrencyRate)
+from .forms import FlightForm, PassengerForm, BookingForm, BulkUploadForm
+from .pagination import paginate_request
+from .exports import export_response
+from .search import search
+from .signals import notify_write
+from .changefeed import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, event_dict, format_gaps, parse_gaps, read_changes
+from .stats import dashboard_stats
+from .conditional import conditional_page, current_minute
+from .fanout import gather_queries, render_async
+from .refdata import reference_data
+from .lookups import DEFAULT_LIMIT, lookup_results
+from .metrics import registry
+from .bulk_upload import UPLOADS, process_upload
+from .boards import fleet_summary, flight_board, parse_window
+from .route_graph import (DEFAULT_MAX_STOPS, DEFAULT_PATHS, MAX_PATHS, MAX_STOPS, WEIGHTS,
+                          describe_path, route_graph)
+from .gates import check_flight_gates, day_conflicts
+from .rotations import check_flight_rotation, rotation_report
+from .maintenance import DEFAULT_DUE_DAYS, MAX_DUE_DAYS, due_counts, due_within, overdue, record_aircraft, refresh_due
+from .performance import ON_TIME_MINUTES, performance_summary, performance_table
+from .revenue import DIMENSIONS as REVENUE_DIMENSIONS, reporting_currency, revenue_table, revenue_totals
+from .crew import MAX_BULK_ASSIGNMENTS, assign_crew, check_assignments, roster_issues, unassign_crew
+from .seats import MAX_AVAILABILITY_FLIGHTS, seat_inventories, seat_inventory
+from .itineraries import MIN_CONNECTION_MINUTES, search_itineraries
+from .geo import DEFAULT_NEAREST, MAX_NEAREST, MAX_RADIUS_KM, airport_index, route_distance_km
 
 # ============================================================================
 # AUTHENTICATION VIEWS
@@ -80,35 +112,18 @@ def logout_view(request):
 # ============================================================================
 
 @login_required
-def home(request):
-    """Home page with dashboard statistics"""
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT COUNT(*) FROM FLIGHT")
-        total_flights = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM AIRCRAFT")
-        active_aircraft = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM AIRPORT")
-        total_airports = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM COUNTRY")
-        total_countries = cursor.fetchone()[0]
-    
-    # Get recent flights
-    recent_flights = Flight.objects.select_related(
-        'airlineid', 'departureairportcode', 'arrivalairportcode'
-    ).order_by('-scheduleddeparture')[:25]
+async def home(request):
+    """Home page with dashboard statistics; the counters and recent flights are read concurrently"""
+    results = await gather_queries(
+        stats=dashboard_stats,
+        recent_flights=lambda: list(Flight.objects.select_related(
+            'airlineid', 'departureairportcode', 'arrivalairportcode'
+        ).order_by('-scheduleddeparture')[:25]),
+    )
     
-    context = {
-        'total_flights': total_flights,
-        'active_aircraft': active_aircraft,
-        'total_airports': total_airports,
-        'total_countries': total_countries,
-        'database_size': '4.2 GB',
-        'recent_flights': recent_flights,
-    }
-    return render(request, 'aviation/home.html', context)
+    context = results['stats']
+    context['recent_flights'] = results['recent_flights']
+    return await render_async(request, 'aviation/home.html', context)
 
 
 # ============================================================================
@@ -116,33 +131,45 @@ def home(request):
 # ============================================================================
 
 @login_required
+@conditional_page(lambda request: ('FLIGHT', 'AIRLINE', 'AIRPORT'))
 def flights_list(request):
-    """List all flights"""
+    """List flights one keyset page at a time"""
     flights = Flight.objects.select_related(
         'airlineid', 'departureairportcode', 'arrivalairportcode'
-    ).all()
-    return render(request, 'aviation/flights_list.html', {'flights': flights})
+    )
+    page = paginate_request(request, flights, ['scheduleddeparture', 'flightid'])
+    return render(request, 'aviation/flights_list.html', {'flights': page, 'page': page})
 
 @login_required
-def flight_detail(request, flight_id):
-    """View details of a specific flight"""
-    flight = get_object_or_404(Flight, flightid=flight_id)
-    tickets = Ticket.objects.filter(flightid=flight_id).select_related('passengerid')
-    
-    context = {
-        'flight': flight,
-        'tickets': tickets,
-    }
-    return render(request, 'aviation/flight_detail.html', context)
+@conditional_page(lambda request, flight_id: (('FLIGHT', flight_id), 'AIRLINE', 'AIRPORT', 'AIRCRAFT',
+                                              'PASSENGER', 'CREW_MEMBER'))
+async def flight_detail(request, flight_id):
+    """View details of a specific flight, reading the flight, tickets, seats and crew concurrently"""
+    context = await gather_queries(
+        flight=lambda: get_object_or_404(
+            Flight.objects.select_related('airlineid', 'departureairportcode', 'arrivalairportcode'),
+            flightid=flight_id),
+        tickets=lambda: list(Ticket.objects.filter(flightid=flight_id).select_related('passengerid')),
+        seats=lambda: seat_inventory(flight_id),
+        crew=lambda: list(CrewMember.objects.filter(crewassignment__flightid=flight_id)
+                          .select_related('airportcode')),
+    )
+    return await render_async(request, 'aviation/flight_detail.html', context)
 
 @login_required
 def add_flight(request):
     """Add a new flight"""
     if request.method == 'POST':
         form = FlightForm(request.POST)
+        schedule_errors = []
         if form.is_valid():
+            schedule_errors = (check_flight_gates(form.cleaned_data['flightid'], form.cleaned_data)
+                               + check_flight_rotation(form.cleaned_data['flightid'], form.cleaned_data))
+        for error in schedule_errors:
+            messages.error(request, error)
+        if form.is_valid() and not schedule_errors:
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     cursor.execute("""
                         INSERT INTO FLIGHT (FlightID, FlightNumber, ScheduledDeparture, 
                         ScheduledArrival, FlightStatus, AirlineID, AircraftID, 
@@ -164,6 +191,7 @@ def add_flight(request):
                         form.cleaned_data['departuregatenumber'],
                         form.cleaned_data['arrivalgatenumber'],
                     ])
+                    notify_write('FLIGHT', 'insert', form.cleaned_data['flightid'], cursor.rowcount)
                 messages.success(request, 'Flight added successfully!')
                 return redirect('flights_list')
             except Exception as e:
@@ -191,15 +219,13 @@ def add_flight(request):
         form = FlightForm()
     
     # Get reference data for form
-    airlines = Airline.objects.all()
-    airports = Airport.objects.all()
-    aircraft = Aircraft.objects.all()
+    airlines = reference_data('AIRLINE')
+    airports = reference_data('AIRPORT')
     
     context = {
         'form': form,
         'airlines': airlines,
         'airports': airports,
-        'aircraft': aircraft,
     }
     return render(request, 'aviation/add_flight.html', context)
 
@@ -208,9 +234,16 @@ def edit_flight(request, flight_id):
     """Edit an existing flight"""
     flight = get_object_or_404(Flight, flightid=flight_id)
     
+    schedule_errors = []
     if request.method == 'POST':
+        schedule_errors = (check_flight_gates(flight_id, request.POST, current=flight)
+                           + check_flight_rotation(flight_id, request.POST, current=flight))
+    for error in schedule_errors:
+        messages.error(request, error)
+    
+    if request.method == 'POST' and not schedule_errors:
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 # Handle optional datetime fields
                 actual_departure = request.POST.get('actualdeparture') or None
                 actual_arrival = request.POST.get('actualarrival') or None
@@ -249,6 +282,7 @@ def edit_flight(request, flight_id):
                     request.POST.get('arrivalgatenumber'),
                     flight_id,
                 ])
+                notify_write('FLIGHT', 'update', flight_id, cursor.rowcount)
             messages.success(request, 'Flight updated successfully!')
             return redirect('flights_list')
         except Exception as e:
@@ -275,15 +309,13 @@ def edit_flight(request, flight_id):
             # Don't redirect, so user can see their input and fix it
     
     # Get reference data for form
-    airlines = Airline.objects.all()
-    airports = Airport.objects.all()
-    aircraft = Aircraft.objects.all()
+    airlines = reference_data('AIRLINE')
+    airports = reference_data('AIRPORT')
     
     context = {
         'flight': flight,
         'airlines': airlines,
         'airports': airports,
-        'aircraft': aircraft,
     }
     return render(request, 'aviation/edit_flight.html', context)
 
@@ -292,8 +324,9 @@ def delete_flight(request, flight_id):
     """Delete a flight"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM FLIGHT WHERE FlightID = %s", [flight_id])
+                notify_write('FLIGHT', 'delete', flight_id, cursor.rowcount)
             messages.success(request, 'Flight deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -308,9 +341,10 @@ def delete_flight(request, flight_id):
 
 @login_required
 def passengers_list(request):
-    """List all passengers"""
-    passengers = Passenger.objects.select_related('countrycode').all()
-    return render(request, 'aviation/passengers_list.html', {'passengers': passengers})
+    """List passengers one keyset page at a time"""
+    passengers = Passenger.objects.select_related('countrycode')
+    page = paginate_request(request, passengers, ['passengerid'])
+    return render(request, 'aviation/passengers_list.html', {'passengers': page, 'page': page})
 
 @login_required
 def passenger_detail(request, passenger_id):
@@ -330,7 +364,7 @@ def add_passenger(request):
     if request.method == 'POST':
         form = PassengerForm(request.POST)
         if form.is_valid():
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("""
                     INSERT INTO PASSENGER (PassengerID, FirstName, LastName, Email, 
                     Phone, DateOfBirth, PassportNumber, CountryCode, Nationality)
@@ -346,12 +380,13 @@ def add_passenger(request):
                     form.cleaned_data['countrycode'],
                     form.cleaned_data['nationality'],
                 ])
+                notify_write('PASSENGER', 'insert', form.cleaned_data['passengerid'], cursor.rowcount)
             messages.success(request, 'Passenger added successfully!')
             return redirect('passengers_list')
     else:
         form = PassengerForm()
     
-    countries = Country.objects.all()
+    countries = reference_data('COUNTRY')
     context = {
         'form': form,
         'countries': countries,
@@ -364,11 +399,13 @@ def add_passenger(request):
 
 @login_required
 def bookings_list(request):
-    """List all bookings"""
-    bookings = Booking.objects.select_related('passengerid', 'currencycode').all()
-    return render(request, 'aviation/bookings_list.html', {'bookings': bookings})
+    """List bookings one keyset page at a time"""
+    bookings = Booking.objects.select_related('passengerid', 'currencycode')
+    page = paginate_request(request, bookings, ['bookingid'])
+    return render(request, 'aviation/bookings_list.html', {'bookings': page, 'page': page})
 
 @login_required
+@conditional_page(lambda request, booking_id: (('BOOKING', booking_id), 'PASSENGER'))
 def booking_detail(request, booking_id):
     """View details of a specific booking"""
     booking = get_object_or_404(Booking, bookingid=booking_id)
@@ -387,7 +424,7 @@ def add_booking(request):
         form = BookingForm(request.POST)
         if form.is_valid():
             try:
-                with connection.cursor() as cursor:
+                with transaction.atomic(), connection.cursor() as cursor:
                     cursor.execute("""
                         INSERT INTO BOOKING (BookingID, BookingDate, TotalAmount, 
                         BookingStatus, BookingChannel, PassengerID, CurrencyCode)
@@ -401,6 +438,7 @@ def add_booking(request):
                         form.cleaned_data['passengerid'],
                         form.cleaned_data['currencycode'],
                     ])
+                    notify_write('BOOKING', 'insert', form.cleaned_data['bookingid'], cursor.rowcount)
                 messages.success(request, 'Booking added successfully!')
                 return redirect('bookings_list')
             except Exception as e:
@@ -421,12 +459,10 @@ def add_booking(request):
     else:
         form = BookingForm()
     
-    passengers = Passenger.objects.all()
-    currencies = Currency.objects.all()
+    currencies = reference_data('CURRENCY')
     
     context = {
         'form': form,
-        'passengers': passengers,
         'currencies': currencies,
     }
     return render(request, 'aviation/add_booking.html', context)
@@ -442,18 +478,19 @@ def airlines_list(request):
     return render(request, 'aviation/airlines_list.html', {'airlines': airlines})
 
 @login_required
-def airline_detail(request, airline_id):
-    """View details of a specific airline"""
-    airline = get_object_or_404(Airline, airlineid=airline_id)
-    flights = Flight.objects.filter(airlineid=airline_id)
-    aircraft = Aircraft.objects.filter(airlineid=airline_id)
+async def airline_detail(request, airline_id):
+    """View details of a specific airline; its board, fleet and performance are read concurrently"""
+    window = parse_window(request)
     
-    context = {
-        'airline': airline,
-        'flights': flights,
-        'aircraft': aircraft,
-    }
-    return render(request, 'aviation/airline_detail.html', context)
+    context = await gather_queries(
+        airline=lambda: get_object_or_404(Airline.objects.select_related('headquarterscityid', 'allianceid'),
+                                          airlineid=airline_id),
+        flights=lambda: flight_board(window, 'scheduleddeparture', airlineid=airline_id),
+        fleet=lambda: fleet_summary(airline_id),
+        performance=lambda: performance_summary('AIRLINE', airline_id),
+    )
+    context['window'] = window
+    return await render_async(request, 'aviation/airline_detail.html', context)
 
 # ============================================================================
 # AIRPORT VIEWS
@@ -466,18 +503,21 @@ def airports_list(request):
     return render(request, 'aviation/airports_list.html', {'airports': airports})
 
 @login_required
-def airport_detail(request, airport_code):
-    """View details of a specific airport"""
-    airport = get_object_or_404(Airport, airportcode=airport_code)
-    departures = Flight.objects.filter(departureairportcode=airport_code)
-    arrivals = Flight.objects.filter(arrivalairportcode=airport_code)
+@conditional_page(lambda request, airport_code: (('AIRPORT', airport_code), 'FLIGHT', 'AIRLINE', 'COUNTRY'),
+                  moment=current_minute)
+async def airport_detail(request, airport_code):
+    """View details of a specific airport; both boards and the performance are read concurrently"""
+    window = parse_window(request)
     
-    context = {
-        'airport': airport,
-        'departures': departures,
-        'arrivals': arrivals,
-    }
-    return render(request, 'aviation/airport_detail.html', context)
+    context = await gather_queries(
+        airport=lambda: get_object_or_404(Airport.objects.select_related('cityid__countrycode'),
+                                          airportcode=airport_code),
+        departures=lambda: flight_board(window, 'scheduleddeparture', departureairportcode=airport_code),
+        arrivals=lambda: flight_board(window, 'scheduledarrival', arrivalairportcode=airport_code),
+        performance=lambda: performance_summary('AIRPORT', airport_code),
+    )
+    context['window'] = window
+    return await render_async(request, 'aviation/airport_detail.html', context)
 
 
 
@@ -491,7 +531,7 @@ def edit_passenger(request, passenger_id):
     passenger = get_object_or_404(Passenger, passengerid=passenger_id)
     
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE PASSENGER SET
                     FirstName = %s,
@@ -514,10 +554,11 @@ def edit_passenger(request, passenger_id):
                 request.POST.get('nationality'),
                 passenger_id,
             ])
+            notify_write('PASSENGER', 'update', passenger_id, cursor.rowcount)
         messages.success(request, 'Passenger updated successfully!')
         return redirect('passengers_list')
     
-    countries = Country.objects.all()
+    countries = reference_data('COUNTRY')
     context = {
         'passenger': passenger,
         'countries': countries,
@@ -529,8 +570,9 @@ def delete_passenger(request, passenger_id):
     """Delete a passenger"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM PASSENGER WHERE PassengerID = %s", [passenger_id])
+                notify_write('PASSENGER', 'delete', passenger_id, cursor.rowcount)
             messages.success(request, 'Passenger deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -550,7 +592,7 @@ def edit_booking(request, booking_id):
     
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("""
                     UPDATE BOOKING SET
                         BookingDate = %s,
@@ -569,6 +611,7 @@ def edit_booking(request, booking_id):
                     request.POST.get('currencycode'),
                     booking_id,
                 ])
+                notify_write('BOOKING', 'update', booking_id, cursor.rowcount)
             messages.success(request, 'Booking updated successfully!')
             return redirect('bookings_list')
         except Exception as e:
@@ -585,11 +628,9 @@ def edit_booking(request, booking_id):
             else:
                 messages.error(request, f'Error updating booking: {str(e)}')
     
-    passengers = Passenger.objects.all()
-    currencies = Currency.objects.all()
+    currencies = reference_data('CURRENCY')
     context = {
         'booking': booking,
-        'passengers': passengers,
         'currencies': currencies,
     }
     return render(request, 'aviation/edit_booking.html', context)
@@ -599,8 +640,9 @@ def delete_booking(request, booking_id):
     """Delete a booking"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM BOOKING WHERE BookingID = %s", [booking_id])
+                notify_write('BOOKING', 'delete', booking_id, cursor.rowcount)
             messages.success(request, 'Booking deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -617,7 +659,7 @@ def delete_booking(request, booking_id):
 def add_airline(request):
     """Add a new airline"""
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO AIRLINE (AirlineID, AirlineName, AirlineICAO, 
                 HeadquartersCityID, FoundedYear, AllianceID)
@@ -630,11 +672,12 @@ def add_airline(request):
                 request.POST.get('foundedyear'),
                 request.POST.get('allianceid'),
             ])
+            notify_write('AIRLINE', 'insert', request.POST.get('airlineid'), cursor.rowcount)
         messages.success(request, 'Airline added successfully!')
         return redirect('airlines_list')
     
-    cities = City.objects.all()
-    alliances = Alliance.objects.all()
+    cities = reference_data('CITY')
+    alliances = reference_data('ALLIANCE')
     context = {
         'cities': cities,
         'alliances': alliances,
@@ -647,7 +690,7 @@ def edit_airline(request, airline_id):
     airline = get_object_or_404(Airline, airlineid=airline_id)
     
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE AIRLINE SET
                     AirlineName = %s,
@@ -664,11 +707,12 @@ def edit_airline(request, airline_id):
                 request.POST.get('allianceid'),
                 airline_id,
             ])
+            notify_write('AIRLINE', 'update', airline_id, cursor.rowcount)
         messages.success(request, 'Airline updated successfully!')
         return redirect('airlines_list')
     
-    cities = City.objects.all()
-    alliances = Alliance.objects.all()
+    cities = reference_data('CITY')
+    alliances = reference_data('ALLIANCE')
     context = {
         'airline': airline,
         'cities': cities,
@@ -681,8 +725,9 @@ def delete_airline(request, airline_id):
     """Delete an airline"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM AIRLINE WHERE AirlineID = %s", [airline_id])
+                notify_write('AIRLINE', 'delete', airline_id, cursor.rowcount)
             messages.success(request, 'Airline deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -699,7 +744,7 @@ def delete_airline(request, airline_id):
 def add_airport(request):
     """Add a new airport"""
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO AIRPORT (AirportCode, AirportName, Latitude, 
                 Longitude, Timezone, CityID)
@@ -712,10 +757,11 @@ def add_airport(request):
                 request.POST.get('timezone'),
                 request.POST.get('cityid'),
             ])
+            notify_write('AIRPORT', 'insert', request.POST.get('airportcode'), cursor.rowcount)
         messages.success(request, 'Airport added successfully!')
         return redirect('airports_list')
     
-    cities = City.objects.all()
+    cities = reference_data('CITY')
     context = {'cities': cities}
     return render(request, 'aviation/add_airport.html', context)
 
@@ -725,7 +771,7 @@ def edit_airport(request, airport_code):
     airport = get_object_or_404(Airport, airportcode=airport_code)
     
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE AIRPORT SET
                     AirportName = %s,
@@ -742,10 +788,11 @@ def edit_airport(request, airport_code):
                 request.POST.get('cityid'),
                 airport_code,
             ])
+            notify_write('AIRPORT', 'update', airport_code, cursor.rowcount)
         messages.success(request, 'Airport updated successfully!')
         return redirect('airports_list')
     
-    cities = City.objects.all()
+    cities = reference_data('CITY')
     context = {
         'airport': airport,
         'cities': cities,
@@ -757,8 +804,9 @@ def delete_airport(request, airport_code):
     """Delete an airport"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM AIRPORT WHERE AirportCode = %s", [airport_code])
+                notify_write('AIRPORT', 'delete', airport_code, cursor.rowcount)
             messages.success(request, 'Airport deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -784,7 +832,7 @@ def aircraft_list(request):
 def add_aircraft(request):
     """Add new aircraft"""
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO AIRCRAFT (AircraftID, ManufactureYear, LastMaintenanceDate, 
                 AirlineID, AircraftTypeCode)
@@ -796,11 +844,12 @@ def add_aircraft(request):
                 request.POST.get('airlineid'),
                 request.POST.get('aircrafttypecode'),
             ])
+            notify_write('AIRCRAFT', 'insert', request.POST.get('aircraftid'), cursor.rowcount)
         messages.success(request, 'Aircraft added successfully!')
         return redirect('aircraft_list')
     
-    airlines = Airline.objects.all()
-    aircraft_types = AircraftType.objects.all()
+    airlines = reference_data('AIRLINE')
+    aircraft_types = reference_data('AIRCRAFT_TYPE')
     context = {'airlines': airlines, 'aircraft_types': aircraft_types}
     return render(request, 'aviation/add_aircraft.html', context)
 
@@ -809,7 +858,7 @@ def edit_aircraft(request, aircraft_id):
     """Edit aircraft"""
     aircraft = get_object_or_404(Aircraft, aircraftid=aircraft_id)
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE AIRCRAFT SET ManufactureYear = %s, LastMaintenanceDate = %s,
                 AirlineID = %s, AircraftTypeCode = %s WHERE AircraftID = %s
@@ -820,11 +869,12 @@ def edit_aircraft(request, aircraft_id):
                 request.POST.get('aircrafttypecode'),
                 aircraft_id,
             ])
+            notify_write('AIRCRAFT', 'update', aircraft_id, cursor.rowcount)
         messages.success(request, 'Aircraft updated successfully!')
         return redirect('aircraft_list')
     
-    airlines = Airline.objects.all()
-    aircraft_types = AircraftType.objects.all()
+    airlines = reference_data('AIRLINE')
+    aircraft_types = reference_data('AIRCRAFT_TYPE')
     context = {'aircraft': aircraft, 'airlines': airlines, 'aircraft_types': aircraft_types}
     return render(request, 'aviation/edit_aircraft.html', context)
 
@@ -833,8 +883,9 @@ def delete_aircraft(request, aircraft_id):
     """Delete aircraft"""
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM AIRCRAFT WHERE AircraftID = %s", [aircraft_id])
+                notify_write('AIRCRAFT', 'delete', aircraft_id, cursor.rowcount)
             messages.success(request, 'Aircraft deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -860,54 +911,67 @@ def routes_list(request):
         routes = [dict(zip(columns, row)) for row in cursor.fetchall()]
     return render(request, 'aviation/routes_list.html', {'routes': routes})
 
+def _route_distance(data):
+    """The entered DistanceKM, or the great-circle distance when it is left blank"""
+    if data.get('distancekm'):
+        return data.get('distancekm')
+    try:
+        km = route_distance_km(int(data.get('originairportcode')), int(data.get('destinationairportcode')))
+    except (TypeError, ValueError):
+        return None
+    return round(km) if km is not None else None
+
 @login_required
 def add_route(request):
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO ROUTE (RouteID, DistanceKM, EstimatedDurationMins, RouteType,
                 OriginAirportCode, DestinationAirportCode)
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, [
                 request.POST.get('routeid'),
-                request.POST.get('distancekm'),
+                _route_distance(request.POST),
                 request.POST.get('estimateddurationmins'),
                 request.POST.get('routetype'),
                 request.POST.get('originairportcode'),
                 request.POST.get('destinationairportcode'),
             ])
+            notify_write('ROUTE', 'insert', request.POST.get('routeid'), cursor.rowcount)
         messages.success(request, 'Route added successfully!')
         return redirect('routes_list')
-    airports = Airport.objects.all()
+    airports = reference_data('AIRPORT')
     return render(request, 'aviation/add_route.html', {'airports': airports})
 
 @login_required
 def edit_route(request, route_id):
     route = get_object_or_404(Route, routeid=route_id)
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE ROUTE SET DistanceKM = %s, EstimatedDurationMins = %s, RouteType = %s,
                 OriginAirportCode = %s, DestinationAirportCode = %s WHERE RouteID = %s
             """, [
-                request.POST.get('distancekm'),
+                _route_distance(request.POST),
                 request.POST.get('estimateddurationmins'),
                 request.POST.get('routetype'),
                 request.POST.get('originairportcode'),
                 request.POST.get('destinationairportcode'),
                 route_id,
             ])
+            notify_write('ROUTE', 'update', route_id, cursor.rowcount)
         messages.success(request, 'Route updated successfully!')
         return redirect('routes_list')
-    airports = Airport.objects.all()
+    airports = reference_data('AIRPORT')
     return render(request, 'aviation/edit_route.html', {'route': route, 'airports': airports})
 
 @login_required
 def delete_route(request, route_id):
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM ROUTE WHERE RouteID = %s", [route_id])
+                notify_write('ROUTE', 'delete', route_id, cursor.rowcount)
             messages.success(request, 'Route deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -936,7 +1000,7 @@ def crew_list(request):
 @login_required
 def add_crew(request):
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO CREW_MEMBER (CrewID, FirstName, LastName, DateOfBirth, HireDate,
                 CrewType, AirlineID, AirportCode)
@@ -951,17 +1015,18 @@ def add_crew(request):
                 request.POST.get('airlineid'),
                 request.POST.get('airportcode'),
             ])
+            notify_write('CREW_MEMBER', 'insert', request.POST.get('crewid'), cursor.rowcount)
         messages.success(request, 'Crew member added successfully!')
         return redirect('crew_list')
-    airlines = Airline.objects.all()
-    airports = Airport.objects.all()
+    airlines = reference_data('AIRLINE')
+    airports = reference_data('AIRPORT')
     return render(request, 'aviation/add_crew.html', {'airlines': airlines, 'airports': airports})
 
 @login_required
 def edit_crew(request, crew_id):
     crew = get_object_or_404(CrewMember, crewid=crew_id)
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE CREW_MEMBER SET FirstName = %s, LastName = %s, DateOfBirth = %s,
                 HireDate = %s, CrewType = %s, AirlineID = %s, AirportCode = %s WHERE CrewID = %s
@@ -975,18 +1040,20 @@ def edit_crew(request, crew_id):
                 request.POST.get('airportcode'),
                 crew_id,
             ])
+            notify_write('CREW_MEMBER', 'update', crew_id, cursor.rowcount)
         messages.success(request, 'Crew member updated successfully!')
         return redirect('crew_list')
-    airlines = Airline.objects.all()
-    airports = Airport.objects.all()
+    airlines = reference_data('AIRLINE')
+    airports = reference_data('AIRPORT')
     return render(request, 'aviation/edit_crew.html', {'crew': crew, 'airlines': airlines, 'airports': airports})
 
 @login_required
 def delete_crew(request, crew_id):
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM CREW_MEMBER WHERE CrewID = %s", [crew_id])
+                notify_write('CREW_MEMBER', 'delete', crew_id, cursor.rowcount)
             messages.success(request, 'Crew member deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -1001,24 +1068,28 @@ def delete_crew(request, crew_id):
 
 @login_required
 def maintenance_list(request):
-    """List all maintenance records"""
-    # Using raw SQL since MaintenanceRecord model doesn't exist in models.py yet
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT m.MaintenanceID, m.MaintenanceDate, m.Cost, m.NextDueDate, m.Description,
-                   a.AircraftID, mt.MaintenanceType
-            FROM MAINTENANCE_RECORD m
-            JOIN AIRCRAFT a ON m.AircraftID = a.AircraftID
-            JOIN MAINTENANCE_TYPE mt ON m.MaintenanceTypeID = mt.MaintenanceTypeID
-        """)
-        columns = [col[0] for col in cursor.description]
-        maintenance = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    return render(request, 'aviation/maintenance_list.html', {'maintenance': maintenance})
+    """List maintenance records one keyset page at a time"""
+    records = MaintenanceRecord.objects.select_related('maintenancetypeid')
+    page = paginate_request(request, records, ['maintenanceid'])
+    return render(request, 'aviation/maintenance_list.html', {
+        'maintenance': page, 'page': page, 'due_counts': due_counts(), 'due_days': DEFAULT_DUE_DAYS,
+    })
+
+@login_required
+def maintenance_due(request):
+    """Overdue maintenance and maintenance due in the next N days"""
+    days = min(_int_param(request, 'days', DEFAULT_DUE_DAYS), MAX_DUE_DAYS)
+    context = {
+        'days': days,
+        'overdue': overdue(),
+        'due': due_within(days),
+    }
+    return render(request, 'aviation/maintenance_due.html', context)
 
 @login_required
 def add_maintenance(request):
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO MAINTENANCE_RECORD (MaintenanceID, MaintenanceDate, Description,
                 Cost, NextDueDate, TechnicianID, AircraftID, MaintenanceTypeID)
@@ -1033,20 +1104,22 @@ def add_maintenance(request):
                 request.POST.get('aircraftid'),
                 request.POST.get('maintenancetypeid'),
             ])
+            notify_write('MAINTENANCE_RECORD', 'insert', request.POST.get('maintenanceid'), cursor.rowcount)
+            refresh_due(record_aircraft([request.POST.get('maintenanceid')]))
         messages.success(request, 'Maintenance record added successfully!')
         return redirect('maintenance_list')
-    technicians = Technician.objects.all()
-    aircraft = Aircraft.objects.all()
-    maintenance_types = MaintenanceType.objects.all()
+    technicians = reference_data('TECHNICIAN')
+    maintenance_types = reference_data('MAINTENANCE_TYPE')
     return render(request, 'aviation/add_maintenance.html', {
-        'technicians': technicians, 'aircraft': aircraft, 'maintenance_types': maintenance_types
+        'technicians': technicians, 'maintenance_types': maintenance_types
     })
 
 @login_required
 def edit_maintenance(request, maintenance_id):
     maintenance = get_object_or_404(MaintenanceRecord, maintenanceid=maintenance_id)
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
+            aircraft_ids = record_aircraft([maintenance_id])
             cursor.execute("""
                 UPDATE MAINTENANCE_RECORD SET MaintenanceDate = %s, Description = %s, Cost = %s,
                 NextDueDate = %s, TechnicianID = %s, AircraftID = %s, MaintenanceTypeID = %s
@@ -1061,22 +1134,26 @@ def edit_maintenance(request, maintenance_id):
                 request.POST.get('maintenancetypeid'),
                 maintenance_id,
             ])
+            notify_write('MAINTENANCE_RECORD', 'update', maintenance_id, cursor.rowcount)
+            refresh_due(aircraft_ids | record_aircraft([maintenance_id]))
         messages.success(request, 'Maintenance record updated successfully!')
         return redirect('maintenance_list')
-    technicians = Technician.objects.all()
-    aircraft = Aircraft.objects.all()
-    maintenance_types = MaintenanceType.objects.all()
+    technicians = reference_data('TECHNICIAN')
+    maintenance_types = reference_data('MAINTENANCE_TYPE')
     return render(request, 'aviation/edit_maintenance.html', {
         'maintenance': maintenance, 'technicians': technicians, 
-        'aircraft': aircraft, 'maintenance_types': maintenance_types
+        'maintenance_types': maintenance_types
     })
 
 @login_required
 def delete_maintenance(request, maintenance_id):
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
+                aircraft_ids = record_aircraft([maintenance_id])
                 cursor.execute("DELETE FROM MAINTENANCE_RECORD WHERE MaintenanceID = %s", [maintenance_id])
+                notify_write('MAINTENANCE_RECORD', 'delete', maintenance_id, cursor.rowcount)
+                refresh_due(aircraft_ids)
             messages.success(request, 'Maintenance record deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -1095,7 +1172,7 @@ def countries_list(request):
 @login_required
 def add_country(request):
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO COUNTRY (CountryCode, CountryName)
                 VALUES (%s, %s)
@@ -1103,6 +1180,7 @@ def add_country(request):
                 request.POST.get('countrycode'),
                 request.POST.get('countryname'),
             ])
+            notify_write('COUNTRY', 'insert', request.POST.get('countrycode'), cursor.rowcount)
         messages.success(request, 'Country added successfully!')
         return redirect('countries_list')
     return render(request, 'aviation/add_country.html')
@@ -1111,13 +1189,14 @@ def add_country(request):
 def edit_country(request, country_code):
     country = get_object_or_404(Country, countrycode=country_code)
     if request.method == 'POST':
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             cursor.execute("""
                 UPDATE COUNTRY SET CountryName = %s WHERE CountryCode = %s
             """, [
                 request.POST.get('countryname'),
                 country_code,
             ])
+            notify_write('COUNTRY', 'update', country_code, cursor.rowcount)
         messages.success(request, 'Country updated successfully!')
         return redirect('countries_list')
     return render(request, 'aviation/edit_country.html', {'country': country})
@@ -1126,8 +1205,9 @@ def edit_country(request, country_code):
 def delete_country(request, country_code):
     if request.method == 'POST':
         try:
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute("DELETE FROM COUNTRY WHERE CountryCode = %s", [country_code])
+                notify_write('COUNTRY', 'delete', country_code, cursor.rowcount)
             messages.success(request, 'Country deleted successfully!')
         except Exception as e:
             if 'foreign key constraint' in str(e).lower():
@@ -1136,69 +1216,517 @@ def delete_country(request, country_code):
                 messages.error(request, f'Error deleting country: {str(e)}')
     return redirect('countries_list')
 
+# ============================================================================
+# DATA EXPORTS
+# ============================================================================
+
+@login_required
+def export_flights(request):
+    """Stream flights as CSV or NDJSON"""
+    return export_response(request, 'flights')
+
+@login_required
+def export_bookings(request):
+    """Stream bookings as CSV or NDJSON"""
+    return export_response(request, 'bookings')
+
+@login_required
+def export_tickets(request):
+    """Stream tickets as CSV or NDJSON"""
+    return export_response(request, 'tickets')
+
+@login_required
+def export_passengers(request):
+    """Stream passengers as CSV or NDJSON"""
+    return export_response(request, 'passengers')
+
+# ============================================================================
+# BULK CSV UPLOADS
+# ============================================================================
+
+def _bulk_upload(request, kind):
+    """Shared handler for the CSV upload pages"""
+    spec = UPLOADS[kind]
+    result = None
+    if request.method == 'POST':
+        form = BulkUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = process_upload(spec, request.FILES['file'])
+            if result.file_error:
+                form.add_error('file', result.file_error)
+            if result.inserted:
+                messages.success(request, f'{result.inserted} {spec.label.lower()} imported successfully!')
+            if result.error_count:
+                messages.error(request, f'{result.error_count} row(s) were rejected. See the report below.')
+    else:
+        form = BulkUploadForm()
+    
+    context = {
+        'form': form,
+        'spec': spec,
+        'result': result,
+    }
+    return render(request, 'aviation/bulk_upload.html', context)
+
+@login_required
+def upload_flights(request):
+    """Bulk-load flights from a CSV file"""
+    return _bulk_upload(request, 'flights')
+
+@login_required
+def upload_passengers(request):
+    """Bulk-load passengers from a CSV file"""
+    return _bulk_upload(request, 'passengers')
+
+@login_required
+def upload_bookings(request):
+    """Bulk-load bookings from a CSV file"""
+    return _bulk_upload(request, 'bookings')
+
+@login_required
+def upload_tickets(request):
+    """Bulk-load tickets from a CSV file"""
+    return _bulk_upload(request, 'tickets')
+
+# ============================================================================
+# TYPEAHEAD LOOKUPS
+# ============================================================================
+
+@login_required
+def lookup(request, kind):
+    """Prefix matches for a form typeahead as compact JSON"""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    results = lookup_results(kind, request.GET.get('q', ''), limit)
+    return JsonResponse({'results': results})
+
+# ============================================================================
+# ROUTE NETWORK
+# ============================================================================
+
+def _int_param(request, name, default=None):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else default
+
+
+def _bad_request(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+@login_required
+def route_paths(request):
+    """k shortest paths between two airports by distance or duration"""
+    origin = _int_param(request, 'from')
+    destination = _int_param(request, 'to')
+    weight = request.GET.get('by', 'distance')
+    if origin is None or destination is None:
+        return _bad_request('from and to airport codes are required')
+    if weight not in WEIGHTS:
+        return _bad_request(f'by must be one of: {", ".join(WEIGHTS)}')
+    k = max(1, min(_int_param(request, 'k', DEFAULT_PATHS), MAX_PATHS))
+    stops = min(_int_param(request, 'stops', DEFAULT_MAX_STOPS), MAX_STOPS)
+    paths = route_graph().shortest_paths(origin, destination, k, weight, stops)
+    return JsonResponse({'from': origin, 'to': destination, 'by': weight,
+                         'paths': [describe_path(legs) for legs in paths]})
+
+
+@login_required
+def route_reachable(request):
+    """Airports reachable from an airport within N stops"""
+    origin = _int_param(request, 'from')
+    if origin is None:
+        return _bad_request('from airport code is required')
+    stops = min(_int_param(request, 'stops', 0), MAX_STOPS)
+    reachable = route_graph().reachable(origin, stops)
+    return JsonResponse({
+        'from': origin,
+        'stops': stops,
+        'airports': [{'airport': code, 'stops': count}
+                     for code, count in sorted(reachable.items(), key=lambda item: (item[1], item[0]))],
+    })
+
+
+@login_required
+def route_min_hops(request):
+    """A path with the fewest legs between two airports"""
+    origin = _int_param(request, 'from')
+    destination = _int_param(request, 'to')
+    if origin is None or destination is None:
+        return _bad_request('from and to airport codes are required')
+    legs = route_graph().min_hops(origin, destination)
+    return JsonResponse({'from': origin, 'to': destination,
+                         'path': describe_path(legs) if legs else None})
+
+# ============================================================================
+# GATE CONFLICTS
+# ============================================================================
+
+@login_required
+def gate_conflicts(request):
+    """Every double-booked gate on a day"""
+    try:
+        date = parse_date(request.GET.get('date', '')) or timezone.localdate()
+    except ValueError:
+        date = timezone.localdate()
+    airport = _int_param(request, 'airport')
+    context = {
+        'date': date,
+        'airport': airport,
+        'airports': reference_data('AIRPORT'),
+        'conflicts': day_conflicts(date, airport),
+    }
+    return render(request, 'aviation/gate_conflicts.html', context)
+
+# ============================================================================
+# AIRCRAFT ROTATIONS
+# ============================================================================
+
+@login_required
+def rotation_integrity(request):
+    """Overlapping legs, short turnarounds and airport breaks across the fleet"""
+    try:
+        start = parse_date(request.GET.get('from', '')) or timezone.localdate()
+        end = parse_date(request.GET.get('to', '')) or start + datetime.timedelta(days=7)
+    except ValueError:
+        start = timezone.localdate()
+        end = start + datetime.timedelta(days=7)
+    aircraft = _int_param(request, 'aircraft')
+    issues = rotation_report(
+        timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(end, datetime.time.min)) + datetime.timedelta(days=1),
+        aircraft,
+    )
+    context = {
+        'start': start,
+        'end': end,
+        'aircraft': aircraft,
+        'issues': issues,
+    }
+    return render(request, 'aviation/rotation_integrity.html', context)
+
+# ============================================================================
+# CREW ROSTERS
+# ============================================================================
+
+def _id_list(value):
+    return list(dict.fromkeys(int(pk) for pk in value.replace(',', ' ').split() if pk.isdigit()))
+
+@login_required
+def crew_assignments(request):
+    """Assign crew members to flights in bulk, or remove their assignments"""
+    if request.method == 'POST':
+        crew_ids = _id_list(request.POST.get('crew', ''))
+        flight_ids = _id_list(request.POST.get('flights', ''))
+        if not crew_ids or not flight_ids:
+            messages.error(request, 'List at least one crew ID and one flight ID.')
+        elif len(crew_ids) * len(flight_ids) > MAX_BULK_ASSIGNMENTS:
+            messages.error(request, f'At most {MAX_BULK_ASSIGNMENTS} assignments can be changed at once.')
+        elif request.POST.get('action') == 'unassign':
+            removed = unassign_crew(crew_ids, flight_ids)
+            messages.success(request, f'{removed} crew assignment(s) removed.')
+        else:
+            errors = check_assignments(crew_ids, flight_ids)
+            for error in errors:
+                messages.error(request, error)
+            if not errors:
+                try:
+                    added = assign_crew(crew_ids, flight_ids)
+                    messages.success(request, f'{len(added)} crew assignment(s) added.')
+                except Exception as e:
+                    if 'foreign key constraint' in str(e).lower():
+                        messages.error(request, 'Every crew ID and flight ID must exist.')
+                    else:
+                        messages.error(request, f'Error assigning crew: {str(e)}')
+        return redirect('crew_assignments')
+    flight = _int_param(request, 'flight')
+    crew = _int_param(request, 'crew')
+    assignments = CrewAssignment.objects.select_related('crewid', 'flightid')
+    if flight is not None:
+        assignments = assignments.filter(flightid=flight)
+    if crew is not None:
+        assignments = assignments.filter(crewid=crew)
+    context = {
+        'flight': flight,
+        'crew': crew,
+        'assignments': assignments.order_by('flightid__scheduleddeparture', 'crewid')[:200],
+        'airlines': reference_data('AIRLINE'),
+    }
+    return render(request, 'aviation/crew_assignments.html', context)
+
+@login_required
+def crew_roster_check(request):
+    """Duty-time, rest and base-return issues in an airline's monthly crew roster"""
+    airline = _int_param(request, 'airline')
+    if airline is None:
+        return _bad_request('airline is required')
+    try:
+        month = datetime.datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
+    start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(
+        (month + datetime.timedelta(days=32)).replace(day=1), datetime.time.min))
+    report = roster_issues(airline, start, end)
+    return JsonResponse({
+        'airline': airline,
+        'month': f'{month:%Y-%m}',
+        'crew': report['crew'],
+        'rostered': report['rostered'],
+        'legs': report['legs'],
+        'issues': [issue.as_dict() for issue in report['issues']],
+    })
+
+# ============================================================================
+# ON-TIME PERFORMANCE
+# ============================================================================
+
+@login_required
+def on_time_performance(request):
+    """On-time rollups for every airline, airport or route on a day or in a month"""
+    dimension = request.GET.get('dimension', 'AIRLINE').upper()
+    if dimension not in ('AIRLINE', 'AIRPORT', 'ROUTE'):
+        dimension = 'AIRLINE'
+    period = 'D' if request.GET.get('period') == 'day' else 'M'
+    try:
+        day = parse_date(request.GET.get('date', '')) or timezone.localdate()
+    except ValueError:
+        day = timezone.localdate()
+    rows = performance_table(dimension, period, day)
+    airlines = {airline.airlineid: airline.airlinename for airline in reference_data('AIRLINE')}
+    airports = {airport.airportcode: airport.airportname for airport in reference_data('AIRPORT')}
+    for row in rows:
+        if dimension == 'AIRLINE':
+            row.name = airlines.get(int(row.key), f'Airline #{row.key}')
+        elif dimension == 'AIRPORT':
+            row.name = airports.get(int(row.key), f'Airport #{row.key}')
+        else:
+            origin, destination = (int(code) for code in row.key.split('-'))
+            row.name = f"{airports.get(origin, origin)} → {airports.get(destination, destination)}"
+    context = {
+        'dimension': dimension,
+        'period': period,
+        'date': day,
+        'rows': rows,
+        'on_time_minutes': ON_TIME_MINUTES,
+    }
+    return render(request, 'aviation/on_time_performance.html', context)
+
+# ============================================================================
+# REVENUE REPORTING
+# ============================================================================
+
+@login_required
+def revenue_report(request):
+    """Booking revenue in the reporting currency by channel, status, country or airline"""
+    dimension = request.GET.get('dimension', 'CHANNEL').upper()
+    if dimension not in REVENUE_DIMENSIONS:
+        dimension = 'CHANNEL'
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.GET.get('from', '')) or today.replace(day=1)
+        end = parse_date(request.GET.get('to', '')) or today
+    except ValueError:
+        start, end = today.replace(day=1), today
+    rows = revenue_table(dimension, start, end)
+    names = {}
+    if dimension == 'COUNTRY':
+        names = {str(country.countrycode): country.countryname for country in reference_data('COUNTRY')}
+    elif dimension == 'AIRLINE':
+        names = {str(airline.airlineid): airline.airlinename for airline in reference_data('AIRLINE')}
+        names[''] = 'No tickets yet'
+    for row in rows:
+        row['name'] = names.get(row['dimensionkey'], row['dimensionkey'])
+    currencies = {currency.currencycode: currency for currency in reference_data('CURRENCY')}
+    context = {
+        'dimension': dimension,
+        'start': start,
+        'end': end,
+        'rows': rows,
+        'totals': revenue_totals(start, end),
+        'currency': currencies.get(reporting_currency()),
+    }
+    return render(request, 'aviation/revenue_report.html', context)
+
+@login_required
+def currency_rates(request):
+    """List and add the rates used to convert bookings to the reporting currency"""
+    if request.method == 'POST':
+        currency = request.POST.get('currencycode')
+        try:
+            rate_date = parse_date(request.POST.get('ratedate', ''))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO CURRENCY_RATE (CurrencyCode, RateDate, Rate) VALUES (%s, %s, %s)
+                """, [currency, rate_date, request.POST.get('rate')])
+                notify_write('CURRENCY_RATE', 'insert', None, cursor.rowcount, pks=[(int(currency), rate_date)])
+            messages.success(request, 'Exchange rate added successfully! Existing bookings are reconverted '
+                                      'by the next scheduled revenue refresh.')
+        except Exception as e:
+            if 'unique' in str(e).lower() or 'duplicate' in str(e).lower():
+                messages.error(request, 'That currency already has a rate on this date. Delete it first.')
+            else:
+                messages.error(request, f'Error adding exchange rate: {str(e)}')
+        return redirect('currency_rates')
+    rates = CurrencyRate.objects.select_related('currencycode').order_by('-ratedate', 'currencycode')[:200]
+    currencies = reference_data('CURRENCY')
+    reporting = {currency.currencycode: currency for currency in currencies}.get(reporting_currency())
+    return render(request, 'aviation/currency_rates.html', {
+        'rates': rates, 'currencies': currencies, 'reporting': reporting,
+    })
+
+@login_required
+def delete_currency_rate(request, rate_id):
+    if request.method == 'POST':
+        rate = get_object_or_404(CurrencyRate, rateid=rate_id)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("DELETE FROM CURRENCY_RATE WHERE RateID = %s", [rate_id])
+            notify_write('CURRENCY_RATE', 'delete', None, cursor.rowcount,
+                         pks=[(rate.currencycode_id, rate.ratedate)])
+        messages.success(request, 'Exchange rate deleted successfully! Existing bookings are reconverted '
+                                  'by the next scheduled revenue refresh.')
+    return redirect('currency_rates')
+
+# ============================================================================
+# SEAT AVAILABILITY
+# ============================================================================
+
+@login_required
+def seat_availability(request):
+    """Capacity, load factor and per-class counts for many flights at once"""
+    ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip().isdigit()]
+    if not ids:
+        return _bad_request('ids must list one or more flight IDs')
+    if len(ids) > MAX_AVAILABILITY_FLIGHTS:
+        return _bad_request(f'at most {MAX_AVAILABILITY_FLIGHTS} flights per request')
+    seat = request.GET.get('seat')
+    flights = {}
+    for flight_id, inventory in seat_inventories(ids).items():
+        flights[flight_id] = inventory.summary()
+        if seat:
+            flights[flight_id]['seat_free'] = inventory.is_free(seat)
+    return JsonResponse({'flights': flights})
+
+# ============================================================================
+# ITINERARY SEARCH
+# ============================================================================
+
+@login_required
+def itinerary_search(request):
+    """Direct and connecting itineraries between two airports on a date"""
+    origin = _int_param(request, 'from')
+    destination = _int_param(request, 'to')
+    try:
+        date = parse_date(request.GET.get('date', ''))
+    except ValueError:
+        date = None
+    itineraries = None
+    if origin is not None and destination is not None and date is not None:
+        itineraries = search_itineraries(origin, destination, date)
+        names = {a.airportcode: a.airportname for a in reference_data('AIRPORT')}
+        for itinerary in itineraries:
+            for leg in itinerary['legs']:
+                leg['origin_name'] = names.get(leg['origin'], leg['origin'])
+                leg['destination_name'] = names.get(leg['destination'], leg['destination'])
+    context = {
+        'origin': origin,
+        'destination': destination,
+        'date': date or timezone.localdate(),
+        'itineraries': itineraries,
+        'min_connection': MIN_CONNECTION_MINUTES,
+    }
+    return render(request, 'aviation/itinerary_search.html', context)
+
+# ============================================================================
+# GEO QUERIES
+# ============================================================================
+
+def _float_param(request, name):
+    try:
+        return float(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _geo_point(request):
+    """(lat, lon) from the lat/lon parameters or the coordinates of ?airport="""
+    airport = _int_param(request, 'airport')
+    if airport is not None:
+        return airport_index().coordinates(airport)
+    lat, lon = _float_param(request, 'lat'), _float_param(request, 'lon')
+    if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return None
+    return lat, lon
+
+
+@login_required
+def airports_nearest(request):
+    """The airports closest to a point"""
+    point = _geo_point(request)
+    if point is None:
+        return _bad_request('lat and lon, or a located airport code, are required')
+    k = max(1, min(_int_param(request, 'k', DEFAULT_NEAREST), MAX_NEAREST))
+    return JsonResponse({'lat': point[0], 'lon': point[1], 'airports': airport_index().nearest(*point, k)})
+
+
+@login_required
+def airports_within(request):
+    """Airports within a radius of a point"""
+    point = _geo_point(request)
+    km = _float_param(request, 'km')
+    if point is None or km is None or not 0 < km <= MAX_RADIUS_KM:
+        return _bad_request(f'lat and lon (or airport) and km between 0 and {MAX_RADIUS_KM} are required')
+    return JsonResponse({'lat': point[0], 'lon': point[1], 'km': km,
+                         'airports': airport_index().within(*point, km)})
+
+# ============================================================================
+# CHANGE FEED
+# ============================================================================
+
+@login_required
+def change_feed(request):
+    """Change events after ?after=<EventID> or in ?gaps=<EventIDs> for components tailing the outbox over HTTP"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('The change feed is only served to staff')
+    after = _int_param(request, 'after', 0)
+    limit = min(_int_param(request, 'limit', DEFAULT_BATCH_SIZE), MAX_BATCH_SIZE)
+    tables = [table.upper() for table in request.GET.getlist('table')]
+    batch = read_changes(after, limit, tables, parse_gaps(request.GET.get('gaps', '')))
+    return JsonResponse({
+        'events': [event_dict(event) for event in batch.events],
+        # Pass back as ?after= and ?gaps= to continue from here
+        'next': batch.after,
+        'gaps': format_gaps(batch.gaps),
+        'more': batch.more,
+    })
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _metrics_token_ok(request):
+    token = getattr(settings, 'AVIATION_METRICS_TOKEN', None)
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode())
+
+
+def metrics(request):
+    """Prometheus scrape endpoint for the per-view request metrics: staff, the scrape token or an allowed address"""
+    allowed = getattr(settings, 'AVIATION_METRICS_ALLOWED_IPS', ())
+    if not (request.user.is_staff or _metrics_token_ok(request) or request.META.get('REMOTE_ADDR') in allowed):
+        return HttpResponseForbidden('Metrics are only served to staff and configured scrapers')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
+
 # ============================================================================
 # SEARCH FUNCTIONALITY
 # ============================================================================
 
 @login_required
 def search_flights(request):
-    """Search for flights by flight number, airline, or airport"""
+    """Search flights, airlines, airports and passengers"""
     query = request.GET.get('q', '')
-    results = []
-    
-    if query:
-        # Search in flights
-        flights = Flight.objects.filter(
-            flightnumber__icontains=query
-        ).select_related('airlineid', 'departureairportcode', 'arrivalairportcode')[:10]
-        
-        for flight in flights:
-            results.append({
-                'type': 'Flight',
-                'title': f'Flight {flight.flightnumber}',
-                'subtitle': f'{flight.airlineid.airlinename} - {flight.departureairportcode.airportname} to {flight.arrivalairportcode.airportname}',
-                'url': f'/flights/{flight.flightid}/',
-                'status': flight.flightstatus
-            })
-        
-        # Search in airlines
-        airlines = Airline.objects.filter(airlinename__icontains=query)[:5]
-        for airline in airlines:
-            results.append({
-                'type': 'Airline',
-                'title': airline.airlinename,
-                'subtitle': f'ICAO: {airline.airlineicao}',
-                'url': f'/airlines/{airline.airlineid}/',
-                'status': None
-            })
-        
-        # Search in airports
-        airports = Airport.objects.filter(airportname__icontains=query)[:5]
-        for airport in airports:
-            results.append({
-                'type': 'Airport',
-                'title': airport.airportname,
-                'subtitle': f'{airport.cityid.cityname}, {airport.cityid.countrycode.countryname}',
-                'url': f'/airports/{airport.airportcode}/',
-                'status': None
-            })
-        
-        # Search in passengers
-        passengers = Passenger.objects.filter(
-            firstname__icontains=query
-        ) | Passenger.objects.filter(
-            lastname__icontains=query
-        )
-        passengers = passengers[:5]
-        
-        for passenger in passengers:
-            results.append({
-                'type': 'Passenger',
-                'title': f'{passenger.firstname} {passenger.lastname}',
-                'subtitle': f'Email: {passenger.email}',
-                'url': f'/passengers/{passenger.passengerid}/',
-                'status': None
-            })
+    results = search(query) if query else []
     
     context = {
         'query': query,
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'aviation.metrics.QueryMetricsMiddleware',
+    'aviation.routers.ReplicaReadsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,10 +56,16 @@ ROOT_URLCONF = 'aviation_system.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'aviation.metrics.TimedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process; runserver still reloads edited templates
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -82,9 +90,44 @@ DATABASES = {
         'PASSWORD': '2002',
         'HOST': 'localhost',
         'PORT': '3306',
+        # Persistent connections, checked before their first use in each request
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas (aviation.routers). Add one alias per replica, e.g.
+#   DATABASES['replica1'] = {**DATABASES['default'], 'HOST': 'replica1', 'TEST': {'MIRROR': 'default'}}
+#   AVIATION_READ_REPLICAS = ['replica1']
+# GET requests read from a healthy replica; writes and raw SQL use 'default'
+AVIATION_READ_REPLICAS = []
+# After a POST the client keeps reading from 'default' this long to see its own writes
+AVIATION_REPLICA_STICKY_SECONDS = 10
+
+DATABASE_ROUTERS = ['aviation.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the reference-data table versions (aviation.refdata). With several
+# worker processes, point this at a shared backend (Memcached/Redis) so a
+# write in one worker invalidates the dropdown snapshots in all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'aviation',
+    },
+    # Per-row versions (aviation.seats), one key per flight, kept apart so
+    # they never evict the table versions above. Point it at the same shared
+    # backend as 'default' when running several workers.
+    'rows': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'aviation-rows',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,12 +164,48 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = '/static/'
+# collectstatic minifies, fingerprints and precompresses assets into here (aviation.assets)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'aviation.assets.AssetStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Request metrics (aviation.metrics)
+# Views issuing more SQL statements than this per request are logged and counted
+AVIATION_QUERY_BUDGET = 25
+# /metrics/ is served to staff users, and to scrapers sending
+# "Authorization: Bearer <AVIATION_METRICS_TOKEN>" when that is set
+AVIATION_METRICS_TOKEN = None
+# Addresses also allowed without either, matched against REMOTE_ADDR. Only
+# list addresses when clients reach Django directly: behind a reverse proxy
+# every request arrives from the proxy's address.
+AVIATION_METRICS_ALLOWED_IPS = []
+
+# Conditional GET (aviation.conditional)
+# Answer 304 Not Modified from the change stamps in CACHES. None enables it
+# only when 'default' and 'rows' are shared backends: with local-memory
+# caches one worker never sees another's writes and would send stale 304s.
+AVIATION_CONDITIONAL_GET = None
+
+# Concurrent queries in async views (aviation.fanout)
+# Pool threads per process; each holds its own database connection
+AVIATION_QUERY_WORKERS = 8
+
+# Revenue reporting (aviation.revenue)
+# CurrencyCode that CURRENCY_RATE rates convert into; its own rate is always 1
+AVIATION_REPORTING_CURRENCY = None
+
 # Authentication settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
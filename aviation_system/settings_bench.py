@@ -0,0 +1,35 @@
+"""
+Settings for the view benchmark suite (python manage.py benchmark).
+
+Points Django at a throwaway SQLite database that the benchmark drops,
+recreates and fills with synthetic data. To benchmark against a local MySQL
+stand-in instead, replace DATABASES with a dedicated scratch schema - never
+the real AVIATION database.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
+
+# The aviation migrations hold MySQL-only index DDL; the benchmark builds its
+# schema straight from the models instead
+MIGRATION_MODULES = {'aviation': None}
+
+ALLOWED_HOSTS = ['testserver']
+
+# Pages render without a collectstatic manifest
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Logging the benchmark user in should not dominate the timings
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Allows the benchmark command to wipe and reseed this database
+AVIATION_BENCHMARK = True
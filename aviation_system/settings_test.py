@@ -0,0 +1,37 @@
+"""
+Settings for the test suite:
+
+    python manage.py test aviation --settings=aviation_system.settings_test
+
+Runs against an in-memory SQLite database, so no MySQL server is needed.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # Stand-in read replica for the routing tests; they enable it with
+    # AVIATION_READ_REPLICAS and create the tables they read on it
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+# The aviation migrations hold MySQL-only index DDL; tests build the schema from the models
+MIGRATION_MODULES = {'aviation': None}
+
+# The test runner forces DEBUG off, where ManifestStaticFilesStorage would
+# require collectstatic to have run before any page renders
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Also creates the tables of the unmanaged aviation models
+TEST_RUNNER = 'aviation.test_runner.AviationTestRunner'
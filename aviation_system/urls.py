@@ -14,10 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from aviation.assets import serve_static
 
 urlpatterns = [
     path('', include('aviation.urls')),
     path('admin/', admin.site.urls),
-]
\ No newline at end of file
+]
+
+if not settings.DEBUG:
+    # runserver serves the uncollected files itself while DEBUG is on
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static),
+    ]